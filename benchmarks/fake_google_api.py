@@ -0,0 +1,1063 @@
+# benchmarks/fake_google_api.py
+
+import base64
+import gzip
+import json
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from email import message_from_bytes
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.parser import BytesParser
+from email.utils import format_datetime, getaddresses, parseaddr
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+
+import httplib2
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+
+from tools.sync.simulator import NotificationSimulator
+
+WORDS = (
+    "project update budget review meeting agenda roadmap release launch quarterly "
+    "planning design feedback invoice contract schedule deadline customer report "
+    "notes follow-up draft proposal team sync hiring offsite travel demo metrics "
+    "migration incident postmortem security onboarding training workshop"
+).split()
+
+FIRST_NAMES = ["Alice", "Bob", "Carol", "Dave", "Erin", "Frank", "Grace", "Heidi",
+               "Ivan", "Judy", "Mallory", "Niaj", "Olivia", "Peggy", "Rupert", "Sybil"]
+
+# Responses at least this large are gzip-compressed when the client accepts it
+GZIP_MIN_BYTES = 1024
+
+DOMAINS = ["example.com", "example.org", "corp.example.net", "vendor.example.io"]
+
+SYSTEM_LABELS = ["INBOX", "SENT", "DRAFT", "SPAM", "TRASH", "UNREAD", "STARRED",
+                 "IMPORTANT", "CATEGORY_PERSONAL", "CATEGORY_UPDATES", "CATEGORY_PROMOTIONS"]
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode()
+
+
+def _rfc3339(dt: datetime) -> str:
+    return dt.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _parse_rfc3339(value: str) -> datetime:
+    value = value.replace('Z', '+00:00')
+    if 'T' not in value:
+        return datetime.fromisoformat(value).replace(tzinfo=timezone.utc)
+    dt = datetime.fromisoformat(value)
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+# Seeded timestamps are offsets from this instant, so the same seed always produces the same data
+SEED_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+class FakeApiError(Exception):
+    """Raised by route handlers to produce a Google-style JSON error response."""
+
+    def __init__(self, code: int, message: str, reason: str = "invalid"):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.reason = reason
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            'error': {
+                'code': self.code,
+                'message': self.message,
+                'errors': [{'message': self.message, 'domain': 'global', 'reason': self.reason}],
+            }
+        }
+
+
+class FakeMailbox:
+    """In-memory Gmail mailbox seeded with synthetic threads and messages."""
+
+    def __init__(self, email: str, n_messages: int, avg_thread_length: int, rng: random.Random,
+                 epoch: datetime = SEED_EPOCH):
+        self.email = email
+        self.lock = threading.RLock()
+        self.messages: Dict[str, Dict[str, Any]] = {}
+        self.threads: Dict[str, List[str]] = {}
+        self.order: List[str] = []  # newest first
+        self.labels: Dict[str, Dict[str, Any]] = {
+            name: {'id': name, 'name': name, 'type': 'system'} for name in SYSTEM_LABELS
+        }
+        self.drafts: Dict[str, Dict[str, Any]] = {}
+        self.history: List[Dict[str, Any]] = []
+        self.history_id = 1000
+        self.listeners: List[Callable[[int], None]] = []  # called with the new historyId after each change
+        self._seed(n_messages, max(1, avg_thread_length), rng, epoch)
+
+    def _next_history_id(self) -> int:
+        self.history_id += 1
+        return self.history_id
+
+    def _seed(self, n_messages: int, avg_thread_length: int, rng: random.Random, epoch: datetime):
+        created = 0
+        while created < n_messages:
+            thread_length = min(n_messages - created, rng.randint(1, 2 * avg_thread_length - 1))
+            subject = " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 6))).capitalize()
+            participants = [self._random_address(rng) for _ in range(rng.randint(2, 4))]
+            start = epoch - timedelta(minutes=rng.randint(1, 60 * 24 * 365))
+            thread_id = None
+            previous = None
+            for position in range(thread_length):
+                sender = participants[position % len(participants)]
+                date = start + timedelta(minutes=position * rng.randint(5, 600))
+                body = self._random_body(rng, sender)
+                if previous is not None:
+                    quoted = "\n".join("> " + line for line in previous['text'].splitlines())
+                    body += f"\n\nOn {format_datetime(previous['date'])}, {previous['from']} wrote:\n{quoted}"
+                labels = ['INBOX', 'CATEGORY_PERSONAL']
+                if rng.random() < 0.3:
+                    labels.append('UNREAD')
+                if rng.random() < 0.05:
+                    labels.append('IMPORTANT')
+                message = self._add_message(
+                    headers=[
+                        ('From', sender),
+                        ('To', self.email),
+                        ('Subject', subject if position == 0 else f"Re: {subject}"),
+                        ('Date', format_datetime(date)),
+                        ('Message-ID', f"<{uuid.UUID(int=rng.getrandbits(128)).hex}@{sender.split('@')[-1].rstrip('>')}>"),
+                    ],
+                    text=body,
+                    html=f"<html><body><pre>{body}</pre></body></html>" if rng.random() < 0.4 else None,
+                    label_ids=labels,
+                    thread_id=thread_id,
+                    internal_date=date,
+                    record_history=False,
+                    message_id=uuid.UUID(int=rng.getrandbits(128)).hex[:16],
+                )
+                thread_id = message['threadId']
+                previous = {'text': body, 'date': date, 'from': sender}
+                created += 1
+        self.order.sort(key=lambda mid: self.messages[mid]['internalDate'], reverse=True)
+
+    def _record(self, record: Dict[str, Any]):
+        self.history.append(record)
+        for listener in self.listeners:
+            listener(int(record['id']))
+
+    @staticmethod
+    def _random_address(rng: random.Random) -> str:
+        name = rng.choice(FIRST_NAMES)
+        return f"{name} <{name.lower()}.{rng.randint(1, 99)}@{rng.choice(DOMAINS)}>"
+
+    @staticmethod
+    def _random_body(rng: random.Random, sender: str) -> str:
+        paragraphs = []
+        for _ in range(rng.randint(1, 4)):
+            sentence_count = rng.randint(2, 6)
+            sentences = [
+                " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 14))).capitalize() + "."
+                for _ in range(sentence_count)
+            ]
+            paragraphs.append(" ".join(sentences))
+        name = parseaddr(sender)[0] or sender
+        return "\n\n".join(paragraphs) + f"\n\n-- \n{name}\nExample Corp"
+
+    def _add_message(self,
+                     headers: List[Tuple[str, str]],
+                     text: str,
+                     html: Optional[str],
+                     label_ids: List[str],
+                     thread_id: Optional[str],
+                     internal_date: datetime,
+                     record_history: bool = True,
+                     message_id: Optional[str] = None) -> Dict[str, Any]:
+        message_id = message_id or uuid.uuid4().hex[:16]
+        thread_id = thread_id or message_id
+        message = {
+            'id': message_id,
+            'threadId': thread_id,
+            'labelIds': list(dict.fromkeys(label_ids)),
+            'headers': headers,
+            'text': text,
+            'html': html,
+            'snippet': " ".join(text.split())[:140],
+            'internalDate': int(internal_date.timestamp() * 1000),
+            'historyId': self._next_history_id(),
+        }
+        self.messages[message_id] = message
+        self.threads.setdefault(thread_id, []).append(message_id)
+        if record_history:
+            self.order.insert(0, message_id)
+            self._record({
+                'id': str(message['historyId']),
+                'messagesAdded': [{'message': self._minimal(message)}],
+            })
+        else:
+            # Seeding appends and sorts once at the end
+            self.order.append(message_id)
+        return message
+
+    def _raw_bytes(self, message: Dict[str, Any]) -> bytes:
+        if message['html'] is None:
+            mime = MIMEText(message['text'])
+        else:
+            mime = MIMEMultipart('alternative')
+            mime.attach(MIMEText(message['text'], 'plain'))
+            mime.attach(MIMEText(message['html'], 'html'))
+        for name, value in message['headers']:
+            mime[name] = value
+        return mime.as_bytes()
+
+    @staticmethod
+    def _minimal(message: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'id': message['id'],
+            'threadId': message['threadId'],
+            'labelIds': list(message['labelIds']),
+            'historyId': str(message['historyId']),
+        }
+
+    def render(self, message: Dict[str, Any], fmt: str = 'full',
+               metadata_headers: Optional[List[str]] = None) -> Dict[str, Any]:
+        raw = self._raw_bytes(message)
+        result = self._minimal(message)
+        result.update({
+            'snippet': message['snippet'],
+            'internalDate': str(message['internalDate']),
+            'sizeEstimate': len(raw),
+        })
+        if fmt == 'minimal':
+            return result
+        if fmt == 'raw':
+            result['raw'] = _b64(raw)
+            return result
+
+        headers = [{'name': name, 'value': value} for name, value in message['headers']]
+        if fmt == 'metadata':
+            if metadata_headers:
+                wanted = {h.lower() for h in metadata_headers}
+                headers = [h for h in headers if h['name'].lower() in wanted]
+            result['payload'] = {'mimeType': 'multipart/alternative' if message['html'] else 'text/plain',
+                                 'headers': headers}
+            return result
+
+        text = message['text'].encode()
+        if message['html'] is None:
+            payload = {'partId': '', 'mimeType': 'text/plain', 'filename': '', 'headers': headers,
+                       'body': {'size': len(text), 'data': _b64(text)}}
+        else:
+            html = message['html'].encode()
+            payload = {
+                'partId': '', 'mimeType': 'multipart/alternative', 'filename': '', 'headers': headers,
+                'body': {'size': 0},
+                'parts': [
+                    {'partId': '0', 'mimeType': 'text/plain', 'filename': '',
+                     'headers': [{'name': 'Content-Type', 'value': 'text/plain; charset="utf-8"'}],
+                     'body': {'size': len(text), 'data': _b64(text)}},
+                    {'partId': '1', 'mimeType': 'text/html', 'filename': '',
+                     'headers': [{'name': 'Content-Type', 'value': 'text/html; charset="utf-8"'}],
+                     'body': {'size': len(html), 'data': _b64(html)}},
+                ],
+            }
+        result['payload'] = payload
+        return result
+
+    def matches(self, message: Dict[str, Any], query: Optional[str], label_ids: Optional[List[str]]) -> bool:
+        if label_ids and not all(label in message['labelIds'] for label in label_ids):
+            return False
+        if not query:
+            return True
+        headers = {name.lower(): value.lower() for name, value in message['headers']}
+        for token in query.lower().split():
+            if ':' in token:
+                key, value = token.split(':', 1)
+                value = value.strip('"')
+                if key in ('from', 'to', 'subject', 'cc'):
+                    if value not in headers.get(key, ''):
+                        return False
+                elif key in ('label', 'in'):
+                    names = {label.lower() for label in message['labelIds']}
+                    names |= {self.labels[l]['name'].lower() for l in message['labelIds'] if l in self.labels}
+                    if value not in names:
+                        return False
+                elif key == 'is':
+                    if value.upper() not in message['labelIds']:
+                        return False
+                elif key == 'rfc822msgid':
+                    if value.strip('<>') != "".join(headers.get('message-id', '').split()).strip('<>'):
+                        return False
+                elif key in ('after', 'before', 'newer_than', 'older_than', 'has'):
+                    continue
+            elif token not in headers.get('subject', '') and token not in message['text'].lower():
+                return False
+        return True
+
+    def modify(self, message_id: str, add: List[str], remove: List[str]):
+        message = self.messages.get(message_id)
+        if message is None:
+            raise FakeApiError(404, "Requested entity was not found.", "notFound")
+        for label in add + remove:
+            if label not in self.labels:
+                raise FakeApiError(400, f"Invalid label: {label}", "invalidArgument")
+        added = [label for label in add if label not in message['labelIds']]
+        removed = [label for label in remove if label in message['labelIds']]
+        message['labelIds'] = [label for label in message['labelIds'] if label not in remove] + added
+        message['historyId'] = self._next_history_id()
+        record: Dict[str, Any] = {'id': str(message['historyId'])}
+        if added:
+            record['labelsAdded'] = [{'message': self._minimal(message), 'labelIds': added}]
+        if removed:
+            record['labelsRemoved'] = [{'message': self._minimal(message), 'labelIds': removed}]
+        self._record(record)
+        return message
+
+
+class FakeCalendar:
+    """In-memory primary calendar seeded with synthetic events."""
+
+    def __init__(self, owner: str, n_events: int, rng: random.Random, epoch: datetime = SEED_EPOCH):
+        self.owner = owner
+        self.lock = threading.RLock()
+        self.events: Dict[str, Dict[str, Any]] = {}
+        self.by_ical_uid: Dict[str, str] = {}  # iCalUID -> event id
+        self.sequence = 0
+        self.listeners: List[Callable[[], None]] = []  # called after each event change
+        self._seed(n_events, rng, epoch)
+
+    def _seed(self, n_events: int, rng: random.Random, epoch: datetime):
+        epoch = epoch.replace(minute=0, second=0, microsecond=0)
+        for _ in range(n_events):
+            start = epoch + timedelta(hours=rng.randint(-24 * 90, 24 * 90))
+            title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).capitalize()
+            body: Dict[str, Any] = {
+                'summary': title,
+                'description': " ".join(rng.choice(WORDS) for _ in range(rng.randint(0, 30))) or None,
+                'location': rng.choice([None, "Room A", "Room B", "https://meet.example.com/abc"]),
+            }
+            if rng.random() < 0.1:
+                body['start'] = {'date': start.date().isoformat()}
+                body['end'] = {'date': (start.date() + timedelta(days=1)).isoformat()}
+            else:
+                end = start + timedelta(minutes=rng.choice([15, 30, 45, 60, 90]))
+                body['start'] = {'dateTime': _rfc3339(start), 'timeZone': 'UTC'}
+                body['end'] = {'dateTime': _rfc3339(end), 'timeZone': 'UTC'}
+            if rng.random() < 0.5:
+                body['attendees'] = [
+                    {'email': f"{rng.choice(FIRST_NAMES).lower()}@{rng.choice(DOMAINS)}",
+                     'responseStatus': rng.choice(['accepted', 'declined', 'tentative', 'needsAction'])}
+                    for _ in range(rng.randint(1, 6))
+                ]
+            self.insert(body, event_id=uuid.UUID(int=rng.getrandbits(128)).hex[:26], now=epoch)
+
+    def _touch(self, event: Dict[str, Any], now: Optional[datetime] = None):
+        self.sequence += 1
+        event['_seq'] = self.sequence
+        event['etag'] = f'"{self.sequence}"'
+        event['updated'] = _rfc3339(now or datetime.now(timezone.utc))
+        for listener in self.listeners:
+            listener()
+
+    def insert(self, body: Dict[str, Any], event_id: Optional[str] = None,
+               now: Optional[datetime] = None) -> Dict[str, Any]:
+        if 'start' not in body or 'end' not in body:
+            raise FakeApiError(400, "Missing end time.", "required")
+        event_id = event_id or body.get('id') or uuid.uuid4().hex[:26]
+        if event_id in self.events and self.events[event_id]['status'] != 'cancelled':
+            raise FakeApiError(409, "The requested identifier already exists.", "duplicate")
+        event = {k: v for k, v in body.items() if v is not None}
+        event.update({
+            'kind': 'calendar#event',
+            'id': event_id,
+            'status': body.get('status', 'confirmed'),
+            'iCalUID': body.get('iCalUID') or f"{event_id}@google.com",
+            'created': _rfc3339(now or datetime.now(timezone.utc)),
+            'organizer': {'email': self.owner, 'self': True},
+            'htmlLink': f"https://www.google.com/calendar/event?eid={event_id}",
+        })
+        self._touch(event, now)
+        self.events[event_id] = event
+        self.by_ical_uid[event['iCalUID']] = event_id
+        return event
+
+    def get(self, event_id: str) -> Dict[str, Any]:
+        event = self.events.get(event_id)
+        if event is None or event['status'] == 'cancelled':
+            raise FakeApiError(404, "Not Found", "notFound")
+        return event
+
+    def update(self, event_id: str, body: Dict[str, Any], patch: bool) -> Dict[str, Any]:
+        event = self.get(event_id)
+        if not patch:
+            keep = {k: event[k] for k in ('kind', 'id', 'iCalUID', 'created', 'organizer', 'htmlLink')}
+            event.clear()
+            event.update(keep)
+            event['status'] = 'confirmed'
+        event.update({k: v for k, v in body.items() if k not in ('id', 'etag')})
+        self._touch(event)
+        return event
+
+    def delete(self, event_id: str):
+        event = self.get(event_id)
+        event['status'] = 'cancelled'
+        self._touch(event)
+
+    @staticmethod
+    def start_of(event: Dict[str, Any]) -> datetime:
+        start = event.get('start', {})
+        return _parse_rfc3339(start.get('dateTime') or start.get('date'))
+
+    @staticmethod
+    def public(event: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: v for k, v in event.items() if not k.startswith('_')}
+
+
+class FakeGoogleData:
+    """Synthetic Gmail and Calendar state shared by all requests to a fake server.
+
+    Args:
+        n_messages: Number of messages to seed into the mailbox
+        n_events: Number of events to seed into the primary calendar
+        avg_thread_length: Average number of messages per thread
+        seed: Random seed, so identical arguments produce identical data
+        email: Address of the simulated account
+        epoch: Instant seeded messages and events are dated around (messages in the year before, events
+            within 90 days either side); anchored to a fixed date by default
+    """
+
+    def __init__(self,
+                 n_messages: int = 1000,
+                 n_events: int = 500,
+                 avg_thread_length: int = 3,
+                 seed: int = 0,
+                 email: str = "bench.user@example.com",
+                 epoch: datetime = SEED_EPOCH):
+        rng = random.Random(seed)
+        self.email = email
+        self.mailbox = FakeMailbox(email, n_messages, avg_thread_length, rng, epoch)
+        self.calendar = FakeCalendar(email, n_events, rng, epoch)
+
+
+class FakePushNotifier:
+    """Delivers push notifications from a background thread, the way Google does after a change.
+
+    Gmail notifications are posted as a Pub/Sub push subscription would post them,
+    Calendar notifications to the address registered with the channel.
+    """
+
+    def __init__(self):
+        self.queue: "queue.Queue[Tuple[str, Dict[str, str], bytes]]" = queue.Queue()
+        self.delivered = 0
+        self.failed = 0
+        threading.Thread(target=self._deliver, name="fake-push", daemon=True).start()
+
+    def gmail(self, url: str, email: str, history_id: int):
+        envelope = NotificationSimulator.gmail_envelope(email, history_id)
+        self.queue.put((url, {'Content-Type': 'application/json'}, json.dumps(envelope).encode()))
+
+    def calendar(self, channel: Dict[str, Any], state: str):
+        headers = {
+            'X-Goog-Channel-ID': channel['id'],
+            'X-Goog-Channel-Token': channel.get('token') or '',
+            'X-Goog-Channel-Expiration': channel['expiration'],
+            'X-Goog-Resource-ID': channel['resourceId'],
+            'X-Goog-Resource-State': state,
+            'X-Goog-Resource-URI': channel['resourceUri'],
+        }
+        self.queue.put((channel['address'], headers, b""))
+
+    def _deliver(self):
+        while True:
+            url, headers, body = self.queue.get()
+            try:
+                request = urllib.request.Request(url, data=body, headers=headers, method='POST')
+                urllib.request.urlopen(request, timeout=10).close()
+                self.delivered += 1
+            except Exception:
+                self.failed += 1
+            finally:
+                self.queue.task_done()
+
+
+Route = Tuple[str, "re.Pattern[str]", str, Callable[..., Any]]
+
+
+class FakeGoogleAPI:
+    """Request router implementing the subset of Calendar v3 and Gmail v1 used by the toolkits.
+
+    Dispatch is transport independent so the same routes serve plain HTTP
+    requests and the individual parts of a multipart batch request.
+    """
+
+    def __init__(self, data: FakeGoogleData, gmail_push_url: Optional[str] = None):
+        self.data = data
+        self.stats: Counter = Counter()
+        self.stats_lock = threading.Lock()
+        self.channels: Dict[str, Dict[str, Any]] = {}
+        self.gmail_topic: Optional[str] = None
+        self.gmail_push_url = gmail_push_url
+        self.notifier = FakePushNotifier()
+        data.mailbox.listeners.append(self._on_mail_change)
+        data.calendar.listeners.append(self._on_calendar_change)
+        gmail = r'/gmail/v1/users/(?P<user>[^/]+)'
+        calendar = r'/calendar/v3/calendars/(?P<calendar>[^/]+)'
+        routes = [
+            ('GET', gmail + r'/profile$', 'gmail.users.getProfile', self.gmail_profile),
+            ('GET', gmail + r'/messages$', 'gmail.messages.list', self.gmail_list_messages),
+            ('POST', gmail + r'/messages/send$', 'gmail.messages.send', self.gmail_send),
+            ('POST', gmail + r'/messages/batchModify$', 'gmail.messages.batchModify', self.gmail_batch_modify),
+            ('GET', gmail + r'/messages/(?P<id>[^/]+)$', 'gmail.messages.get', self.gmail_get_message),
+            ('POST', gmail + r'/messages/(?P<id>[^/]+)/modify$', 'gmail.messages.modify', self.gmail_modify),
+            ('GET', gmail + r'/threads/(?P<id>[^/]+)$', 'gmail.threads.get', self.gmail_get_thread),
+            ('POST', gmail + r'/drafts$', 'gmail.drafts.create', self.gmail_create_draft),
+            ('GET', gmail + r'/labels$', 'gmail.labels.list', self.gmail_list_labels),
+            ('POST', gmail + r'/labels$', 'gmail.labels.create', self.gmail_create_label),
+            ('GET', gmail + r'/history$', 'gmail.history.list', self.gmail_history),
+            ('POST', gmail + r'/watch$', 'gmail.users.watch', self.gmail_watch),
+            ('POST', gmail + r'/stop$', 'gmail.users.stop', self.gmail_stop),
+            ('GET', calendar + r'/events$', 'calendar.events.list', self.calendar_list),
+            ('POST', calendar + r'/events$', 'calendar.events.insert', self.calendar_insert),
+            ('POST', calendar + r'/events/quickAdd$', 'calendar.events.quickAdd', self.calendar_quick_add),
+            ('POST', calendar + r'/events/import$', 'calendar.events.import', self.calendar_import),
+            ('POST', calendar + r'/events/watch$', 'calendar.events.watch', self.calendar_watch),
+            ('POST', r'/calendar/v3/channels/stop$', 'calendar.channels.stop', self.calendar_stop_channel),
+            ('GET', calendar + r'/events/(?P<id>[^/]+)$', 'calendar.events.get', self.calendar_get),
+            ('PUT', calendar + r'/events/(?P<id>[^/]+)$', 'calendar.events.update', self.calendar_update),
+            ('PATCH', calendar + r'/events/(?P<id>[^/]+)$', 'calendar.events.patch', self.calendar_patch),
+            ('DELETE', calendar + r'/events/(?P<id>[^/]+)$', 'calendar.events.delete', self.calendar_delete),
+        ]
+        self.routes: List[Route] = [(method, re.compile(pattern), name, handler)
+                                    for method, pattern, name, handler in routes]
+
+    def count(self, name: str):
+        with self.stats_lock:
+            self.stats[name] += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self.stats_lock:
+            return dict(self.stats)
+
+    def dispatch(self, method: str, target: str, body: bytes) -> Tuple[int, Dict[str, Any]]:
+        """Routes one API call and returns its status code and JSON payload."""
+        parsed = urlparse(target)
+        query = {k: v if len(v) > 1 else v[0] for k, v in parse_qs(parsed.query).items()}
+        for route_method, pattern, name, handler in self.routes:
+            match = pattern.match(parsed.path)
+            if match and route_method == method:
+                self.count(name)
+                params = {k: unquote(v) for k, v in match.groupdict().items()}
+                try:
+                    payload = json.loads(body) if body else {}
+                    return 200, handler(params, query, payload) or {}
+                except FakeApiError as e:
+                    return e.code, e.to_json()
+        self.count('unrouted')
+        return 404, FakeApiError(404, f"No fake route for {method} {parsed.path}", "notFound").to_json()
+
+    # Gmail
+
+    def _mailbox(self, params: Dict[str, str]) -> FakeMailbox:
+        if params['user'] not in ('me', self.data.email):
+            raise FakeApiError(403, "Delegation denied.", "forbidden")
+        return self.data.mailbox
+
+    def gmail_profile(self, params, query, body):
+        box = self._mailbox(params)
+        with box.lock:
+            return {'emailAddress': box.email, 'messagesTotal': len(box.messages),
+                    'threadsTotal': len(box.threads), 'historyId': str(box.history_id)}
+
+    def gmail_list_messages(self, params, query, body):
+        box = self._mailbox(params)
+        label_ids = query.get('labelIds')
+        if isinstance(label_ids, str):
+            label_ids = [label_ids]
+        limit = min(int(query.get('maxResults', 100)), 500)
+        offset = int(query.get('pageToken', 0))
+        with box.lock:
+            matched = [mid for mid in box.order
+                       if box.matches(box.messages[mid], query.get('q'), label_ids)]
+            page = matched[offset:offset + limit]
+            result: Dict[str, Any] = {
+                'messages': [{'id': mid, 'threadId': box.messages[mid]['threadId']} for mid in page],
+                'resultSizeEstimate': len(matched),
+            }
+        if offset + limit < len(matched):
+            result['nextPageToken'] = str(offset + limit)
+        if not page:
+            del result['messages']
+        return result
+
+    def gmail_get_message(self, params, query, body):
+        box = self._mailbox(params)
+        headers = query.get('metadataHeaders')
+        if isinstance(headers, str):
+            headers = [headers]
+        with box.lock:
+            message = box.messages.get(params['id'])
+            if message is None:
+                raise FakeApiError(404, "Requested entity was not found.", "notFound")
+            return box.render(message, query.get('format', 'full'), headers)
+
+    def _parse_raw(self, raw: str) -> Tuple[List[Tuple[str, str]], str, Optional[str]]:
+        mime = message_from_bytes(base64.urlsafe_b64decode(raw.encode()))
+        headers = [(k, str(v)) for k, v in mime.items()
+                   if k.lower() not in ('content-type', 'mime-version', 'content-transfer-encoding')]
+        text, html = "", None
+        for part in mime.walk():
+            if part.is_multipart():
+                continue
+            payload = part.get_payload(decode=True) or b""
+            if part.get_content_type() == 'text/html':
+                html = payload.decode(errors='replace')
+            elif part.get_content_type() == 'text/plain' and not text:
+                text = payload.decode(errors='replace')
+        if not any(k.lower() == 'date' for k, _ in headers):
+            headers.append(('Date', format_datetime(datetime.now(timezone.utc))))
+        return headers, text or (html or ""), html
+
+    def gmail_send(self, params, query, body):
+        box = self._mailbox(params)
+        if 'raw' not in body:
+            raise FakeApiError(400, "'raw' RFC822 payload message string or uploading message via /upload/* URL required", "invalidArgument")
+        headers, text, html = self._parse_raw(body['raw'])
+        recipients = [addr for _, addr in getaddresses([v for k, v in headers if k.lower() in ('to', 'cc', 'bcc')])]
+        if not any('@' in addr for addr in recipients):
+            raise FakeApiError(400, "Invalid To header", "invalidArgument")
+        headers = [(k, v) for k, v in headers if k.lower() != 'bcc']
+        headers.insert(0, ('From', box.email))
+        with box.lock:
+            message = box._add_message(headers, text, html, ['SENT'], body.get('threadId'),
+                                       datetime.now(timezone.utc))
+            return box._minimal(message)
+
+    def gmail_create_draft(self, params, query, body):
+        box = self._mailbox(params)
+        raw = body.get('message', {}).get('raw')
+        if not raw:
+            raise FakeApiError(400, "Missing draft message", "invalidArgument")
+        headers, text, html = self._parse_raw(raw)
+        with box.lock:
+            message = box._add_message(headers, text, html, ['DRAFT'], None, datetime.now(timezone.utc))
+            draft = {'id': 'r' + uuid.uuid4().hex[:16], 'message': box._minimal(message)}
+            box.drafts[draft['id']] = draft
+            return draft
+
+    def gmail_modify(self, params, query, body):
+        box = self._mailbox(params)
+        with box.lock:
+            message = box.modify(params['id'], body.get('addLabelIds') or [], body.get('removeLabelIds') or [])
+            return box._minimal(message)
+
+    def gmail_batch_modify(self, params, query, body):
+        box = self._mailbox(params)
+        ids = body.get('ids') or []
+        if len(ids) > 1000:
+            raise FakeApiError(400, "Too many ids", "invalidArgument")
+        with box.lock:
+            for message_id in ids:
+                box.modify(message_id, body.get('addLabelIds') or [], body.get('removeLabelIds') or [])
+        return {}
+
+    def gmail_get_thread(self, params, query, body):
+        box = self._mailbox(params)
+        headers = query.get('metadataHeaders')
+        if isinstance(headers, str):
+            headers = [headers]
+        with box.lock:
+            ids = box.threads.get(params['id'])
+            if not ids:
+                raise FakeApiError(404, "Requested entity was not found.", "notFound")
+            messages = [box.render(box.messages[mid], query.get('format', 'full'), headers) for mid in ids]
+            return {'id': params['id'], 'historyId': str(max(int(m['historyId']) for m in messages)),
+                    'messages': messages}
+
+    def gmail_list_labels(self, params, query, body):
+        box = self._mailbox(params)
+        with box.lock:
+            return {'labels': list(box.labels.values())}
+
+    def gmail_create_label(self, params, query, body):
+        box = self._mailbox(params)
+        name = body.get('name')
+        if not name:
+            raise FakeApiError(400, "Invalid label name", "invalidArgument")
+        with box.lock:
+            if any(label['name'].lower() == name.lower() for label in box.labels.values()):
+                raise FakeApiError(409, "Label name exists or conflicts", "duplicate")
+            label = dict(body, id=f"Label_{len(box.labels) + 1}", type='user')
+            box.labels[label['id']] = label
+            return label
+
+    def gmail_history(self, params, query, body):
+        box = self._mailbox(params)
+        if 'startHistoryId' not in query:
+            raise FakeApiError(400, "Missing startHistoryId", "required")
+        start = int(query['startHistoryId'])
+        limit = min(int(query.get('maxResults', 100)), 500)
+        offset = int(query.get('pageToken', 0))
+        with box.lock:
+            records = [r for r in box.history if int(r['id']) > start]
+            page = records[offset:offset + limit]
+            result: Dict[str, Any] = {'historyId': str(box.history_id)}
+        if page:
+            result['history'] = page
+        if offset + limit < len(records):
+            result['nextPageToken'] = str(offset + limit)
+        return result
+
+    # Calendar
+
+    def _calendar(self, params: Dict[str, str]) -> FakeCalendar:
+        if params['calendar'] not in ('primary', self.data.email):
+            raise FakeApiError(404, "Not Found", "notFound")
+        return self.data.calendar
+
+    def calendar_list(self, params, query, body):
+        calendar = self._calendar(params)
+        limit = min(int(query.get('maxResults', 250)), 2500)
+        offset = int(query.get('pageToken', 0))
+        with calendar.lock:
+            if 'syncToken' in query:
+                since = int(query['syncToken'])
+                events = [e for e in calendar.events.values() if e['_seq'] > since]
+                events.sort(key=lambda e: e['_seq'])
+            else:
+                events = [e for e in calendar.events.values() if e['status'] != 'cancelled']
+                if 'iCalUID' in query:
+                    events = [e for e in events if e['iCalUID'] == query['iCalUID']]
+                if 'timeMin' in query:
+                    time_min = _parse_rfc3339(query['timeMin'])
+                    events = [e for e in events if calendar.start_of(e) >= time_min]
+                if 'timeMax' in query:
+                    time_max = _parse_rfc3339(query['timeMax'])
+                    events = [e for e in events if calendar.start_of(e) < time_max]
+                if 'q' in query:
+                    needle = query['q'].lower()
+                    events = [e for e in events if needle in (e.get('summary') or '').lower()
+                              or needle in (e.get('description') or '').lower()]
+                if query.get('orderBy') == 'startTime':
+                    events.sort(key=calendar.start_of)
+            page = [calendar.public(e) for e in events[offset:offset + limit]]
+            result: Dict[str, Any] = {'kind': 'calendar#events', 'summary': calendar.owner,
+                                      'timeZone': 'UTC', 'items': page}
+            if offset + limit < len(events):
+                result['nextPageToken'] = str(offset + limit)
+            else:
+                result['nextSyncToken'] = str(calendar.sequence)
+        return result
+
+    def calendar_insert(self, params, query, body):
+        calendar = self._calendar(params)
+        with calendar.lock:
+            return calendar.public(calendar.insert(body))
+
+    def calendar_quick_add(self, params, query, body):
+        calendar = self._calendar(params)
+        text = query.get('text')
+        if not text:
+            raise FakeApiError(400, "Required parameter: text", "required")
+        start = (datetime.now(timezone.utc) + timedelta(days=1)).replace(hour=15, minute=0, second=0, microsecond=0)
+        with calendar.lock:
+            event = calendar.insert({
+                'summary': text,
+                'start': {'dateTime': _rfc3339(start)},
+                'end': {'dateTime': _rfc3339(start + timedelta(hours=1))},
+            })
+            return calendar.public(event)
+
+    def calendar_import(self, params, query, body):
+        calendar = self._calendar(params)
+        if not body.get('iCalUID'):
+            raise FakeApiError(400, "Missing iCalUID.", "required")
+        with calendar.lock:
+            # Importing an iCalUID that already exists updates that event instead of adding a copy
+            existing = calendar.events.get(calendar.by_ical_uid.get(body['iCalUID'], ''))
+            if existing is not None and existing['status'] != 'cancelled':
+                return calendar.public(calendar.update(existing['id'], body, patch=False))
+            return calendar.public(calendar.insert(body))
+
+    def calendar_get(self, params, query, body):
+        calendar = self._calendar(params)
+        with calendar.lock:
+            return calendar.public(calendar.get(params['id']))
+
+    def calendar_update(self, params, query, body):
+        calendar = self._calendar(params)
+        with calendar.lock:
+            return calendar.public(calendar.update(params['id'], body, patch=False))
+
+    def calendar_patch(self, params, query, body):
+        calendar = self._calendar(params)
+        with calendar.lock:
+            return calendar.public(calendar.update(params['id'], body, patch=True))
+
+    def calendar_delete(self, params, query, body):
+        calendar = self._calendar(params)
+        with calendar.lock:
+            calendar.delete(params['id'])
+        return None
+
+    # Push notifications
+
+    def gmail_watch(self, params, query, body):
+        box = self._mailbox(params)
+        if not body.get('topicName'):
+            raise FakeApiError(400, "Invalid topicName", "invalidArgument")
+        expiration = datetime.now(timezone.utc) + timedelta(days=7)
+        with box.lock:
+            self.gmail_topic = body['topicName']
+            return {'historyId': str(box.history_id), 'expiration': str(int(expiration.timestamp() * 1000))}
+
+    def gmail_stop(self, params, query, body):
+        self._mailbox(params)
+        self.gmail_topic = None
+        return None
+
+    def calendar_watch(self, params, query, body):
+        self._calendar(params)
+        if body.get('type') != 'web_hook' or not body.get('address') or not body.get('id'):
+            raise FakeApiError(400, "Invalid channel", "invalidArgument")
+        ttl = int((body.get('params') or {}).get('ttl', 7 * 24 * 3600))
+        expiration = datetime.now(timezone.utc) + timedelta(seconds=ttl)
+        channel = {
+            'kind': 'api#channel',
+            'id': body['id'],
+            'resourceId': 'res-' + uuid.uuid4().hex[:20],
+            'resourceUri': f"https://www.googleapis.com/calendar/v3/calendars/{params['calendar']}/events?alt=json",
+            'token': body.get('token'),
+            'expiration': str(int(expiration.timestamp() * 1000)),
+        }
+        with self.stats_lock:
+            self.channels[channel['id']] = dict(channel, address=body['address'])
+        self.notifier.calendar(self.channels[channel['id']], 'sync')
+        return channel
+
+    def calendar_stop_channel(self, params, query, body):
+        with self.stats_lock:
+            channel = self.channels.get(body.get('id'))
+            if channel is None or channel['resourceId'] != body.get('resourceId'):
+                raise FakeApiError(404, "Channel not found", "notFound")
+            del self.channels[body['id']]
+        return None
+
+    def _on_mail_change(self, history_id: int):
+        if self.gmail_topic and self.gmail_push_url:
+            self.notifier.gmail(self.gmail_push_url, self.data.email, history_id)
+
+    def _on_calendar_change(self):
+        with self.stats_lock:
+            channels = list(self.channels.values())
+        for channel in channels:
+            self.notifier.calendar(channel, 'exists')
+
+    # Batch
+
+    def dispatch_batch(self, content_type: str, body: bytes) -> Tuple[str, bytes]:
+        """Executes a multipart/mixed batch request and returns the multipart response."""
+        self.count('batch')
+        envelope = BytesParser().parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+        boundary = "batch_" + uuid.uuid4().hex
+        chunks = []
+        for part in envelope.get_payload():
+            inner = part.get_payload()
+            if isinstance(inner, list):
+                inner = inner[0].as_string()
+            inner = inner.replace('\r\n', '\n')
+            request_line, _, rest = inner.partition('\n')
+            method, target = request_line.split(' ')[:2]
+            _, _, inner_body = rest.partition('\n\n')
+            status, payload = self.dispatch(method, target, inner_body.strip().encode())
+            if method == 'DELETE' and status == 200:
+                status = 204
+            content = json.dumps(payload) if status != 204 else ""
+            content_id = (part.get('Content-ID') or "<+0>").strip('<>')
+            chunks.append(
+                f"--{boundary}\r\n"
+                f"Content-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status} {'OK' if status < 300 else 'Error'}\r\n"
+                f"Content-Type: application/json; charset=UTF-8\r\n"
+                f"Content-Length: {len(content.encode())}\r\n\r\n"
+                f"{content}\r\n"
+            )
+        chunks.append(f"--{boundary}--\r\n")
+        return f"multipart/mixed; boundary={boundary}", "".join(chunks).encode()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this, Nagle's
+    # algorithm plus delayed ACKs add ~40ms to every keep-alive response.
+    disable_nagle_algorithm = True
+    server: "_FakeHTTPServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _handle(self):
+        server = self.server.owner
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b""
+        path = urlparse(self.path).path
+
+        if path.startswith('/_fake/'):
+            status, content_type, content = server.control(self.command, path, body)
+        else:
+            server.simulate_latency()
+            if path.startswith('/batch'):
+                content_type, content = server.api.dispatch_batch(self.headers.get('Content-Type', ''), body)
+                status = 200
+            else:
+                status, payload = server.api.dispatch(self.command, self.path, body)
+                content_type = 'application/json; charset=UTF-8'
+                content = json.dumps(payload).encode() if payload or status != 200 else b"{}"
+                if self.command == 'DELETE' and status == 200:
+                    status, content = 204, b""
+
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        # Compress like Google does, so transports are measured on realistic payload sizes
+        if len(content) >= GZIP_MIN_BYTES and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            content = gzip.compress(content, compresslevel=1)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _handle
+
+
+class _FakeHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    owner: "FakeGoogleAPIServer"
+
+
+class FakeGoogleAPIServer:
+    """Local HTTP stand-in for the Calendar v3 and Gmail v1 endpoints.
+
+    Args:
+        data: Seeded state to serve; a default-sized dataset is generated if omitted
+        host: Interface to bind
+        port: Port to bind (0 picks a free port)
+        latency_ms: Mean artificial latency added to every HTTP request
+        jitter_ms: Standard deviation of the artificial latency
+        gmail_push_url: Where to post Gmail notifications once `users().watch` is called
+
+    Example:
+        with FakeGoogleAPIServer(FakeGoogleData(n_messages=5000), latency_ms=20) as server:
+            tools = GmailTools(service=server.build_service('gmail', 'v1'))
+    """
+
+    def __init__(self,
+                 data: Optional[FakeGoogleData] = None,
+                 host: str = "127.0.0.1",
+                 port: int = 0,
+                 latency_ms: float = 0.0,
+                 jitter_ms: float = 0.0,
+                 gmail_push_url: Optional[str] = None):
+        self.data = data or FakeGoogleData()
+        self.api = FakeGoogleAPI(self.data, gmail_push_url)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self._httpd = _FakeHTTPServer((host, port), _Handler)
+        self._httpd.owner = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def simulate_latency(self):
+        if self.latency_ms or self.jitter_ms:
+            time.sleep(max(0.0, random.gauss(self.latency_ms, self.jitter_ms)) / 1000.0)
+
+    def control(self, method: str, path: str, body: bytes) -> Tuple[int, str, bytes]:
+        """Handles the out-of-band /_fake/* endpoints used by out-of-process harnesses."""
+        if path == '/_fake/stats':
+            payload: Any = self.api.snapshot()
+        elif path == '/_fake/ids':
+            with self.data.mailbox.lock, self.data.calendar.lock:
+                payload = {
+                    'messages': self.data.mailbox.order[:1000],
+                    'threads': list(self.data.mailbox.threads)[:1000],
+                    'events': [e['id'] for e in self.data.calendar.events.values()
+                               if e['status'] != 'cancelled'][:1000],
+                }
+        else:
+            return 404, 'application/json', b'{}'
+        return 200, 'application/json', json.dumps(payload).encode()
+
+    def build_service(self, api: str, version: str, http: Optional[Any] = None):
+        """Builds a googleapiclient service pointed at this server."""
+        return build_fake_service(api, version, self.endpoint, http=http)
+
+    def start(self) -> "FakeGoogleAPIServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def __enter__(self) -> "FakeGoogleAPIServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def build_fake_service(api: str, version: str, endpoint: str, http: Optional[Any] = None):
+    """Builds a googleapiclient service from the bundled discovery document, rooted at `endpoint`.
+
+    Rewriting `rootUrl` (rather than passing `api_endpoint`) also points
+    `new_batch_http_request()` at the fake server.
+    """
+    document = json.loads(get_static_doc(api, version))
+    document['rootUrl'] = endpoint.rstrip('/') + '/'
+    document.pop('mtlsRootUrl', None)
+    return build_from_document(document, http=http or httplib2.Http())
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a local fake Google Calendar/Gmail API server.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--messages', type=int, default=1000)
+    parser.add_argument('--events', type=int, default=500)
+    parser.add_argument('--thread-length', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    args = parser.parse_args()
+
+    data = FakeGoogleData(args.messages, args.events, args.thread_length, args.seed)
+    server = FakeGoogleAPIServer(data, args.host, args.port, args.latency_ms, args.jitter_ms)
+    print(f"Fake Google API serving on {server.endpoint}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+# benchmarks/replay_load.py
+
+import argparse
+import json
+import math
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from googleapiclient.discovery import build
+from pydantic import validate_call
+
+from tools.gmail.gmail_toolkit import GmailTools
+from tools.google_calendar.calendar_toolkit import GoogleCalendarTools
+from tools.sync.cache import ResourceCache
+from tools.sync.memo import ToolMemo
+from tools.transport.recording import Cassette, RecordedToolCall, ReplayHttp
+
+# Builds a toolkit around a replay transport, keyed by the toolkit name stored in the cassette
+TOOLKIT_FACTORIES: Dict[str, Callable[[Any, Optional[ResourceCache], Optional[ToolMemo]], Any]] = {
+    'google_calendar_tools': lambda http, cache, memo: GoogleCalendarTools(
+        service=build('calendar', 'v3', http=http, static_discovery=True), cache=cache, memo=memo),
+    'gmail_tools': lambda http, cache, memo: GmailTools(
+        service=build('gmail', 'v1', http=http, static_discovery=True), cache=cache, memo=memo),
+}
+
+# Tools that read or write local files named in their arguments (or send mail in bulk);
+# replaying them would touch the replay host's filesystem, so they are skipped
+SKIPPED_TOOLS = {'send_bulk_email', 'import_ics', 'export_ics', 'export_emails'}
+
+
+@dataclass
+class ReplayStats:
+    calls: int = 0
+    errors: int = 0
+    max_lag_ms: float = 0.0
+    latencies_ms: Dict[str, List[float]] = field(default_factory=dict)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def add(self, tool: str, latency_ms: float, lag_ms: float, failed: bool):
+        with self.lock:
+            self.calls += 1
+            self.errors += int(failed)
+            self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+            self.latencies_ms.setdefault(tool, []).append(latency_ms)
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100.0 * len(ordered)) - 1)] if ordered else math.nan
+
+
+class ReplayRunner:
+    """Re-issues recorded tool calls against a replay transport at a chosen concurrency and speed-up.
+
+    Args:
+        cassette: Recording to replay
+        concurrency: Worker threads issuing tool calls
+        speedup: Factor by which recorded inter-call gaps are compressed (0 = as fast as possible)
+        loops: Number of times to replay the recording back to back
+        latency_scale: Multiplier applied to the recorded API latency of each exchange
+        cache: Optional resource cache shared by every worker's toolkits
+        memo: Optional tool result memo shared by every worker's toolkits
+    """
+
+    def __init__(self, cassette: Cassette, concurrency: int = 8, speedup: float = 100.0,
+                 loops: int = 1, latency_scale: float = 0.0, cache: Optional[ResourceCache] = None,
+                 memo: Optional[ToolMemo] = None):
+        self.cassette = cassette
+        self.concurrency = concurrency
+        self.speedup = speedup
+        self.loops = loops
+        self.cache = cache
+        self.memo = memo
+        self.http = ReplayHttp(cassette, latency_scale)
+        self._local = threading.local()
+
+    def _toolkit(self, name: str):
+        # googleapiclient services aren't thread-safe, so each worker builds its own
+        toolkits = getattr(self._local, 'toolkits', None)
+        if toolkits is None:
+            toolkits = self._local.toolkits = {}
+        if name not in toolkits:
+            toolkits[name] = TOOLKIT_FACTORIES[name](self.http, self.cache, self.memo)
+        return toolkits[name]
+
+    def _call(self, call: RecordedToolCall, due: float, stats: ReplayStats):
+        lag_ms = max(0.0, time.perf_counter() - due) * 1000.0
+        started = time.perf_counter()
+        try:
+            # Inside the try: exceptions in worker futures are otherwise never seen
+            toolkit = self._toolkit(call.toolkit)
+            function = validate_call(toolkit.functions[call.tool].entrypoint)
+            output = function(**call.args)
+            failed = isinstance(output, str) and output.startswith("❌")
+        except Exception:
+            failed = True
+        stats.add(call.tool, (time.perf_counter() - started) * 1000.0, lag_ms, failed)
+
+    def run(self) -> Dict[str, Any]:
+        calls = [c for c in self.cassette.tool_calls if c.toolkit in TOOLKIT_FACTORIES]
+        skipped = sum(1 for c in calls if c.tool in SKIPPED_TOOLS)
+        calls = [c for c in calls if c.tool not in SKIPPED_TOOLS]
+        if not calls:
+            raise ValueError("Cassette contains no replayable tool calls")
+        span = calls[-1].offset - calls[0].offset + 1e-3
+        stats = ReplayStats()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for loop in range(self.loops):
+                for call in calls:
+                    offset = loop * span + (call.offset - calls[0].offset)
+                    due = started + (offset / self.speedup if self.speedup else 0.0)
+                    delay = due - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    pool.submit(self._call, call, due, stats)
+        wall = time.perf_counter() - started
+
+        per_tool = {
+            tool: {
+                'calls': len(values),
+                'p50_ms': _percentile(values, 50),
+                'p95_ms': _percentile(values, 95),
+                'p99_ms': _percentile(values, 99),
+                'mean_ms': statistics.fmean(values),
+            }
+            for tool, values in sorted(stats.latencies_ms.items())
+        }
+        recorded_rate = len(calls) / span
+        return {
+            'calls': stats.calls,
+            'errors': stats.errors,
+            'skipped': skipped * self.loops,
+            'transport_misses': self.http.misses,
+            'wall_s': wall,
+            'throughput_per_s': stats.calls / wall if wall else math.nan,
+            'recorded_rate_per_s': recorded_rate,
+            'max_schedule_lag_ms': stats.max_lag_ms,
+            'tools': per_tool,
+        }
+
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Returns a description of every metric that regressed by more than `tolerance` (a fraction)."""
+    regressions = []
+    if result['throughput_per_s'] < baseline['throughput_per_s'] * (1 - tolerance):
+        regressions.append(f"throughput {result['throughput_per_s']:.1f}/s "
+                           f"< baseline {baseline['throughput_per_s']:.1f}/s")
+    for tool, metrics in result['tools'].items():
+        before = baseline['tools'].get(tool)
+        if before and metrics['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{tool} p95 {metrics['p95_ms']:.2f}ms > baseline {before['p95_ms']:.2f}ms")
+    return regressions
+
+
+def format_report(result: Dict[str, Any]) -> str:
+    lines = [
+        f"Replayed {result['calls']} tool calls in {result['wall_s']:.2f}s "
+        f"({result['throughput_per_s']:.1f} calls/s, recorded rate {result['recorded_rate_per_s']:.2f} calls/s)",
+        f"Errors: {result['errors']}, skipped: {result['skipped']}, transport misses: {result['transport_misses']}, "
+        f"max schedule lag: {result['max_schedule_lag_ms']:.1f}ms",
+        "",
+        "| Tool | Calls | p50 ms | p95 ms | p99 ms | Mean ms |",
+        "|---|---:|---:|---:|---:|---:|",
+    ]
+    for tool, m in result['tools'].items():
+        lines.append(f"| {tool} | {m['calls']} | {m['p50_ms']:.2f} | {m['p95_ms']:.2f} "
+                     f"| {m['p99_ms']:.2f} | {m['mean_ms']:.2f} |")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay a recorded agent session as a load test.")
+    parser.add_argument('cassette', help="Recording written by SessionRecorder")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--speedup', type=float, default=100.0, help="Replay rate relative to the recording (0 = unthrottled)")
+    parser.add_argument('--loops', type=int, default=1)
+    parser.add_argument('--latency-scale', type=float, default=0.0, help="Fraction of recorded API latency to simulate")
+    parser.add_argument('--cache', action='store_true', help="Serve repeated reads from an in-memory ResourceCache")
+    parser.add_argument('--memo', dest='memo_path', help="Memoize read-only tool results in this SQLite file")
+    parser.add_argument('--json', dest='json_path', help="Write results to this JSON file")
+    parser.add_argument('--baseline', help="Earlier --json output to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.1, help="Allowed regression before failing (fraction)")
+    args = parser.parse_args(argv)
+
+    runner = ReplayRunner(Cassette.load(args.cassette), args.concurrency, args.speedup,
+                          args.loops, args.latency_scale,
+                          cache=ResourceCache() if args.cache else None,
+                          memo=ToolMemo(args.memo_path) if args.memo_path else None)
+    result = runner.run()
+    print(format_report(result))
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(result, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"❌ Regression: {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
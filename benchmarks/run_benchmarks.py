@@ -0,0 +1,304 @@
+# benchmarks/run_benchmarks.py
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+import urllib.request
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from phi.tools import Toolkit
+
+from tools.gmail.gmail_toolkit import GmailTools
+from tools.google_calendar.calendar_toolkit import GoogleCalendarTools
+from tools.sync.memo import ToolMemo
+from tools.transport.pooled import PooledHttp
+from .fake_google_api import FakeGoogleAPIServer, FakeGoogleData, build_fake_service
+
+
+@dataclass
+class BenchContext:
+    """State handed to each case so it can build arguments for a tool call."""
+    endpoint: str
+    ids: Dict[str, List[str]]
+    calendar_service: Any
+    gmail_service: Any
+
+    def pick(self, kind: str, i: int) -> str:
+        values = self.ids[kind]
+        return values[i % len(values)]
+
+    def fresh_event_id(self, i: int) -> str:
+        event = self.calendar_service.events().insert(calendarId='primary', body={
+            'summary': f"Disposable {i}",
+            'start': {'dateTime': '2030-01-01T10:00:00Z'},
+            'end': {'dateTime': '2030-01-01T11:00:00Z'},
+        }).execute()
+        return event['id']
+
+
+# Each case maps a registered tool name to a factory producing its keyword arguments.
+# Factories run outside the timed region, so any setup calls they make are not counted.
+Case = Callable[[BenchContext, int], Dict[str, Any]]
+
+TOOL_CASES: Dict[str, Case] = {
+    # GoogleCalendarTools
+    'create_event': lambda ctx, i: {'title': f"Benchmark {i}", 'start_time': "2030-03-04 14:00",
+                                    'duration_minutes': 30, 'guests': ["a@example.com", "b@example.com"]},
+    'list_events': lambda ctx, i: {'days': 30, 'max_results': 50},
+    'get_event': lambda ctx, i: {'event_id': ctx.pick('events', i)},
+    'delete_event': lambda ctx, i: {'event_id': ctx.fresh_event_id(i)},
+    'quick_add_event': lambda ctx, i: {'text': f"Lunch with Sam {i} tomorrow at 1pm"},
+    'import_ics': lambda ctx, i: {'file_path': _ics_fixture(i)},
+    'export_ics': lambda ctx, i: {'file_path': _bench_path(f"export-{i % 2}.ics"),
+                                  'start': "2020-01-01", 'end': "2040-01-01"},
+    # GmailTools
+    'send_email': lambda ctx, i: {'to': "someone@example.com", 'subject': f"Benchmark {i}", 'body': "Hello"},
+    'create_draft': lambda ctx, i: {'to': "someone@example.com", 'subject': f"Draft {i}", 'body': "Hello"},
+    'list_emails': lambda ctx, i: {'max_results': 25},
+    'read_email': lambda ctx, i: {'message_id': ctx.pick('messages', i)},
+    'create_label': lambda ctx, i: {'label': _email_label(f"bench-{time.time_ns()}-{i}")},
+    'list_labels': lambda ctx, i: {},
+    'apply_label': lambda ctx, i: {'message_id': ctx.pick('messages', i), 'label_ids': ['STARRED']},
+    'search_emails': lambda ctx, i: {'query': "subject:budget", 'max_results': 25},
+    'get_email_thread': lambda ctx, i: {'thread_id': ctx.pick('threads', i)},
+    'export_emails': lambda ctx, i: {'query': "subject:budget", 'output_path': _bench_path(f"export-{i % 2}.mbox"),
+                                     'max_messages': 200, 'resume': False},
+    'triage_inbox': lambda ctx, i: {'rules': _triage_rules(), 'max_results': 100},
+    'send_bulk_email': lambda ctx, i: {'recipients_file': _recipients_fixture(), 'subject': "Hello {{name}}",
+                                       'body': "Hi {{name}},\n\nBenchmark run {{run}}.",
+                                       'journal_path': _bench_path(f"merge-{time.time_ns()}-{i}.journal")},
+}
+
+
+def _bench_path(name: str) -> str:
+    directory = os.path.join(tempfile.gettempdir(), "google-tools-bench", str(os.getpid()))
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, name)
+
+
+def _ics_fixture(i: int, n_events: int = 50) -> str:
+    """Writes an .ics file of new (never imported) events, half of them weekly recurring."""
+    path = _bench_path(f"import-{i}.ics")
+    with open(path, 'w', newline='') as f:
+        f.write("BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//bench//EN\r\n")
+        for n in range(n_events):
+            f.write(
+                f"BEGIN:VEVENT\r\nUID:bench-{time.time_ns()}-{n}@example.com\r\n"
+                f"DTSTART;TZID=Europe/Berlin:2031{1 + n % 12:02d}{1 + n % 28:02d}T{8 + n % 10:02d}0000\r\n"
+                f"DURATION:PT45M\r\nSUMMARY:Imported {i}-{n}\r\n"
+                f"ATTENDEE;CN=Guest;PARTSTAT=ACCEPTED:mailto:guest{n}@example.com\r\n"
+                + ("RRULE:FREQ=WEEKLY;COUNT=10\r\n" if n % 2 else "")
+                + "END:VEVENT\r\n"
+            )
+        f.write("END:VCALENDAR\r\n")
+    return path
+
+
+def _recipients_fixture(n_recipients: int = 3) -> str:
+    """Writes a small mail merge file; sends are rate limited to Gmail's quota, so each call takes about a second."""
+    path = _bench_path("recipients.csv")
+    with open(path, 'w', newline='') as f:
+        f.write("email,name,run\n")
+        for n in range(n_recipients):
+            f.write(f"guest{n}@example.com,Guest {n},{os.getpid()}\n")
+    return path
+
+
+def _triage_rules():
+    from tools.gmail.gmail_types import TriageRule
+    return [TriageRule(label="Bench/Vendors", from_pattern=r'@vendor\.example\.io'),
+            TriageRule(label="Bench/Replies", subject_pattern=r'^re:', mark_read=True)]
+
+
+def _email_label(name: str):
+    from tools.gmail.gmail_types import EmailLabel
+    return EmailLabel(name=name)
+
+
+@dataclass
+class ToolResult:
+    toolkit: str
+    tool: str
+    calls: int = 0
+    errors: int = 0
+    latencies_ms: List[float] = field(default_factory=list)
+    requests_per_call: float = 0.0
+    requests_by_method: Dict[str, float] = field(default_factory=dict)
+    peak_kib: float = 0.0
+
+    def percentile(self, pct: float) -> float:
+        if not self.latencies_ms:
+            return math.nan
+        ordered = sorted(self.latencies_ms)
+        rank = max(0, math.ceil(pct / 100.0 * len(ordered)) - 1)
+        return ordered[rank]
+
+    def summary(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data.pop('latencies_ms')
+        data.update({
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'p99_ms': self.percentile(99),
+            'mean_ms': statistics.fmean(self.latencies_ms) if self.latencies_ms else math.nan,
+        })
+        return data
+
+
+def fetch_json(endpoint: str, path: str) -> Any:
+    with urllib.request.urlopen(endpoint + path) as response:
+        return json.loads(response.read())
+
+
+def _serve(queue, n_messages, n_events, thread_length, seed, latency_ms, jitter_ms):
+    # list_events looks ahead from the real clock, so events are seeded around today rather than the
+    # fixed default epoch; contents and ids still depend only on the seed
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    data = FakeGoogleData(n_messages, n_events, thread_length, seed, epoch=today)
+    server = FakeGoogleAPIServer(data, latency_ms=latency_ms, jitter_ms=jitter_ms)
+    queue.put(server.endpoint)
+    server.serve_forever()
+
+
+def start_server_process(n_messages: int, n_events: int, thread_length: int, seed: int,
+                         latency_ms: float, jitter_ms: float):
+    """Runs the fake server in a child process so its CPU and memory stay out of the measurements."""
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=_serve,
+        args=(queue, n_messages, n_events, thread_length, seed, latency_ms, jitter_ms),
+        daemon=True,
+    )
+    process.start()
+    return process, queue.get(timeout=300)
+
+
+def _diff(before: Dict[str, int], after: Dict[str, int]) -> Dict[str, int]:
+    return {k: after.get(k, 0) - before.get(k, 0) for k in after if after.get(k, 0) != before.get(k, 0)}
+
+
+def benchmark_tool(toolkit: Toolkit, name: str, case: Case, ctx: BenchContext,
+                   iterations: int, warmup: int, memory_iterations: int) -> ToolResult:
+    function = toolkit.functions[name].entrypoint
+    result = ToolResult(toolkit=toolkit.name, tool=name)
+
+    for i in range(warmup):
+        function(**case(ctx, i))
+
+    requests: Dict[str, int] = {}
+    for i in range(iterations):
+        kwargs = case(ctx, warmup + i)
+        before = fetch_json(ctx.endpoint, '/_fake/stats')
+        started = time.perf_counter()
+        output = function(**kwargs)
+        result.latencies_ms.append((time.perf_counter() - started) * 1000.0)
+        for method, count in _diff(before, fetch_json(ctx.endpoint, '/_fake/stats')).items():
+            requests[method] = requests.get(method, 0) + count
+        result.calls += 1
+        if isinstance(output, str) and output.startswith("❌"):
+            result.errors += 1
+
+    if iterations:
+        result.requests_by_method = {k: v / iterations for k, v in sorted(requests.items())}
+        result.requests_per_call = sum(requests.values()) / iterations
+
+    if memory_iterations:
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        for i in range(memory_iterations):
+            kwargs = case(ctx, warmup + iterations + i)
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            function(**kwargs)
+            result.peak_kib = max(result.peak_kib, (tracemalloc.get_traced_memory()[1] - baseline) / 1024.0)
+        tracemalloc.stop()
+    return result
+
+
+def run(args: argparse.Namespace) -> List[ToolResult]:
+    if args.endpoint:
+        process, endpoint = None, args.endpoint.rstrip('/')
+    else:
+        process, endpoint = start_server_process(args.messages, args.events, args.thread_length,
+                                                 args.seed, args.latency_ms, args.jitter_ms)
+    try:
+        # httplib2 gives each service its own connections; the pooled transport shares one pool
+        make_http = PooledHttp if args.transport == 'pooled' else lambda: None
+        calendar_service = build_fake_service('calendar', 'v3', endpoint, http=make_http())
+        gmail_service = build_fake_service('gmail', 'v1', endpoint, http=make_http())
+        ctx = BenchContext(endpoint, fetch_json(endpoint, '/_fake/ids'),
+                           build_fake_service('calendar', 'v3', endpoint),
+                           build_fake_service('gmail', 'v1', endpoint))
+        # A fresh memo per run, so hits only come from calls made during this run
+        memo = ToolMemo(_bench_path(f"memo-{time.time_ns()}.db")) if args.memo else None
+        toolkits = [GoogleCalendarTools(service=calendar_service, memo=memo), GmailTools(service=gmail_service, memo=memo)]
+
+        results = []
+        for toolkit in toolkits:
+            for name in toolkit.functions:
+                if args.only and name not in args.only:
+                    continue
+                case = TOOL_CASES.get(name)
+                if case is None:
+                    print(f"⚠️  No benchmark case for {toolkit.name}.{name}, skipping")
+                    continue
+                results.append(benchmark_tool(toolkit, name, case, ctx, args.iterations,
+                                              args.warmup, args.memory_iterations))
+        return results
+    finally:
+        if process is not None:
+            process.terminate()
+            process.join()
+
+
+def format_table(results: List[ToolResult]) -> str:
+    lines = [
+        "| Tool | Calls | Errors | p50 ms | p95 ms | p99 ms | Mean ms | API req/call | Peak KiB |",
+        "|---|---:|---:|---:|---:|---:|---:|---:|---:|",
+    ]
+    for result in results:
+        s = result.summary()
+        lines.append(
+            f"| {s['toolkit']}.{s['tool']} | {s['calls']} | {s['errors']} | {s['p50_ms']:.2f} "
+            f"| {s['p95_ms']:.2f} | {s['p99_ms']:.2f} | {s['mean_ms']:.2f} "
+            f"| {s['requests_per_call']:.2f} | {s['peak_kib']:.1f} |"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark the Calendar and Gmail toolkits against a local fake API.")
+    parser.add_argument('--messages', type=int, default=2000, help="Messages seeded into the fake mailbox")
+    parser.add_argument('--events', type=int, default=1000, help="Events seeded into the fake calendar")
+    parser.add_argument('--thread-length', type=int, default=3, help="Average messages per thread")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="Mean latency added per HTTP request")
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help="Latency standard deviation")
+    parser.add_argument('--iterations', type=int, default=50, help="Timed calls per tool")
+    parser.add_argument('--warmup', type=int, default=3, help="Untimed calls per tool")
+    parser.add_argument('--memory-iterations', type=int, default=3, help="Calls per tool traced with tracemalloc")
+    parser.add_argument('--only', nargs='*', help="Restrict to these tool names")
+    parser.add_argument('--transport', choices=['httplib2', 'pooled'], default='httplib2',
+                        help="HTTP transport the toolkits' services use")
+    parser.add_argument('--memo', action='store_true', help="Serve read-only tools through a persistent ToolMemo")
+    parser.add_argument('--endpoint', help="Use an already running fake server instead of starting one")
+    parser.add_argument('--json', dest='json_path', help="Also write raw results to this JSON file")
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    print(format_table(results))
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump({'config': vars(args), 'results': [r.summary() for r in results]}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
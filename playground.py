@@ -1,3 +1,6 @@
+import os
+import atexit
+import threading
 from phi.agent import Agent
 from phi.storage.agent.sqlite import SqlAgentStorage
 from phi.model.openai import OpenAIChat
@@ -7,10 +10,91 @@ from phi.playground import Playground, serve_playground_app
 from dotenv import load_dotenv
 from tools.google_calendar.calendar_toolkit import GoogleCalendarTools
 from tools.gmail.gmail_toolkit import GmailTools
+from tools.transport.pooled import PooledHttp, shared_pool_manager
+from tools.transport.recording import SessionRecorder, pseudonymize_emails
+from tools.gmail.gmail_auth import GmailAuth
+from tools.google_calendar.calendar_auth import GoogleCalendarAuth
+from tools.sync.cache import ResourceCache
+from tools.sync.memo import ToolMemo
+from tools.sync.push import PushSyncHub
+from tools.sync.webhook import build_webhook_router
+from tools.tenancy.credentials import FileCredentialStore
+from tools.tenancy.pool import ServicePool
 
 # Load environment variables
 load_dotenv()
 
+# All Google API traffic (both toolkits, push sync and token refreshes) shares one keep-alive
+# connection pool; connections are opened in the background so the first tool call doesn't pay for TLS
+http = PooledHttp(shared_pool_manager(
+    connections_per_host=int(os.getenv("GOOGLE_HTTP_CONNECTIONS_PER_HOST", "10"))))
+threading.Thread(target=http.warm, name="google-http-warmup", daemon=True).start()
+
+# Optionally record tool calls and Google API traffic for offline replay (see benchmarks/replay_load.py)
+recorder = None
+if os.getenv("TOOL_RECORDING_PATH"):
+    recorder = SessionRecorder(os.environ["TOOL_RECORDING_PATH"], redact=pseudonymize_emails)
+    atexit.register(recorder.close)
+
+# Optionally memoize read-only tool results (get_event, read_email, ...) in SQLite next to the agent
+# storage, so resumed sessions and other workers get unchanged resources back without refetching them
+memo = None
+if os.getenv("TOOL_MEMO_PATH"):
+    memo = ToolMemo(os.environ["TOOL_MEMO_PATH"], max_bytes=int(os.getenv("TOOL_MEMO_MAX_MB", "64")) * 1024 * 1024)
+
+# Files named in tool arguments (.ics imports/exports, mail exports, mail merge recipients, ...) are confined to TOOL_FILES_DIR/<user_id>/
+files_dir = os.getenv("TOOL_FILES_DIR", "tmp/files")
+
+# Optionally serve many Google accounts from one deployment. Tools act for the playground's
+# user_id, whose credentials are added with `python -m tools.tenancy.credentials <user_id>`.
+# The playground takes user_id from the client unauthenticated, so any caller can act as any
+# stored user; the operator must opt in after putting an authenticating proxy in front of it.
+calendar_pool = gmail_pool = None
+if os.getenv("MULTI_TENANT_CREDENTIALS_DIR"):
+    if os.getenv("MULTI_TENANT_TRUST_USER_ID", "").lower() != "true":
+        raise RuntimeError("Multi-tenant mode trusts the client-supplied user_id; set MULTI_TENANT_TRUST_USER_ID=true "
+                           "only if every request is authenticated and its user_id enforced upstream")
+    credential_store = FileCredentialStore(os.environ["MULTI_TENANT_CREDENTIALS_DIR"])
+    pool_size = int(os.getenv("SERVICE_POOL_SIZE", "256"))
+    calendar_pool = ServicePool(
+        lambda user: GoogleCalendarAuth.get_calendar_service(
+            http=http, credentials=credential_store.load(user, 'calendar', GoogleCalendarAuth.SCOPES),
+            save_credentials=lambda creds: credential_store.save(user, 'calendar', creds)),
+        max_size=pool_size,
+    )
+    gmail_pool = ServicePool(
+        lambda user: GmailAuth.get_gmail_service(
+            http=http, credentials=credential_store.load(user, 'gmail', GmailAuth.SCOPES),
+            save_credentials=lambda creds: credential_store.save(user, 'gmail', creds)),
+        max_size=pool_size,
+    )
+    for pool in (calendar_pool, gmail_pool):
+        pool.start_reaper()
+        atexit.register(pool.stop)
+
+# Optionally keep a local cache of Google resources fresh via push notifications.
+# PUSH_WEBHOOK_BASE_URL must be the public URL of this app's /webhooks/google route.
+# Cached resources are only invalidated for watched accounts, and the playground only watches
+# its own account, so the cache stays off in multi-tenant mode. Entries also expire after
+# PUSH_CACHE_TTL_SECONDS, bounding staleness if a notification is lost or a channel lapses.
+cache = (ResourceCache(ttl_seconds=float(os.getenv("PUSH_CACHE_TTL_SECONDS", "300")))
+         if os.getenv("PUSH_WEBHOOK_BASE_URL") and calendar_pool is None else None)
+# Gmail resources are only kept fresh when GMAIL_PUSH_TOPIC is set too
+gmail_cache = cache if os.getenv("GMAIL_PUSH_TOPIC") else None
+
+def build_tools():
+    if recorder is None:
+        return [
+            GoogleCalendarTools(http=http, cache=cache, pool=calendar_pool, memo=memo, files_dir=files_dir),
+            GmailTools(http=http, cache=gmail_cache, pool=gmail_pool, memo=memo, files_dir=files_dir),
+        ]
+    return [
+        recorder.instrument(GoogleCalendarTools(http=recorder.http(http), cache=cache, pool=calendar_pool, memo=memo,
+                                                 files_dir=files_dir)),
+        recorder.instrument(GmailTools(http=recorder.http(http), cache=gmail_cache, pool=gmail_pool, memo=memo,
+                                       files_dir=files_dir)),
+    ]
+
 # Create knowledge base
 knowledge_base = PDFKnowledgeBase(
     path="data",  # Directory where you'll store your PDFs
@@ -163,7 +247,7 @@ instructions=[
         table_name="agent_sessions",
         db_file="tmp/agents.db"
     ),
-    tools=[GoogleCalendarTools(), GmailTools()],
+    tools=build_tools(),
     add_history_to_messages=True,
     markdown=True,
 )
@@ -171,6 +255,22 @@ instructions=[
 # Create the playground
 app = Playground(agents=[agent]).get_app()
 
+if cache is not None:
+    # Raises at startup if GMAIL_PUSH_TOPIC is set without PUSH_VERIFICATION_TOKEN
+    hub = PushSyncHub(
+        cache,
+        webhook_base_url=os.environ["PUSH_WEBHOOK_BASE_URL"],
+        gmail_topic=os.getenv("GMAIL_PUSH_TOPIC"),
+        verification_token=os.getenv("PUSH_VERIFICATION_TOKEN"),
+    )
+    app.include_router(build_webhook_router(hub))
+    # The hub syncs from background threads, so it gets its own service instances
+    hub.watch_calendar('me', GoogleCalendarAuth.get_calendar_service(http=http))
+    if hub.gmail_topic:
+        hub.watch_gmail('me', GmailAuth.get_gmail_service(http=http))
+    hub.start_renewal()
+    atexit.register(hub.stop)
+
 if __name__ == "__main__":
     # First time setup: Load the knowledge base
     # Comment out after first run
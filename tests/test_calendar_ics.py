@@ -0,0 +1,195 @@
+# tests/test_calendar_ics.py
+
+import io
+from typing import Any, Dict, List
+
+import pytest
+
+from tools.google_calendar.calendar_ics import IcsImporter, IcsReader, event_to_vevent, fold, unfold, write_ics
+
+
+def calendar(*lines: str) -> io.StringIO:
+    return io.StringIO("\r\n".join(["BEGIN:VCALENDAR", "VERSION:2.0", *lines, "END:VCALENDAR"]) + "\r\n")
+
+
+def bodies(source: io.StringIO) -> List[Dict[str, Any]]:
+    reader = IcsReader(source)
+    return [reader.to_event_body(props) for props in reader.events()]
+
+
+class FakeRequest:
+    def __init__(self, response: Dict[str, Any]):
+        self.response = response
+
+    def execute(self) -> Dict[str, Any]:
+        return self.response
+
+
+class FakeCalendarService:
+    """Serves fixed pages to `events().list`, as write_ics consumes them."""
+
+    def __init__(self, pages: List[Dict[str, Any]]):
+        self.pages = pages
+
+    def events(self):
+        return self
+
+    def list(self, pageToken=None, **kwargs):
+        index = int(pageToken or 0)
+        page = dict(self.pages[index])
+        if index + 1 < len(self.pages):
+            page['nextPageToken'] = str(index + 1)
+        return FakeRequest(page)
+
+
+def test_fold_and_unfold_round_trip():
+    line = "DESCRIPTION:" + "Ünïcode text " * 20
+    folded = fold(line)
+    assert all(len(chunk.encode()) <= 75 for chunk in folded.split("\r\n")[:-1])
+    assert list(unfold(folded.splitlines(keepends=True))) == [line]
+
+
+def test_reads_event_properties():
+    [body] = bodies(calendar(
+        "BEGIN:VEVENT",
+        "UID:standup@example.com",
+        "SUMMARY:Standup\\, daily",
+        "DESCRIPTION:Line one\\nLine two",
+        "DTSTART;TZID=Europe/Paris:20240105T090000",
+        "DURATION:PT15M",
+        "RRULE:FREQ=DAILY",
+        "EXDATE;TZID=Europe/Paris:20240106T090000",
+        "ATTENDEE;CN=Bob;PARTSTAT=ACCEPTED;ROLE=OPT-PARTICIPANT:mailto:bob@example.com",
+        "BEGIN:VALARM",
+        "SUMMARY:Reminder",
+        "END:VALARM",
+        "END:VEVENT",
+    ))
+    assert body['iCalUID'] == "standup@example.com"
+    assert body['summary'] == "Standup, daily"
+    assert body['description'] == "Line one\nLine two"
+    assert body['start'] == {'dateTime': "2024-01-05T09:00:00", 'timeZone': "Europe/Paris"}
+    assert body['end'] == {'dateTime': "2024-01-05T09:15:00", 'timeZone': "Europe/Paris"}
+    assert body['recurrence'] == ["RRULE:FREQ=DAILY", "EXDATE;TZID=Europe/Paris:20240106T090000"]
+    assert body['attendees'] == [
+        {'email': "bob@example.com", 'displayName': "Bob", 'responseStatus': "accepted", 'optional': True}]
+
+
+def test_all_day_event_defaults_to_one_day():
+    [body] = bodies(calendar("BEGIN:VEVENT", "UID:a", "DTSTART;VALUE=DATE:20240105", "END:VEVENT"))
+    assert body['start'] == {'date': "2024-01-05"}
+    assert body['end'] == {'date': "2024-01-06"}
+
+
+@pytest.mark.parametrize("tzid, expected", [
+    ("Europe/Paris", "Europe/Paris"),
+    ("/mozilla.org/20070129_1/Europe/Paris", "Europe/Paris"),
+    ("Eastern Standard Time", "America/New_York"),
+    ("W. Europe Standard Time", "Europe/Berlin"),
+])
+def test_resolves_timezone_names(tzid, expected):
+    [body] = bodies(calendar("BEGIN:VEVENT", "UID:a", f"DTSTART;TZID=\"{tzid}\":20240105T090000", "END:VEVENT"))
+    assert body['start']['timeZone'] == expected
+
+
+def test_resolves_tzid_through_vtimezone_location():
+    [body] = bodies(calendar(
+        "BEGIN:VTIMEZONE",
+        "TZID:Custom Zone",
+        "X-LIC-LOCATION:Asia/Tokyo",
+        "BEGIN:STANDARD",
+        "TZOFFSETFROM:+0900",
+        "TZOFFSETTO:+0900",
+        "END:STANDARD",
+        "END:VTIMEZONE",
+        "BEGIN:VEVENT", "UID:a", "DTSTART;TZID=Custom Zone:20240105T090000", "END:VEVENT",
+    ))
+    assert body['start']['timeZone'] == "Asia/Tokyo"
+
+
+def test_unknown_timezone_is_an_error_not_a_guess():
+    reader = IcsReader(calendar(
+        "X-WR-TIMEZONE:Europe/Paris",
+        "BEGIN:VEVENT", "UID:a", "DTSTART;TZID=\"(UTC-05:00) Eastern Time\":20240105T090000", "END:VEVENT",
+    ))
+    [props] = list(reader.events())
+    with pytest.raises(ValueError, match="Unknown time zone"):
+        reader.to_event_body(props)
+
+
+def test_floating_time_uses_calendar_timezone():
+    [body] = bodies(calendar("X-WR-TIMEZONE:Europe/Paris", "BEGIN:VEVENT", "UID:a", "DTSTART:20240105T090000", "END:VEVENT"))
+    assert body['start'] == {'dateTime': "2024-01-05T09:00:00", 'timeZone': "Europe/Paris"}
+
+
+def test_importer_skips_cancelled_overridden_and_invalid_events():
+    class NoServerImporter(IcsImporter):
+        def _existing_uids(self):
+            return {"existing"}
+
+        def _flush(self, batch, result):
+            result.imported += len(batch)
+
+    result = NoServerImporter(service=None).run(calendar(
+        "BEGIN:VEVENT", "UID:live", "DTSTART:20240105T090000Z", "END:VEVENT",
+        "BEGIN:VEVENT", "UID:gone", "STATUS:CANCELLED", "DTSTART:20240105T090000Z", "END:VEVENT",
+        "BEGIN:VEVENT", "UID:live", "RECURRENCE-ID:20240105T090000Z", "DTSTART:20240105T100000Z", "END:VEVENT",
+        "BEGIN:VEVENT", "UID:existing", "DTSTART:20240105T090000Z", "END:VEVENT",
+        "BEGIN:VEVENT", "UID:bad", "SUMMARY:Outlook meeting", "DTSTART;TZID=Nowhere:20240105T090000", "END:VEVENT",
+    ))
+    assert (result.imported, result.cancelled, result.skipped, result.duplicates) == (1, 1, 2, 1)
+    assert result.errors == ["Outlook meeting: Unknown time zone 'Nowhere'"]
+
+
+def test_event_round_trips_through_vevent():
+    event = {
+        'id': "abc",
+        'iCalUID': "abc@google.com",
+        'summary': "Planning; Q3, budget",
+        'start': {'dateTime': "2024-01-05T09:00:00+01:00", 'timeZone': "Europe/Paris"},
+        'end': {'dateTime': "2024-01-05T10:00:00+01:00", 'timeZone': "Europe/Paris"},
+        'recurrence': ["RRULE:FREQ=WEEKLY;BYDAY=FR"],
+        'attendees': [{'email': "bob@example.com", 'responseStatus': "tentative"}],
+    }
+    [body] = bodies(calendar(*event_to_vevent(event).rstrip("\r\n").split("\r\n")))
+    assert body['iCalUID'] == "abc@google.com"
+    assert body['summary'] == "Planning; Q3, budget"
+    assert body['start'] == {'dateTime': "2024-01-05T09:00:00", 'timeZone': "Europe/Paris"}
+    assert body['recurrence'] == ["RRULE:FREQ=WEEKLY;BYDAY=FR"]
+    assert body['attendees'][0]['responseStatus'] == "tentative"
+
+
+def test_write_ics_keeps_deleted_occurrences_deleted():
+    parent = {
+        'id': "weekly",
+        'iCalUID': "weekly@google.com",
+        'summary': "Weekly",
+        'start': {'dateTime': "2024-01-01T09:00:00+01:00", 'timeZone': "Europe/Paris"},
+        'end': {'dateTime': "2024-01-01T09:30:00+01:00", 'timeZone': "Europe/Paris"},
+        'recurrence': ["RRULE:FREQ=WEEKLY"],
+    }
+
+    def deleted(day: int) -> Dict[str, Any]:
+        return {
+            'id': f"weekly_{day}",
+            'status': "cancelled",
+            'recurringEventId': "weekly",
+            'originalStartTime': {'dateTime': f"2024-01-{day:02d}T09:00:00+01:00", 'timeZone': "Europe/Paris"},
+        }
+
+    service = FakeCalendarService([
+        {'timeZone': "Europe/Paris", 'items': [deleted(8)]},
+        {'items': [parent, deleted(15), {**deleted(22), 'recurringEventId': "not-exported"}]},
+    ])
+    out = io.StringIO()
+    assert write_ics(service, out) == 1
+
+    reader = IcsReader(io.StringIO(out.getvalue()))
+    events = list(reader.events())
+    assert len(events) == 2
+    assert reader.to_event_body(events[0])['recurrence'] == [
+        "RRULE:FREQ=WEEKLY", "EXDATE;TZID=Europe/Paris:20240108T090000"]
+    override = {prop.name: prop for prop in events[1]}
+    assert override['UID'].value == "weekly@google.com"
+    assert override['RECURRENCE-ID'].raw() == "RECURRENCE-ID;TZID=Europe/Paris:20240115T090000"
+    assert override['STATUS'].value == "CANCELLED"
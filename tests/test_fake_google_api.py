@@ -0,0 +1,26 @@
+# tests/test_fake_google_api.py
+
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.fake_google_api import SEED_EPOCH, FakeGoogleData
+
+
+def snapshot(data: FakeGoogleData):
+    return data.mailbox.messages, data.calendar.events
+
+
+def test_same_seed_gives_the_same_data():
+    assert snapshot(FakeGoogleData(50, 50, seed=7)) == snapshot(FakeGoogleData(50, 50, seed=7))
+    assert snapshot(FakeGoogleData(50, 50, seed=7)) != snapshot(FakeGoogleData(50, 50, seed=8))
+
+
+def test_seeded_data_is_dated_around_the_epoch():
+    data = FakeGoogleData(50, 50, seed=1)
+    dates = [message['internalDate'] / 1000 for message in data.mailbox.messages.values()]
+    assert max(dates) <= (SEED_EPOCH + timedelta(days=365)).timestamp()
+    assert min(dates) >= (SEED_EPOCH - timedelta(days=366)).timestamp()
+
+    epoch = datetime(2030, 6, 1, tzinfo=timezone.utc)
+    moved = FakeGoogleData(50, 50, seed=1, epoch=epoch)
+    assert [m['id'] for m in moved.mailbox.messages.values()] == list(data.mailbox.messages)
+    assert all(event['created'].startswith("2030-06-01") for event in moved.calendar.events.values())
@@ -0,0 +1,159 @@
+# tests/test_gmail_merge.py
+
+import hashlib
+import json
+import os
+
+import pytest
+
+from benchmarks.fake_google_api import FakeGoogleAPIServer, FakeGoogleData
+from tools.gmail.gmail_merge import MailMerge, SendJournal, load_recipients, render
+from tools.gmail.gmail_toolkit import GmailTools
+
+SUBJECT = "Hi {{name}}"
+BODY = "Hello {{name}}, see you at the launch."
+
+
+@pytest.fixture
+def recipients(tmp_path):
+    path = tmp_path / "recipients.csv"
+    path.write_text("email,name\n" + "".join(f"user{n}@example.com,User {n}\n" for n in range(6)))
+    return str(path)
+
+
+@pytest.fixture
+def gmail():
+    with FakeGoogleAPIServer(FakeGoogleData(n_messages=5, n_events=0)) as server:
+        yield server.build_service('gmail', 'v1')
+
+
+def sent_to(service) -> list:
+    messages = service.users().messages().list(userId='me', q="in:sent", maxResults=500).execute().get('messages', [])
+    return [message['id'] for message in messages]
+
+
+def merge(service) -> MailMerge:
+    return MailMerge(service, workers=2, sends_per_second=50)
+
+
+def test_render_is_case_insensitive():
+    assert render("Hi {{ Name }}", {'name': "Ada"}) == "Hi Ada"
+
+
+def test_journal_survives_reopening(tmp_path):
+    path = str(tmp_path / "merge.journal")
+    journal = SendJournal(path, "fingerprint")
+    journal.record('pending', "a@example.com", message_id="<1@x>")
+    journal.record('sent', "a@example.com", id="m1", message_id="<1@x>")
+    journal.record('pending', "b@example.com", message_id="<2@x>")
+    journal.close()
+
+    reopened = SendJournal(path, "fingerprint")
+    assert reopened.job_id == journal.job_id
+    assert reopened.state("a@example.com") == 'sent'
+    assert reopened.state("b@example.com") == 'pending'
+    assert reopened.state("c@example.com") is None
+    reopened.close()
+
+
+def test_journal_tolerates_a_partial_last_line(tmp_path):
+    path = str(tmp_path / "merge.journal")
+    journal = SendJournal(path, "fingerprint")
+    journal.record('sent', "a@example.com", id="m1")
+    journal.close()
+    with open(path, 'a') as f:
+        f.write('{"type":"sent","key":"b@exa')
+
+    journal = SendJournal(path, "fingerprint")
+    journal.record('sent', "c@example.com", id="m3")
+    journal.close()
+    _, states, partial = SendJournal.read(path, "fingerprint")
+    assert set(states) == {"a@example.com", "c@example.com"}
+    assert not partial
+
+
+def test_journal_rejects_another_template(tmp_path):
+    path = str(tmp_path / "merge.journal")
+    SendJournal(path, "fingerprint").close()
+    with pytest.raises(ValueError, match="different template"):
+        SendJournal(path, "other")
+
+
+def test_resume_sends_each_recipient_once(gmail, recipients):
+    first = merge(gmail).run(recipients, SUBJECT, BODY, max_sends=2)
+    assert (first.sent, first.remaining) == (2, 4)
+
+    second = merge(gmail).run(recipients, SUBJECT, BODY)
+    assert (second.sent, second.already_sent, second.remaining) == (4, 2, 0)
+    assert len(sent_to(gmail)) == 6
+
+
+def test_dry_run_counts_only_unsent_recipients(gmail, recipients):
+    dry = merge(gmail).run(recipients, SUBJECT, BODY, dry_run=True)
+    assert (dry.remaining, dry.already_sent) == (6, 0)
+    assert not os.path.exists(MailMerge.journal_path(recipients))
+
+    merge(gmail).run(recipients, SUBJECT, BODY, max_sends=4)
+    dry = merge(gmail).run(recipients, SUBJECT, BODY, dry_run=True)
+    assert (dry.remaining, dry.already_sent) == (2, 4)
+    assert dry.preview.startswith("To: user4@example.com\nSubject: Hi User 4")
+    assert len(sent_to(gmail)) == 4
+
+
+def test_send_interrupted_after_delivery_is_recovered(gmail, recipients):
+    merge(gmail).run(recipients, SUBJECT, BODY, max_sends=1)
+
+    # Simulate a crash after Gmail accepted the second message but before the outcome was journaled
+    sender = merge(gmail)
+    fingerprint = hashlib.sha256(json.dumps([SUBJECT, BODY, False]).encode()).hexdigest()
+    journal = SendJournal(MailMerge.journal_path(recipients), fingerprint)
+    recipient = list(load_recipients(recipients))[1]
+    message_id = sender._message_id(journal, recipient)
+    journal.record('pending', recipient.key, message_id=message_id)
+    raw = sender._build(recipient, SUBJECT, BODY, False, message_id)
+    gmail.users().messages().send(userId='me', body={'raw': raw}).execute()
+    journal.close()
+
+    result = sender.run(recipients, SUBJECT, BODY)
+    assert (result.recovered, result.sent, result.already_sent) == (1, 4, 1)
+    assert len(sent_to(gmail)) == 6
+
+
+def test_rows_without_an_address_are_reported_not_fatal(gmail, tmp_path):
+    path = tmp_path / "recipients.jsonl"
+    path.write_text('{"email": "a@example.com", "name": "A"}\n'
+                    '{"name": "No address"}\n'
+                    '{"email": "c@example.com", "name": "C"}\n')
+    result = merge(gmail).run(str(path), SUBJECT, BODY)
+    assert (result.sent, result.failed) == (2, 1)
+    assert result.errors == ["Row 2: invalid address ''"]
+
+
+def test_unreadable_row_stops_the_merge_before_any_send(gmail, tmp_path):
+    path = tmp_path / "recipients.jsonl"
+    path.write_text('{"email": "a@example.com", "name": "A"}\n'
+                    '{"email": "b@example.com", "name": "B"}\n'
+                    '{"email": "c@exa\n')
+    with pytest.raises(ValueError, match="row 3 is not valid JSON"):
+        merge(gmail).run(str(path), SUBJECT, BODY)
+    assert sent_to(gmail) == []
+
+
+def test_csv_without_address_column_is_rejected(gmail, tmp_path):
+    path = tmp_path / "recipients.csv"
+    path.write_text("name\nAda\n")
+    with pytest.raises(ValueError, match="no recipient address column"):
+        merge(gmail).run(str(path), SUBJECT, BODY)
+
+
+def test_bulk_email_tool_reads_only_inside_the_files_directory(gmail, recipients, tmp_path):
+    send = GmailTools(service=gmail, files_dir=str(tmp_path / "files")).functions['send_bulk_email'].entrypoint
+    assert send(recipients_file=recipients, subject=SUBJECT, body=BODY).startswith("❌")
+    assert send(recipients_file="../recipients.csv", subject=SUBJECT, body=BODY).startswith("❌")
+    assert send(recipients_file="guests.csv", subject=SUBJECT, body=BODY,
+                journal_path="/tmp/merge.journal").startswith("❌")
+    assert sent_to(gmail) == []
+
+    os.replace(recipients, tmp_path / "files" / "me" / "guests.csv")
+    assert send(recipients_file="guests.csv", subject=SUBJECT, body=BODY).startswith("✅ Sent 6 emails")
+    assert os.path.exists(tmp_path / "files" / "me" / "guests.csv.journal")
@@ -0,0 +1,96 @@
+# tests/test_gmail_text.py
+
+import base64
+
+from tools.gmail.gmail_text import message_text, split_signature, strip_quoted
+
+EARLIER = "Can we meet on Tuesday to go through the launch checklist?\n\nOn Mon, 4 Mar 2024, Bob wrote:\n> Lunch?\n\n-- \nAlice"
+
+
+def test_strips_quote_of_earlier_message_with_wrapped_attribution():
+    reply = ("Sure, 10am works.\n\n"
+             "On Tue, 5 Mar 2024 at 10:00, Alice Example <alice@example.com>\n"
+             "wrote:\n"
+             "> Can we meet on Tuesday to go through the launch checklist?\n"
+             ">\n"
+             "> On Mon, 4 Mar 2024, Bob wrote:\n"
+             ">> Lunch?\n"
+             ">\n"
+             "> -- \n"
+             "> Alice")
+    text, removed = strip_quoted(reply, [EARLIER])
+    assert text == "Sure, 10am works."
+    assert removed == 9
+
+
+def test_strips_partial_quote_of_earlier_message():
+    reply = "> go through the launch checklist\n\nYes, let's."
+    assert strip_quoted(reply, [EARLIER]) == ("Yes, let's.", 1)
+
+
+def test_keeps_quotes_from_outside_the_thread():
+    reply = ("As the style guide puts it:\n"
+             "> Omit needless words.\n"
+             "So let's shorten the intro.")
+    assert strip_quoted(reply, [EARLIER]) == (reply, 0)
+
+
+def test_keeps_everything_without_earlier_messages():
+    reply = "Fine by me.\n\nOn Mon, Alice wrote:\n> Can we meet on Tuesday?"
+    assert strip_quoted(reply) == (reply, 0)
+
+
+def test_strips_outlook_original_of_earlier_message():
+    reply = ("Works for me.\n\n"
+             "From: Alice <alice@example.com>\n"
+             "Sent: Tuesday, March 5, 2024 10:00 AM\n"
+             "To: Bob <bob@example.com>\n"
+             "Subject: RE: launch\n\n"
+             f"{EARLIER}")
+    text, removed = strip_quoted(reply, [EARLIER])
+    assert text == "Works for me."
+    assert removed == len(reply.split("\n")) - 2
+
+
+def test_header_like_lines_in_the_authors_text_are_kept():
+    reply = "Here is the plan:\nFrom: the design team\nTo: everyone\nSubject: launch\nDetails follow"
+    assert strip_quoted(reply, [EARLIER, "From: the design team"]) == (reply, 0)
+
+
+def test_keeps_forwarded_messages():
+    reply = ("FYI\n\n---------- Forwarded message ---------\n"
+             "From: Carol <carol@example.com>\n"
+             "> Can we meet on Tuesday to go through the launch checklist?")
+    assert strip_quoted(reply, [EARLIER]) == (reply, 0)
+
+
+def test_splits_signature():
+    assert split_signature("Thanks!\n\n-- \nAlice\nExample Corp") == ("Thanks!", "Alice\nExample Corp")
+
+
+def test_long_tail_after_dashes_is_not_a_signature():
+    text = "Notes\n--\n" + "\n".join(f"item {n}" for n in range(20))
+    assert split_signature(text) == (text, None)
+
+
+def test_message_text_prefers_plain_part():
+    def part(mime_type: str, text: str):
+        return {'mimeType': mime_type, 'body': {'data': base64.urlsafe_b64encode(text.encode()).decode()}}
+
+    payload = {'mimeType': 'multipart/alternative',
+               'parts': [part('text/plain', "Hello plain"), part('text/html', "<p>Hello <b>html</b></p>")]}
+    assert message_text(payload) == "Hello plain"
+    assert message_text({'parts': [part('text/html', "<p>Hello &amp; <b>html</b></p>")]}) == "Hello & html"
+
+
+def test_short_earlier_message_only_matches_a_quote_of_all_of_it():
+    reply = ("I disagree with this part:\n"
+             "> Thanks to the new process, releases no longer need sign-off.\n"
+             "They still do.")
+    assert strip_quoted(reply, ["Thanks"]) == (reply, 0)
+    assert strip_quoted("Sure.\n\n> Thanks", ["Thanks"]) == ("Sure.", 1)
+
+
+def test_common_short_fragment_is_not_matched_inside_an_earlier_message():
+    reply = "> ok\n\nFine, then we ship."
+    assert strip_quoted(reply, [EARLIER + " ok"]) == (reply, 0)
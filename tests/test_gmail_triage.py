@@ -0,0 +1,81 @@
+# tests/test_gmail_triage.py
+
+import base64
+
+import pytest
+
+from benchmarks.fake_google_api import FakeGoogleAPIServer, FakeGoogleData
+from tools.gmail.gmail_toolkit import GmailTools
+from tools.gmail.gmail_triage import DEFAULT_RULES, classify, compile_rules, label_changes, referenced_headers
+from tools.gmail.gmail_types import TriageRule
+
+
+def message(body: str = "", **headers: str) -> dict:
+    return {'payload': {
+        'mimeType': 'text/plain',
+        'headers': [{'name': name.replace('_', '-'), 'value': value} for name, value in headers.items()],
+        'body': {'data': base64.urlsafe_b64encode(body.encode()).decode()},
+    }}
+
+
+def labels(rules, msg, needs_body: bool = False) -> list:
+    return [rule.label for rule in classify(compile_rules(rules), msg, needs_body)]
+
+
+def test_default_rules_sort_common_mail():
+    assert labels(DEFAULT_RULES, message(From="news@shop.example", Subject="Weekly deals",
+                                         List_Unsubscribe="<mailto:u@shop.example>")) == ["Triage/Newsletters"]
+    assert labels(DEFAULT_RULES, message(From="GitHub <noreply@github.com>", Subject="Build passed")) == [
+        "Triage/Notifications"]
+    assert labels(DEFAULT_RULES, message(From="billing@vendor.example", Subject="Your invoice #42")) == [
+        "Triage/Finance"]
+    assert labels(DEFAULT_RULES, message(From="alice@example.com", Subject="Lunch?")) == []
+
+
+def test_every_pattern_of_a_rule_must_match():
+    rule = TriageRule(label="Vendor invoices", from_pattern=r"@vendor\.example$",
+                      subject_pattern="invoice", body_pattern=r"due (today|tomorrow)")
+    due = message("Payment is DUE TOMORROW.", From="a@vendor.example", Subject="Invoice 7")
+    assert labels([rule], due, needs_body=True) == ["Vendor invoices"]
+    assert labels([rule], due, needs_body=False) == []
+    assert labels([rule], message("due today", From="a@other.example", Subject="Invoice 7"), True) == []
+
+
+def test_header_patterns_need_the_header_present():
+    rule = TriageRule(label="Lists", header_patterns={'List-Id': r'dev\.example'})
+    assert labels([rule], message(From="x@example.com", List_Id="<dev.example>")) == ["Lists"]
+    assert labels([rule], message(From="x@example.com")) == []
+    assert referenced_headers([rule]) == ["Date", "From", "List-Id", "Subject"]
+
+
+@pytest.mark.parametrize("rule, error", [
+    (TriageRule(label="All"), "no patterns"),
+    (TriageRule(label="Broken", subject_pattern="(unclosed"), "Invalid pattern"),
+])
+def test_bad_rules_are_rejected(rule, error):
+    with pytest.raises(ValueError, match=error):
+        compile_rules([rule])
+
+
+def test_label_changes_merge_matched_rules():
+    rules = [TriageRule(label="A", subject_pattern="x", archive=True),
+             TriageRule(label="B", subject_pattern="x", mark_read=True)]
+    assert label_changes(rules, {'A': "Label_1", 'B': "Label_2"}) == (("Label_1", "Label_2"), ("INBOX", "UNREAD"))
+    assert label_changes(rules[:1], {'A': "Label_1"}) == (("Label_1",), ("INBOX",))
+    assert label_changes([], {}) is None
+
+
+def test_triage_inbox_labels_and_archives_in_bulk():
+    with FakeGoogleAPIServer(FakeGoogleData(n_messages=30, n_events=0)) as server:
+        gmail = server.build_service('gmail', 'v1')
+        triage = GmailTools(service=gmail).functions['triage_inbox'].entrypoint
+        rules = [TriageRule(label="Everyone", from_pattern="@", archive=True)]
+
+        preview = triage(rules=rules, max_results=10, dry_run=True)
+        assert preview.startswith("🗂️ Would label 10 of 10")
+        assert len(gmail.users().messages().list(userId='me', q="in:inbox").execute()['messages']) == 30
+
+        assert triage(rules=rules, max_results=10).startswith("🗂️ Labeled 10 of 10")
+        assert len(gmail.users().messages().list(userId='me', q="in:inbox").execute()['messages']) == 20
+        label_names = {label['name'] for label in gmail.users().labels().list(userId='me').execute()['labels']}
+        assert "Everyone" in label_names
@@ -0,0 +1,59 @@
+# tests/test_parsing.py
+
+from datetime import datetime
+
+import pytest
+
+from tools.timeutil.parsing import resolve_datetime
+
+# Tuesday, 10:00 in Paris
+NOW = datetime(2024, 3, 5, 10, 0)
+
+
+def resolve(expression: str, timezone: str = "Europe/Paris") -> datetime:
+    return resolve_datetime(expression, timezone, now=NOW)
+
+
+@pytest.mark.parametrize("expression, expected", [
+    ("tomorrow at 2pm", datetime(2024, 3, 6, 14, 0)),
+    ("3pm today", datetime(2024, 3, 5, 15, 0)),
+    ("next friday 9:30", datetime(2024, 3, 8, 9, 30)),
+    ("tuesday", datetime(2024, 3, 5, 0, 0)),
+    ("next tuesday", datetime(2024, 3, 12, 0, 0)),
+    ("tonight", datetime(2024, 3, 5, 20, 0)),
+    ("at 5", datetime(2024, 3, 5, 5, 0)),
+    ("at 17", datetime(2024, 3, 5, 17, 0)),
+    ("at 5pm", datetime(2024, 3, 5, 17, 0)),
+    ("15", datetime(2024, 3, 15, 0, 0)),
+    ("in 2 hours", datetime(2024, 3, 5, 12, 0)),
+    ("3 days ago", datetime(2024, 3, 2, 10, 0)),
+    ("2024-03-05 14:00", datetime(2024, 3, 5, 14, 0)),
+])
+def test_resolves_wall_clock_time(expression, expected):
+    assert resolve(expression).replace(tzinfo=None) == expected
+
+
+def test_result_is_aware_in_requested_timezone():
+    result = resolve("tomorrow at 9am", "America/New_York")
+    assert result.tzinfo is not None
+    assert result.utcoffset().total_seconds() == -5 * 3600
+
+
+def test_utc_timestamp_is_converted():
+    assert resolve("2024-03-05T14:00:00Z").hour == 15
+
+
+def test_days_keep_wall_clock_time_across_dst():
+    result = resolve_datetime("1 day from now", "Europe/Paris", now=datetime(2024, 3, 30, 9, 0))
+    assert (result.hour, result.utcoffset().total_seconds()) == (9, 2 * 3600)
+
+
+@pytest.mark.parametrize("expression", ["at 25", "13pm", "gibberish o'clock"])
+def test_rejects_invalid_expressions(expression):
+    with pytest.raises(ValueError):
+        resolve(expression)
+
+
+def test_rejects_unknown_timezone():
+    with pytest.raises(ValueError):
+        resolve_datetime("tomorrow", "Mars/Olympus_Mons")
@@ -0,0 +1,65 @@
+# tests/test_pooled_transport.py
+
+import gzip
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import urllib3
+
+from tools.transport.pooled import PooledHttp
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = 0
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            type(self).connections += 1
+
+    def do_HEAD(self):
+        self.send_response(404)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_GET(self):
+        body = gzip.compress(b'{"ok": true}')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    KeepAliveHandler.connections = 0
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+    httpd.lock = threading.Lock()
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_warmed_connection_is_reused(server):
+    http = PooledHttp(urllib3.PoolManager(maxsize=4, block=True))
+    http.warm([server])
+    assert KeepAliveHandler.connections == 1
+
+    response, content = http.request(server + "calendar/v3/users/me/calendarList")
+    assert (response.status, content) == (200, b'{"ok": true}')
+    assert response['-content-encoding'] == 'gzip'
+    assert KeepAliveHandler.connections == 1
+
+
+def test_warming_an_unreachable_host_is_harmless():
+    http = PooledHttp(urllib3.PoolManager(), connect_timeout=0.5)
+    http.warm(["http://127.0.0.1:9/"])
@@ -0,0 +1,109 @@
+# tests/test_push_webhook.py
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from benchmarks.fake_google_api import FakeGoogleAPIServer, FakeGoogleData
+from tools.gmail.gmail_toolkit import GmailTools
+from tools.google_calendar.calendar_toolkit import GoogleCalendarTools
+from tools.sync.cache import ResourceCache
+from tools.sync.push import PushSyncHub
+from tools.sync.simulator import NotificationSimulator
+from tools.sync.webhook import build_webhook_router
+
+TOKEN = "test-verification-token"
+
+
+@pytest.fixture
+def server():
+    with FakeGoogleAPIServer(FakeGoogleData(n_messages=20, n_events=20)) as server:
+        yield server
+
+
+@pytest.fixture
+def hub(server):
+    hub = PushSyncHub(ResourceCache(), webhook_base_url="http://testserver/webhooks/google",
+                      gmail_topic="projects/test/topics/gmail", verification_token=TOKEN)
+    yield hub
+    hub.stop()
+
+
+@pytest.fixture
+def simulator(hub):
+    app = FastAPI()
+    app.include_router(build_webhook_router(hub))
+    # Background syncs run before TestClient returns, so assertions see their effect
+    return NotificationSimulator(TestClient(app), verification_token=TOKEN)
+
+
+def test_calendar_change_invalidates_only_the_changed_event(server, hub, simulator):
+    tools = GoogleCalendarTools(service=server.build_service('calendar', 'v3'), cache=hub.cache)
+    watch = hub.watch_calendar('me', server.build_service('calendar', 'v3'))
+    changed, unchanged = [event['id'] for event in server.build_service('calendar', 'v3').events().list(
+        calendarId='primary', maxResults=2).execute()['items']]
+    get_event = tools.functions['get_event'].entrypoint
+    get_event(event_id=changed)
+    get_event(event_id=unchanged)
+
+    server.build_service('calendar', 'v3').events().patch(
+        calendarId='primary', eventId=changed, body={'summary': "Moved to Thursday"}).execute()
+    assert simulator.calendar(watch.channel_id, watch.resource_id) == 204
+
+    assert hub.cache.get('me', 'event', changed) is None
+    assert hub.cache.get('me', 'event', unchanged) is not None
+    assert "Moved to Thursday" in get_event(event_id=changed)
+
+
+def test_calendar_sync_handshake_changes_nothing(server, hub, simulator):
+    tools = GoogleCalendarTools(service=server.build_service('calendar', 'v3'), cache=hub.cache)
+    watch = hub.watch_calendar('me', server.build_service('calendar', 'v3'))
+    event_id = server.build_service('calendar', 'v3').events().list(
+        calendarId='primary', maxResults=1).execute()['items'][0]['id']
+    tools.functions['get_event'].entrypoint(event_id=event_id)
+
+    assert simulator.calendar(watch.channel_id, watch.resource_id, state='sync') == 204
+    assert hub.cache.get('me', 'event', event_id) is not None
+
+
+def test_gmail_change_invalidates_message_and_thread(server, hub, simulator):
+    tools = GmailTools(service=server.build_service('gmail', 'v1'), cache=hub.cache)
+    watch = hub.watch_gmail('me', server.build_service('gmail', 'v1'))
+    gmail = server.build_service('gmail', 'v1')
+    message = gmail.users().messages().list(userId='me', maxResults=1).execute()['messages'][0]
+    tools.functions['read_email'].entrypoint(message_id=message['id'])
+    assert hub.cache.get('me', 'message', message['id'], 'full') is not None
+
+    gmail.users().messages().modify(userId='me', id=message['id'], body={'addLabelIds': ['STARRED']}).execute()
+    history_id = int(gmail.users().getProfile(userId='me').execute()['historyId'])
+    assert simulator.gmail(watch.email, history_id) == 204
+
+    assert hub.cache.get('me', 'message', message['id'], 'full') is None
+    assert watch.history_id == history_id
+
+
+def test_stale_gmail_notification_is_ignored(server, hub, simulator):
+    watch = hub.watch_gmail('me', server.build_service('gmail', 'v1'))
+    hub.cache.put('me', 'message', 'cached', {'id': 'cached'})
+    assert simulator.gmail(watch.email, watch.history_id) == 204
+    assert hub.cache.get('me', 'message', 'cached') == {'id': 'cached'}
+
+
+def test_bad_tokens_are_rejected(server, hub, simulator):
+    watch = hub.watch_calendar('me', server.build_service('calendar', 'v3'))
+    gmail_watch = hub.watch_gmail('me', server.build_service('gmail', 'v1'))
+    hub.cache.put('me', 'event', 'cached', {'id': 'cached'})
+
+    assert simulator.calendar(watch.channel_id, watch.resource_id, token="wrong") == 403
+    assert simulator.gmail(gmail_watch.email, gmail_watch.history_id + 1, token="wrong") == 403
+    assert hub.cache.get('me', 'event', 'cached') == {'id': 'cached'}
+
+
+def test_unknown_calendar_channel_is_acknowledged(hub, simulator):
+    assert simulator.calendar("unknown-channel", "unknown-resource") == 204
+
+
+def test_gmail_topic_requires_a_verification_token():
+    with pytest.raises(ValueError, match="verification_token"):
+        PushSyncHub(ResourceCache(), webhook_base_url="http://testserver/webhooks/google",
+                    gmail_topic="projects/test/topics/gmail")
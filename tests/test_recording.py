@@ -0,0 +1,74 @@
+# tests/test_recording.py
+
+import base64
+import gzip
+import json
+
+import httplib2
+
+from tools.transport.recording import Cassette, CassetteWriter, ReplayHttp, normalize_uri, pseudonymize_emails
+
+ADDRESSES = ("alice@example.com", "bob@example.com", "carol@example.com")
+
+
+def record(tmp_path, uri: str, content: dict) -> str:
+    path = str(tmp_path / "session.jsonl.gz")
+    writer = CassetteWriter(path, redact=pseudonymize_emails)
+    response = httplib2.Response({'status': '200', 'content-type': 'application/json'})
+    writer.write_http(None, 'GET', uri, None, response, json.dumps(content).encode(), 0.01)
+    writer.close()
+    return path
+
+
+def test_escaped_addresses_in_uris_are_pseudonymized(tmp_path):
+    uri = ("https://www.googleapis.com/calendar/v3/calendars/bob%40example.com/events"
+           "?q=from%3Aalice%40example.com&access_token=secret")
+    path = record(tmp_path, uri, {'items': []})
+
+    with gzip.open(path, 'rt') as f:
+        recorded = f.read()
+    assert not any(address in recorded for address in ADDRESSES)
+    assert "bob%40example.com" not in recorded and "alice%40example.com" not in recorded
+    assert "secret" not in recorded
+    [exchange] = Cassette.load(path).exchanges
+    assert pseudonymize_emails("bob@example.com") in exchange.uri
+
+
+def test_base64_message_payloads_are_pseudonymized(tmp_path):
+    def encode(text: str) -> str:
+        return base64.urlsafe_b64encode(text.encode()).decode().rstrip('=')
+
+    message = {
+        'id': "m1",
+        'raw': encode("From: Alice <alice@example.com>\r\nTo: bob@example.com\r\n\r\nHi"),
+        'payload': {'parts': [{'body': {'data': encode("Forwarding to carol@example.com")}},
+                              {'body': {'data': base64.urlsafe_b64encode(b"\xff\xfe bob@example.com").decode()}}]},
+    }
+    path = record(tmp_path, "https://gmail.googleapis.com/gmail/v1/users/me/messages/m1?format=raw", message)
+
+    [exchange] = Cassette.load(path).exchanges
+    recorded = json.loads(exchange.content)
+    raw = base64.urlsafe_b64decode(recorded['raw'] + '==').decode()
+    assert not any(address in raw for address in ADDRESSES)
+    assert raw.startswith("From: Alice <user-")
+    part = base64.urlsafe_b64decode(recorded['payload']['parts'][0]['body']['data'] + '==').decode()
+    assert part == pseudonymize_emails("Forwarding to carol@example.com")
+    # Attachments that aren't text are stored as they are
+    assert recorded['payload']['parts'][1] == message['payload']['parts'][1]
+
+
+def test_replay_matches_recorded_uri_after_redaction(tmp_path):
+    uri = "https://gmail.googleapis.com/gmail/v1/users/me/messages?q=is%3Aunread&maxResults=5"
+    path = record(tmp_path, uri, {'messages': [{'id': "m1"}]})
+
+    replay = ReplayHttp(Cassette.load(path))
+    response, content = replay.request(
+        "http://localhost:8080/gmail/v1/users/me/messages?maxResults=5&q=is%3Aunread&access_token=other")
+    assert response.status == 200
+    assert json.loads(content) == {'messages': [{'id': "m1"}]}
+    assert replay.misses == 0
+
+
+def test_normalize_uri_sorts_query_and_drops_credentials():
+    assert (normalize_uri("https://host/a%20b?b=2&key=k&a=1")
+            == "https://host/a%20b?a=1&b=2")
@@ -0,0 +1,158 @@
+# tests/test_tenancy.py
+
+import datetime
+import os
+import threading
+from types import SimpleNamespace
+
+import httplib2
+import pytest
+from google.oauth2.credentials import Credentials
+
+from tools.gmail.gmail_auth import GmailAuth
+from tools.google_calendar.calendar_auth import GoogleCalendarAuth
+from tools.tenancy.credentials import FileCredentialStore, MissingCredentialsError
+from tools.tenancy.pool import ServicePool, acting_as
+
+SCOPES = ['https://www.googleapis.com/auth/calendar']
+
+
+class FakeService:
+    def __init__(self, user: str):
+        self.user = user
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeToolkit:
+    """Minimal stand-in for a phi Toolkit: a `functions` dict of objects with an `entrypoint`."""
+
+    def __init__(self, pool: ServicePool):
+        self.functions = {'whoami': SimpleNamespace(entrypoint=lambda: pool.current().user)}
+
+
+class ExpiredCredentials:
+    def __init__(self):
+        self.valid = False
+        self.refreshed = False
+
+    def refresh(self, request):
+        self.valid = self.refreshed = True
+
+
+def credentials(token: str) -> Credentials:
+    # Unexpired, so loading never tries to refresh over the network
+    expiry = datetime.datetime.utcnow().replace(microsecond=0) + datetime.timedelta(hours=1)
+    return Credentials(token=token, refresh_token="refresh", client_id="id", client_secret="secret",
+                       token_uri="https://oauth2.googleapis.com/token", scopes=SCOPES, expiry=expiry)
+
+
+def test_credentials_are_stored_per_user(tmp_path):
+    store = FileCredentialStore(str(tmp_path))
+    store.save("alice@example.com", 'calendar', credentials("alice-token"))
+    store.save("bob@example.com", 'calendar', credentials("bob-token"))
+
+    assert store.load("alice@example.com", 'calendar', SCOPES).token == "alice-token"
+    assert store.load("bob@example.com", 'calendar', SCOPES).token == "bob-token"
+    assert oct(os.stat(tmp_path / "alice@example.com" / "calendar.json").st_mode & 0o777) == '0o600'
+    with pytest.raises(MissingCredentialsError):
+        store.load("carol@example.com", 'calendar', SCOPES)
+
+
+@pytest.mark.parametrize("user", ["..", "../alice@example.com", "alice/../../etc", ".hidden", "", "a\x00b"])
+def test_user_ids_cannot_escape_the_directory(tmp_path, user):
+    store = FileCredentialStore(str(tmp_path / "credentials"))
+    with pytest.raises(ValueError):
+        store.save(user, 'calendar', credentials("token"))
+    with pytest.raises(ValueError):
+        store.load(user, 'calendar', SCOPES)
+    assert not any(tmp_path.rglob("*.json"))
+
+
+def test_symlink_out_of_the_directory_is_rejected(tmp_path):
+    outside = tmp_path / "outside"
+    outside.mkdir()
+    (tmp_path / "credentials").mkdir()
+    os.symlink(outside, tmp_path / "credentials" / "mallory@example.com")
+    store = FileCredentialStore(str(tmp_path / "credentials"))
+    with pytest.raises(ValueError, match="outside"):
+        store.save("mallory@example.com", 'calendar', credentials("token"))
+
+
+def test_each_user_gets_their_own_service():
+    pool = ServicePool(FakeService)
+    whoami = pool.bind(FakeToolkit(pool)).functions['whoami'].entrypoint
+
+    assert whoami(agent=SimpleNamespace(user_id="alice")) == "alice"
+    assert whoami(agent=SimpleNamespace(user_id="bob")) == "bob"
+    with acting_as("carol"):
+        assert whoami() == "carol"
+    assert whoami().startswith("❌")
+    assert (pool.misses, pool.hits) == (3, 0)
+
+
+def test_concurrent_calls_of_different_users_stay_isolated():
+    pool = ServicePool(FakeService)
+    whoami = pool.bind(FakeToolkit(pool)).functions['whoami'].entrypoint
+    mismatches = []
+
+    def call(user: str):
+        for _ in range(50):
+            if whoami(agent=SimpleNamespace(user_id=user)) != user:
+                mismatches.append(user)
+
+    threads = [threading.Thread(target=call, args=(f"user{n}",)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert mismatches == []
+    assert len(pool) == 8
+
+
+def test_least_recently_used_services_are_evicted_and_closed():
+    services = {}
+    pool = ServicePool(lambda user: services.setdefault(user, FakeService(user)), max_size=2)
+    for user in ("alice", "bob", "alice", "carol"):
+        with pool.lease(user):
+            pass
+
+    assert len(pool) == 2
+    assert services["bob"].closed and not services["alice"].closed
+    assert pool.evictions == 1
+
+
+def test_service_leased_during_eviction_is_closed_after_use():
+    pool = ServicePool(FakeService, max_size=1)
+    with pool.lease("alice") as alice:
+        with pool.lease("bob"):
+            pass
+        pool.evict_idle(now=float('inf'))
+        assert not alice.closed
+    assert len(pool) == 1
+
+    with pool.lease("carol"):
+        pass
+    assert alice.closed
+
+
+def test_idle_services_are_evicted():
+    pool = ServicePool(FakeService, idle_timeout_seconds=60)
+    with pool.lease("alice") as alice:
+        pass
+    assert pool.evict_idle() == 0
+    assert pool.evict_idle(now=float('inf')) == 1
+    assert alice.closed and len(pool) == 0
+
+
+@pytest.mark.parametrize("get_service", [GoogleCalendarAuth.get_calendar_service, GmailAuth.get_gmail_service])
+def test_refreshed_per_user_credentials_go_back_to_their_store(tmp_path, monkeypatch, get_service):
+    monkeypatch.chdir(tmp_path)
+    saved = []
+    creds = ExpiredCredentials()
+    get_service(http=httplib2.Http(), credentials=creds, save_credentials=saved.append)
+
+    assert creds.refreshed and saved == [creds]
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,109 @@
+# tests/test_tool_memo.py
+
+from types import SimpleNamespace
+
+import pytest
+
+from tools.sync.memo import ToolMemo, mark_partial
+from tools.tenancy.pool import acting_as
+
+
+class FakeToolkit:
+    """Minimal stand-in for a phi Toolkit with one read tool whose resource has a version."""
+
+    name = "fake_tools"
+
+    def __init__(self):
+        self.versions = {'a': "1", 'b': "1"}
+        self.renders = 0
+        self.fail_partially = False
+        self.functions = {'read': SimpleNamespace(entrypoint=self.read)}
+
+    def read(self, resource_id: str) -> str:
+        self.renders += 1
+        if resource_id not in self.versions:
+            return f"❌ Failed to read {resource_id}"
+        if self.fail_partially:
+            mark_partial()
+        return f"{resource_id} v{self.versions[resource_id]} " + "x" * 100
+
+
+@pytest.fixture
+def memo(tmp_path):
+    return ToolMemo(str(tmp_path / "memo.db"))
+
+
+def instrumented(memo: ToolMemo) -> FakeToolkit:
+    toolkit = FakeToolkit()
+    memo.instrument(toolkit, {'read': lambda args: toolkit.versions.get(args['resource_id'])})
+    return toolkit
+
+
+def test_unchanged_resource_is_served_from_the_memo(memo):
+    toolkit = instrumented(memo)
+    read = toolkit.functions['read'].entrypoint
+    first = read(resource_id='a')
+    assert read(resource_id='a') == first
+    assert (toolkit.renders, memo.hits) == (1, 1)
+
+
+def test_new_version_misses(memo):
+    toolkit = instrumented(memo)
+    read = toolkit.functions['read'].entrypoint
+    read(resource_id='a')
+    toolkit.versions['a'] = "2"
+    assert read(resource_id='a').startswith("a v2")
+    assert toolkit.renders == 2
+
+
+def test_memo_is_shared_across_toolkits_and_kept_per_user(memo):
+    first, second = instrumented(memo), instrumented(memo)
+    first.functions['read'].entrypoint(resource_id='a')
+    second.functions['read'].entrypoint(resource_id='a')
+    assert second.renders == 0
+
+    with acting_as("alice@example.com"):
+        second.functions['read'].entrypoint(resource_id='a')
+    assert second.renders == 1
+
+
+def test_errors_and_partial_results_are_not_stored(memo):
+    toolkit = instrumented(memo)
+    read = toolkit.functions['read'].entrypoint
+    toolkit.versions['missing'] = None
+    read(resource_id='missing')
+    toolkit.fail_partially = True
+    read(resource_id='b')
+    read(resource_id='b')
+    assert toolkit.renders == 3
+    assert memo.size() == 0
+
+    # The flag only applies to the call that set it
+    toolkit.fail_partially = False
+    read(resource_id='b')
+    read(resource_id='b')
+    assert toolkit.renders == 4
+
+
+def test_least_recently_used_results_are_evicted(tmp_path):
+    memo = ToolMemo(str(tmp_path / "memo.db"), max_bytes=1000)
+    for n in range(10):
+        memo.put('me', 'tool', str(n), "1", "x" * 100)
+        memo._connection().execute("UPDATE tool_memo SET accessed = ? WHERE args = ?", (n, str(n)))
+    assert memo.get('me', 'tool', "0", "1") is not None
+
+    memo.put('me', 'tool', "last", "1", "x" * 100)
+    assert memo.size() <= 1000
+    assert memo.get('me', 'tool', "0", "1") is not None
+    assert memo.get('me', 'tool', "1", "1") is None
+    assert memo.get('me', 'tool', "last", "1") is not None
+
+
+def test_size_is_only_summed_after_enough_new_bytes(tmp_path, monkeypatch):
+    memo = ToolMemo(str(tmp_path / "memo.db"), max_bytes=100_000)
+    checks = []
+    monkeypatch.setattr(memo, 'size', lambda: checks.append(1) or 0)
+    for n in range(25):
+        memo.put('me', 'tool', str(n), "1", "x" * 100)
+    # One check per 1,000 bytes (a hundredth of max_bytes) written
+    assert len(checks) == 2
@@ -0,0 +1,35 @@
+# tests/test_user_files.py
+
+import os
+
+import pytest
+
+from tools.google_calendar.calendar_toolkit import GoogleCalendarTools
+from tools.tenancy.files import resolve_user_path
+from tools.tenancy.pool import acting_as
+
+
+def test_paths_resolve_inside_the_callers_directory(tmp_path):
+    assert resolve_user_path(str(tmp_path), "exports/cal.ics") == str(tmp_path / "me" / "exports" / "cal.ics")
+    with acting_as("alice@example.com"):
+        assert resolve_user_path(str(tmp_path), "cal.ics") == str(tmp_path / "alice@example.com" / "cal.ics")
+
+
+@pytest.mark.parametrize("path", ["/etc/passwd", "../bob@example.com/cal.ics", "exports/../../x", "..", ""])
+def test_absolute_and_parent_paths_are_rejected(tmp_path, path):
+    with pytest.raises(ValueError):
+        resolve_user_path(str(tmp_path), path)
+
+
+def test_symlinks_out_of_the_directory_are_rejected(tmp_path):
+    os.makedirs(tmp_path / "files" / "me")
+    os.symlink(tmp_path, tmp_path / "files" / "me" / "escape")
+    with pytest.raises(ValueError, match="outside"):
+        resolve_user_path(str(tmp_path / "files"), "escape/secret.txt")
+
+
+def test_ics_tools_refuse_paths_outside_the_files_directory(tmp_path):
+    tools = GoogleCalendarTools(service=object(), files_dir=str(tmp_path))
+    assert tools.functions['import_ics'].entrypoint(file_path="/etc/passwd").startswith("❌")
+    assert tools.functions['export_ics'].entrypoint(file_path="../out.ics").startswith("❌")
+    assert not os.path.exists(tmp_path.parent / "out.ics")
@@ -6,7 +6,8 @@ from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
-from typing import Optional
+from google_auth_httplib2 import AuthorizedHttp
+from typing import Any, Callable, Optional
 
 class GmailAuth:
     SCOPES = [
@@ -18,30 +19,47 @@ class GmailAuth:
     ]
     
     @staticmethod
-    def get_gmail_service():
-        """Gets an authorized Gmail API service instance."""
-        creds = None
-        # The file token.pickle stores the user's access and refresh tokens
-        if os.path.exists('gmail_token.pickle'):
-            with open('gmail_token.pickle', 'rb') as token:
-                creds = pickle.load(token)
-        
-        # If there are no (valid) credentials available, let the user log in
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                try:
-                    creds.refresh(Request())
-                except:
-                    # If refresh fails, force new authentication
-                    creds = None
-            
-            if not creds:
-                flow = InstalledAppFlow.from_client_secrets_file(
-                    'credentials.json', GmailAuth.SCOPES)
-                creds = flow.run_local_server(port=0)
-                
-                # Save the credentials for the next run
-                with open('gmail_token.pickle', 'wb') as token:
-                    pickle.dump(creds, token)
+    def get_gmail_service(http: Optional[Any] = None, credentials: Optional[Any] = None,
+                          save_credentials: Optional[Callable[[Any], None]] = None):
+        """Gets an authorized Gmail API service instance.
 
+        Args:
+            http: Optional httplib2-compatible transport to send requests through
+            credentials: Credentials to use instead of the local token file (e.g. from a per-user store)
+            save_credentials: Called with `credentials` after they are refreshed, to persist them where they came from
+        """
+        if credentials is not None:
+            # Per-user credentials never touch gmail_token.pickle, which belongs to the single-user setup
+            creds = credentials
+            if not creds.valid:
+                creds.refresh(Request())
+                if save_credentials is not None:
+                    save_credentials(creds)
+        else:
+            creds = None
+            # The file token.pickle stores the user's access and refresh tokens
+            if os.path.exists('gmail_token.pickle'):
+                with open('gmail_token.pickle', 'rb') as token:
+                    creds = pickle.load(token)
+
+            # If there are no (valid) credentials available, let the user log in
+            if not creds or not creds.valid:
+                if creds and creds.expired and creds.refresh_token:
+                    try:
+                        creds.refresh(Request())
+                    except:
+                        # If refresh fails, force new authentication
+                        creds = None
+
+                if not creds:
+                    flow = InstalledAppFlow.from_client_secrets_file(
+                        'credentials.json', GmailAuth.SCOPES)
+                    creds = flow.run_local_server(port=0)
+
+                    # Save the credentials for the next run
+                    with open('gmail_token.pickle', 'wb') as token:
+                        pickle.dump(creds, token)
+
+        if http is not None:
+            return build('gmail', 'v1', http=AuthorizedHttp(creds, http=http))
         return build('gmail', 'v1', credentials=creds)
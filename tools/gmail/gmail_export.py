@@ -0,0 +1,251 @@
+# tools/gmail/gmail_export.py
+
+import base64
+import json
+import os
+import random
+import re
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from googleapiclient.errors import HttpError
+
+from ..transport.pooled import worker_http
+
+EXPORT_FORMATS = ('mbox', 'jsonl')
+
+# Per-message (or whole-batch) statuses worth retrying: rate limits and transient server errors
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# mboxrd quoting: body lines starting with "From " (after any ">") get one more ">"
+_FROM_LINE = re.compile(rb'^(>*From )', re.MULTILINE)
+
+# (page token the id was listed from, index just past it in that page)
+ListPosition = Tuple[Optional[str], int]
+
+
+@dataclass
+class ExportResult:
+    exported: int
+    skipped: int
+    resumed_from: int
+    bytes_written: int
+    elapsed: float
+
+
+class MailExporter:
+    """Streams every message matching a Gmail query into an mbox or JSON-lines file.
+
+    Message ids are listed page by page and fetched as `format='raw'` batch
+    requests, with up to `max_in_flight` batches running in parallel. Batches
+    are written in list order as soon as the oldest one completes, so memory
+    is bounded by the window rather than by the size of the export.
+
+    After every written batch a checkpoint next to the output records the
+    file size and list position. An interrupted export resumes from there,
+    truncating anything written after the last checkpoint.
+
+    Args:
+        service: Gmail API service
+        batch_size: Messages per batch request (Gmail allows 100; 50 stays clear of rate limits)
+        max_in_flight: Batch requests running concurrently
+        max_attempts: Attempts per message before it is skipped
+    """
+
+    def __init__(self, service: Any, batch_size: int = 50, max_in_flight: int = 4, max_attempts: int = 5):
+        self.service = service
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+
+    @staticmethod
+    def checkpoint_path(path: str) -> str:
+        return f"{path}.checkpoint"
+
+    def export(self, query: str, path: str, file_format: str = 'mbox',
+               max_messages: Optional[int] = None, resume: bool = True) -> ExportResult:
+        """Exports the messages matching `query` to `path`.
+
+        Raises:
+            ValueError: If the format is unknown or the checkpoint belongs to a different export
+        """
+        if file_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format '{file_format}' (use one of: {', '.join(EXPORT_FORMATS)})")
+        started = time.monotonic()
+        state = self._load_checkpoint(path) if resume else None
+        if state is not None and (state['query'] != query or state['format'] != file_format):
+            raise ValueError(f"{path} has an unfinished export of a different query or format; "
+                             f"export with resume=False to start over")
+        if state is None:
+            state = {'query': query, 'format': file_format, 'page_token': None, 'offset': 0,
+                     'exported': 0, 'skipped': 0, 'size': 0}
+        resumed_from = state['exported']
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'r+b' if state['size'] else 'wb') as out:
+            # Drop anything written after the last checkpoint
+            out.truncate(state['size'])
+            out.seek(state['size'])
+
+            limit = None if max_messages is None else max(0, max_messages - state['exported'] - state['skipped'])
+            ids = self._list_ids(query, state['page_token'], state['offset'])
+            window: deque = deque()
+            with ThreadPoolExecutor(self.max_in_flight, thread_name_prefix="gmail-export") as executor:
+                for batch in self._chunks(ids, limit):
+                    window.append(executor.submit(self._fetch_batch, batch))
+                    if len(window) >= self.max_in_flight:
+                        self._write(out, path, state, *window.popleft().result())
+                while window:
+                    self._write(out, path, state, *window.popleft().result())
+
+        if os.path.exists(self.checkpoint_path(path)):
+            os.remove(self.checkpoint_path(path))
+        return ExportResult(
+            exported=state['exported'],
+            skipped=state['skipped'],
+            resumed_from=resumed_from,
+            bytes_written=state['size'],
+            elapsed=time.monotonic() - started,
+        )
+
+    # Listing
+
+    def _list_ids(self, query: str, page_token: Optional[str], offset: int) -> Iterator[Tuple[str, ListPosition]]:
+        while True:
+            response = self.service.users().messages().list(
+                userId='me',
+                q=query,
+                pageToken=page_token,
+                maxResults=500,
+                fields='messages/id,nextPageToken'
+            ).execute()
+            ids = [message['id'] for message in response.get('messages', [])]
+            for index in range(offset, len(ids)):
+                yield ids[index], (page_token, index + 1)
+            offset = 0
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                return
+
+    def _chunks(self, ids: Iterator[Tuple[str, ListPosition]], limit: Optional[int]) -> Iterator[List[Tuple[str, ListPosition]]]:
+        batch: List[Tuple[str, ListPosition]] = []
+        for count, item in enumerate(ids):
+            if limit is not None and count >= limit:
+                break
+            batch.append(item)
+            if len(batch) == self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    # Fetching
+
+    def _http(self) -> Any:
+        # googleapiclient's default httplib2 transport isn't thread-safe, so each worker gets its own
+        if not hasattr(self._local, 'http'):
+            self._local.http = worker_http(self.service._http)
+        return self._local.http
+
+    def _fetch_batch(self, batch: List[Tuple[str, ListPosition]]) -> Tuple[List[Dict[str, Any]], int, ListPosition]:
+        """Fetches one batch of raw messages, retrying rate-limited ones; returns (messages, skipped, end position)."""
+        ids = [message_id for message_id, _ in batch]
+        fetched: Dict[str, Dict[str, Any]] = {}
+        pending = ids
+        for attempt in range(self.max_attempts):
+            retry: List[str] = []
+
+            def callback(request_id, response, exception):
+                if exception is None:
+                    fetched[request_id] = response
+                elif isinstance(exception, HttpError) and exception.resp.status in RETRYABLE_STATUSES:
+                    retry.append(request_id)
+                # Anything else (e.g. 404 for a message deleted since listing) is skipped
+
+            request = self.service.new_batch_http_request(callback=callback)
+            for message_id in pending:
+                request.add(self.service.users().messages().get(
+                    userId='me',
+                    id=message_id,
+                    format='raw',
+                    fields='id,threadId,labelIds,internalDate,raw'
+                ), request_id=message_id)
+            try:
+                request.execute(http=self._http())
+            except HttpError as e:
+                if e.resp.status not in RETRYABLE_STATUSES:
+                    raise
+                retry = [message_id for message_id in pending if message_id not in fetched]
+            except (ConnectionError, socket.timeout):
+                retry = [message_id for message_id in pending if message_id not in fetched]
+
+            if not retry:
+                break
+            pending = retry
+            if attempt + 1 < self.max_attempts:
+                time.sleep(min(32.0, 2.0 ** attempt) * (0.5 + random.random() / 2))
+
+        messages = [fetched[message_id] for message_id in ids if message_id in fetched]
+        return messages, len(ids) - len(messages), batch[-1][1]
+
+    # Writing
+
+    def _write(self, out: BinaryIO, path: str, state: Dict[str, Any],
+               messages: List[Dict[str, Any]], skipped: int, position: ListPosition):
+        encode = self._mbox_entry if state['format'] == 'mbox' else self._jsonl_entry
+        out.write(b"".join(encode(message) for message in messages))
+        out.flush()
+        os.fsync(out.fileno())
+        state.update({
+            'page_token': position[0],
+            'offset': position[1],
+            'exported': state['exported'] + len(messages),
+            'skipped': state['skipped'] + skipped,
+            'size': out.tell(),
+        })
+        self._save_checkpoint(path, state)
+
+    @staticmethod
+    def _mbox_entry(message: Dict[str, Any]) -> bytes:
+        raw = base64.urlsafe_b64decode(message['raw']).replace(b'\r\n', b'\n')
+        received = time.asctime(time.gmtime(int(message.get('internalDate', 0)) / 1000))
+        # Same envelope and Gmail headers as a Google Takeout export
+        header = (
+            f"From {message.get('threadId', message['id'])}@xxx {received}\n"
+            f"X-GM-THRID: {message.get('threadId', '')}\n"
+            f"X-Gmail-Labels: {','.join(message.get('labelIds', []))}\n"
+        ).encode()
+        body = _FROM_LINE.sub(rb'>\1', raw)
+        if not body.endswith(b'\n'):
+            body += b'\n'
+        return header + body + b'\n'
+
+    @staticmethod
+    def _jsonl_entry(message: Dict[str, Any]) -> bytes:
+        record = {key: message.get(key) for key in ('id', 'threadId', 'labelIds', 'internalDate', 'raw')}
+        return (json.dumps(record, separators=(',', ':')) + "\n").encode()
+
+    # Checkpoints
+
+    def _load_checkpoint(self, path: str) -> Optional[Dict[str, Any]]:
+        checkpoint = self.checkpoint_path(path)
+        if not os.path.exists(checkpoint):
+            return None
+        with open(checkpoint) as f:
+            state = json.load(f)
+        if not os.path.exists(path) or os.path.getsize(path) < state['size']:
+            raise ValueError(f"{path} is shorter than its checkpoint records; export with resume=False to start over")
+        return state
+
+    def _save_checkpoint(self, path: str, state: Dict[str, Any]):
+        checkpoint = self.checkpoint_path(path)
+        tmp_path = f"{checkpoint}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, checkpoint)
@@ -0,0 +1,453 @@
+# tools/gmail/gmail_merge.py
+
+import base64
+import csv
+import hashlib
+import json
+import os
+import random
+import re
+import socket
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from email.mime.text import MIMEText
+from email.utils import parseaddr
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from googleapiclient.errors import HttpError
+
+from ..transport.pooled import worker_http
+
+# "Hi {{first_name}}" - double braces so templates can contain literal single braces
+PLACEHOLDER = re.compile(r'\{\{\s*(\w+)\s*\}\}')
+
+# Column holding each recipient's address, in order of preference
+ADDRESS_COLUMNS = ('email', 'to', 'email_address', 'address')
+
+# messages.send costs 100 of the 250 quota units each user gets per second
+SENDS_PER_SECOND = 250 / 100
+
+# Statuses that mean the message was definitely not accepted and can be sent again
+RATE_LIMIT_STATUSES = {429}
+# Statuses after which the message may or may not have gone out
+IN_DOUBT_STATUSES = {500, 502, 503, 504}
+
+# Longer waits than this mean the daily sending limit is used up, not a momentary rate limit
+MAX_RETRY_AFTER = 300.0
+
+
+@dataclass
+class Recipient:
+    row: int
+    address: str
+    fields: Dict[str, str]
+
+    @property
+    def key(self) -> str:
+        return self.address.lower()
+
+
+@dataclass
+class MergeResult:
+    sent: int = 0
+    already_sent: int = 0
+    recovered: int = 0
+    duplicates: int = 0
+    failed: int = 0
+    remaining: int = 0
+    quota_exhausted: bool = False
+    elapsed: float = 0.0
+    errors: List[str] = field(default_factory=list)
+    preview: Optional[str] = None
+
+
+def template_fields(*templates: str) -> Set[str]:
+    return {name for template in templates for name in PLACEHOLDER.findall(template)}
+
+
+def render(template: str, fields: Dict[str, str]) -> str:
+    """Fills `{{field}}` placeholders (field names are case-insensitive).
+
+    Raises:
+        KeyError: If a placeholder has no matching field
+    """
+    return PLACEHOLDER.sub(lambda match: fields[match.group(1).lower()], template)
+
+
+def load_recipients(path: str) -> Iterator[Recipient]:
+    """Reads recipients from a CSV/TSV file with a header row, or a JSON-lines file of objects.
+
+    Rows without an address (e.g. a JSON line lacking the column) are yielded
+    with an empty address, so they are reported along with other invalid rows.
+
+    Raises:
+        ValueError: If a CSV/TSV file has no address column or a JSON line isn't an object
+    """
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        if path.lower().endswith(('.jsonl', '.ndjson', '.json')):
+            rows = _json_rows(path, f)
+        else:
+            rows = csv.DictReader(f, dialect='excel-tab' if path.lower().endswith('.tsv') else 'excel')
+            header = {str(name).strip().lower() for name in rows.fieldnames or ()}
+            if not header.intersection(ADDRESS_COLUMNS):
+                raise ValueError(f"{path} has no recipient address column (expected one of: {', '.join(ADDRESS_COLUMNS)})")
+        for number, row in enumerate(rows, 1):
+            fields = {str(key).strip().lower(): '' if value is None else str(value).strip()
+                      for key, value in row.items() if key is not None}
+            column = next((name for name in ADDRESS_COLUMNS if name in fields), None)
+            yield Recipient(row=number, address=fields[column] if column else '', fields=fields)
+
+
+def _json_rows(path: str, lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    for number, line in enumerate((line for line in lines if line.strip()), 1):
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"{path} row {number} is not valid JSON: {e}")
+        if not isinstance(row, dict):
+            raise ValueError(f"{path} row {number} is not a JSON object")
+        yield row
+
+
+class RateLimiter:
+    """Token bucket shared by the sending threads.
+
+    Args:
+        rate: Tokens added per second
+        burst: Tokens that can accumulate while idle
+    """
+
+    def __init__(self, rate: float, burst: float = 1.0):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._resume_at = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now >= self._resume_at:
+                    self._tokens = min(self.burst, self._tokens + (now - max(self._updated, self._resume_at)) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+                else:
+                    wait = self._resume_at - now
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Holds every sender back for `seconds`, e.g. after a rate limit error."""
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+
+class SendJournal:
+    """Append-only JSON-lines log of every send attempt, fsynced before and after each send.
+
+    A recipient is `pending` from just before its message is handed to Gmail
+    until the outcome is recorded. Pending entries left by a crash are
+    in doubt and get checked against the Sent folder before anything is resent.
+    """
+
+    def __init__(self, path: str, fingerprint: str):
+        self.path = path
+        self._lock = threading.Lock()
+        job, self.states, partial = self.read(path, fingerprint)
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, 'a')
+        if partial:
+            self._file.write("\n")
+        if job is None:
+            job = {'type': 'job', 'job_id': uuid.uuid4().hex, 'fingerprint': fingerprint}
+            self._append(job)
+        self.job_id = job['job_id']
+
+    @staticmethod
+    def read(path: str, fingerprint: str) -> Tuple[Optional[Dict[str, Any]], Dict[str, Dict[str, Any]], bool]:
+        """Loads a journal without opening it for writing.
+
+        Returns:
+            Tuple: The job record (None for a new journal), the latest record per recipient key,
+                and whether the file ends in a partial line
+
+        Raises:
+            ValueError: If the journal belongs to a merge with a different template
+        """
+        job = None
+        states: Dict[str, Dict[str, Any]] = {}
+        partial = False
+        if not os.path.exists(path):
+            return job, states, partial
+        with open(path) as f:
+            for line in f:
+                partial = not line.endswith("\n")
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A crash can leave a partial last line
+                    continue
+                if record.get('type') == 'job':
+                    job = record
+                else:
+                    states[record['key']] = record
+        if job is not None and job['fingerprint'] != fingerprint:
+            raise ValueError(f"{path} is the journal of a merge with a different template; "
+                             f"use another journal path to start a new merge")
+        return job, states, partial
+
+    def state(self, key: str) -> Optional[str]:
+        record = self.states.get(key)
+        return record['type'] if record else None
+
+    def record(self, kind: str, key: str, **fields):
+        record = {'type': kind, 'key': key, 'at': time.time(), **fields}
+        with self._lock:
+            self._append(record)
+            self.states[key] = record
+
+    def _append(self, record: Dict[str, Any]):
+        self._file.write(json.dumps(record, separators=(',', ':')) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+class MailMerge:
+    """Sends one personalized email per recipient row, built from a subject and body template.
+
+    Messages are rendered and MIME-encoded on a worker pool and sent through a
+    token bucket sized to Gmail's per-user quota (2.5 sends per second).
+    Rate limit errors pause every worker and are retried; reaching the daily
+    sending limit stops the merge cleanly so it can be resumed another day.
+
+    Every message carries a Message-ID derived from the merge and the
+    recipient, and every send is journaled. Re-running a merge with the same
+    journal skips recipients already sent to, and a send interrupted mid-flight
+    is looked up in the Sent folder by that Message-ID before being retried,
+    so no recipient is ever emailed twice.
+
+    Args:
+        service: Gmail API service
+        workers: Threads rendering and sending messages
+        sends_per_second: Sustained send rate
+        max_attempts: Attempts per message before it is recorded as failed
+    """
+
+    def __init__(self, service: Any, workers: int = 4, sends_per_second: float = SENDS_PER_SECOND, max_attempts: int = 5):
+        self.service = service
+        self.workers = workers
+        self.limiter = RateLimiter(sends_per_second)
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        self._stop = threading.Event()
+
+    @staticmethod
+    def journal_path(recipients_path: str) -> str:
+        return f"{recipients_path}.journal"
+
+    def run(self, recipients_path: str, subject: str, body: str, html: bool = False,
+            journal_path: Optional[str] = None, max_sends: Optional[int] = None, dry_run: bool = False) -> MergeResult:
+        """Sends the merge, resuming from the journal if it has been started before.
+
+        Raises:
+            ValueError: If the recipient file can't be used or the journal belongs to another template
+        """
+        started = time.monotonic()
+        result = MergeResult()
+        fields = template_fields(subject, body)
+        # The whole file is read and checked before the first send, so an unreadable row can't stop a merge halfway
+        recipients = list(self._validated(load_recipients(recipients_path), {name.lower() for name in fields}, result))
+
+        fingerprint = hashlib.sha256(json.dumps([subject, body, html]).encode()).hexdigest()
+        journal_path = journal_path or self.journal_path(recipients_path)
+        if dry_run:
+            # Read-only, so a dry run neither creates the journal nor starts a job
+            _, states, _ = SendJournal.read(journal_path, fingerprint)
+            for recipient in recipients:
+                if states.get(recipient.key, {}).get('type') == 'sent':
+                    result.already_sent += 1
+                    continue
+                if result.preview is None:
+                    result.preview = (f"To: {recipient.address}\nSubject: {render(subject, recipient.fields)}\n\n"
+                                      f"{render(body, recipient.fields)}")
+                result.remaining += 1
+            result.elapsed = time.monotonic() - started
+            return result
+
+        journal = SendJournal(journal_path, fingerprint)
+        self._stop.clear()
+        try:
+            window: deque = deque()
+            with ThreadPoolExecutor(self.workers, thread_name_prefix="gmail-merge") as executor:
+                scheduled = 0
+                for recipient in recipients:
+                    state = journal.state(recipient.key)
+                    if state == 'sent':
+                        result.already_sent += 1
+                        continue
+                    if self._stop.is_set() or (max_sends is not None and scheduled >= max_sends):
+                        result.remaining += 1
+                        continue
+                    scheduled += 1
+                    window.append(executor.submit(self._deliver, journal, recipient, subject, body, html, state))
+                    # Keep a bounded number of rendered messages waiting on the rate limiter
+                    while len(window) >= self.workers * 2:
+                        self._tally(result, window.popleft().result())
+                while window:
+                    self._tally(result, window.popleft().result())
+        finally:
+            journal.close()
+        result.quota_exhausted = self._stop.is_set()
+        result.elapsed = time.monotonic() - started
+        return result
+
+    def _validated(self, recipients: Iterator[Recipient], fields: Set[str], result: MergeResult) -> Iterator[Recipient]:
+        seen: Set[str] = set()
+        for recipient in recipients:
+            address = parseaddr(recipient.address)[1]
+            if '@' not in address:
+                self._note(result, f"Row {recipient.row}: invalid address '{recipient.address}'")
+                result.failed += 1
+                continue
+            missing = sorted(fields - set(recipient.fields))
+            if missing:
+                self._note(result, f"Row {recipient.row} ({recipient.address}): no value for {', '.join(missing)}")
+                result.failed += 1
+                continue
+            if recipient.key in seen:
+                result.duplicates += 1
+                continue
+            seen.add(recipient.key)
+            yield recipient
+
+    def _tally(self, result: MergeResult, outcome: Tuple[str, Optional[str]]):
+        status, error = outcome
+        setattr(result, status, getattr(result, status) + 1)
+        if error:
+            self._note(result, error)
+
+    @staticmethod
+    def _note(result: MergeResult, error: str):
+        # Keep the summary short however many rows fail
+        if len(result.errors) < 5:
+            result.errors.append(error)
+
+    # Sending
+
+    def _http(self) -> Any:
+        # googleapiclient's default httplib2 transport isn't thread-safe, so each worker gets its own
+        if not hasattr(self._local, 'http'):
+            self._local.http = worker_http(self.service._http)
+        return self._local.http
+
+    def _message_id(self, journal: SendJournal, recipient: Recipient) -> str:
+        # Short enough that the header never gets folded
+        digest = hashlib.sha256(recipient.key.encode()).hexdigest()[:16]
+        return f"<merge-{journal.job_id[:12]}-{digest}@mail-merge.local>"
+
+    def _build(self, recipient: Recipient, subject: str, body: str, html: bool, message_id: str) -> str:
+        message = MIMEText(render(body, recipient.fields), 'html' if html else 'plain', 'utf-8')
+        message['to'] = recipient.address
+        message['subject'] = render(subject, recipient.fields)
+        message['Message-ID'] = message_id
+        return base64.urlsafe_b64encode(message.as_bytes()).decode()
+
+    def _deliver(self, journal: SendJournal, recipient: Recipient, subject: str, body: str, html: bool,
+                 state: Optional[str]) -> Tuple[str, Optional[str]]:
+        """Sends one message; returns ('sent' | 'recovered' | 'failed' | 'remaining', error)."""
+        message_id = self._message_id(journal, recipient)
+        try:
+            raw = self._build(recipient, subject, body, html, message_id)
+            # A pending entry means an earlier run crashed or lost the connection mid-send
+            in_doubt = state == 'pending'
+            for attempt in range(self.max_attempts):
+                self.limiter.acquire()
+                if self._stop.is_set():
+                    return 'remaining', None
+                if in_doubt:
+                    # Checked after the backoff wait, which gives Gmail time to index a message that did go out
+                    sent_id = self._find_sent(message_id)
+                    if sent_id is not None:
+                        journal.record('sent', recipient.key, id=sent_id, message_id=message_id)
+                        return 'recovered', None
+
+                journal.record('pending', recipient.key, message_id=message_id)
+                try:
+                    sent = self.service.users().messages().send(userId='me', body={'raw': raw}).execute(http=self._http())
+                    journal.record('sent', recipient.key, id=sent['id'], message_id=message_id)
+                    return 'sent', None
+                except HttpError as e:
+                    if self._quota_exhausted(e):
+                        journal.record('failed', recipient.key, error="daily sending limit reached")
+                        self._stop.set()
+                        return 'remaining', None
+                    if e.resp.status in RATE_LIMIT_STATUSES or _rate_limited(e):
+                        in_doubt = False
+                    elif e.resp.status in IN_DOUBT_STATUSES:
+                        in_doubt = True
+                    else:
+                        journal.record('failed', recipient.key, error=str(e))
+                        return 'failed', f"{recipient.address}: {e}"
+                    self.limiter.pause(_retry_after(e) or min(32.0, 2.0 ** attempt) * (0.5 + random.random() / 2))
+                except (ConnectionError, socket.timeout):
+                    in_doubt = True
+                    time.sleep(min(32.0, 2.0 ** attempt) * (0.5 + random.random() / 2))
+
+            sent_id = self._find_sent(message_id) if in_doubt else None
+            if sent_id is not None:
+                journal.record('sent', recipient.key, id=sent_id, message_id=message_id)
+                return 'recovered', None
+            if not in_doubt:
+                journal.record('failed', recipient.key, error="still rate limited")
+            # An in-doubt entry stays pending so the next run checks again before resending
+            return 'failed', f"{recipient.address}: gave up after {self.max_attempts} attempts"
+        except Exception as e:
+            return 'failed', f"{recipient.address}: {e}"
+
+    def _find_sent(self, message_id: str) -> Optional[str]:
+        response = self.service.users().messages().list(
+            userId='me',
+            q=f"in:sent rfc822msgid:{message_id}",
+            maxResults=1,
+            fields='messages/id'
+        ).execute(http=self._http())
+        messages = response.get('messages', [])
+        return messages[0]['id'] if messages else None
+
+    @staticmethod
+    def _quota_exhausted(error: HttpError) -> bool:
+        if error.resp.status not in (403, 429):
+            return False
+        content = (error.content or b'').lower()
+        if b'dailylimitexceeded' in content or b'sending limit' in content:
+            return True
+        retry_after = _retry_after(error)
+        return retry_after is not None and retry_after > MAX_RETRY_AFTER
+
+
+def _rate_limited(error: HttpError) -> bool:
+    # Gmail reports short-term per-user limits as 403 rateLimitExceeded/userRateLimitExceeded
+    return error.resp.status == 403 and b'ateLimitExceeded' in (error.content or b'')
+
+
+def _retry_after(error: HttpError) -> Optional[float]:
+    value = error.resp.get('retry-after') if hasattr(error.resp, 'get') else None
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
@@ -0,0 +1,187 @@
+# tools/gmail/gmail_text.py
+
+import base64
+import html
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+_TAGS = re.compile(r'<[^>]+>')
+_SPACES = re.compile(r'\s+')
+_BLANK_RUNS = re.compile(r'\n{3,}')
+
+# "On Tue, 5 Mar 2024 at 10:00, Alice <alice@example.com> wrote:" (and the French/German/Spanish forms)
+_ATTRIBUTION = re.compile(r'^\s*(on|le|am|el)\b.*\b(wrote|a écrit|schrieb|escribió)\s*:\s*$', re.IGNORECASE)
+
+# Reply separators after which Outlook and friends append the whole previous message
+_ORIGINAL = re.compile(r'^\s*(-{2,}\s*original message\s*-{2,}|_{20,})\s*$', re.IGNORECASE)
+_OUTLOOK_FROM = re.compile(r'^\s*\*?from:\*?\s', re.IGNORECASE)
+_OUTLOOK_FIELDS = re.compile(r'^\s*\*?(sent|date|to|subject):\*?\s', re.IGNORECASE)
+_FORWARDED = re.compile(r'^\s*-{2,}\s*(forwarded message|begin forwarded message)\s*-*\s*:?\s*$', re.IGNORECASE)
+_OUTLOOK_CC = re.compile(r'^\s*\*?(cc|bcc):\*?\s', re.IGNORECASE)
+
+# Quote markers, wherever a reflowed quote put them
+_QUOTE_MARKERS = re.compile(r'(^|\s)>+')
+
+# Leading characters of an earlier message that a quote of all of it must start with. Gmail
+# snippets are longer than this, so they can stand in for bodies that weren't fetched.
+_QUOTE_PROBE_LENGTH = 100
+
+# Shorter fragments ("ok", "thanks") occur in too many messages to identify which one a quote repeats
+_MIN_PARTIAL_QUOTE = 20
+
+# RFC 3676 signature delimiter; "--" without the trailing space is common enough to accept too
+_SIGNATURE = re.compile(r'^-- ?$')
+
+
+def header_map(payload: Dict[str, Any]) -> Dict[str, str]:
+    """Lower-cased header name -> value (repeated headers are joined)."""
+    headers: Dict[str, str] = {}
+    for header in payload.get('headers', []):
+        name = header['name'].lower()
+        headers[name] = f"{headers[name]}, {header['value']}" if name in headers else header['value']
+    return headers
+
+
+def message_text(payload: Dict[str, Any]) -> str:
+    """Returns the plain-text body of a `format='full'` payload, falling back to de-tagged HTML."""
+    plain: List[str] = []
+    rich: List[str] = []
+    stack = [payload]
+    while stack:
+        part = stack.pop()
+        if part.get('parts'):
+            stack.extend(reversed(part['parts']))
+            continue
+        data = part.get('body', {}).get('data')
+        if not data:
+            continue
+        mime_type = part.get('mimeType', '')
+        text = base64.urlsafe_b64decode(data).decode('utf-8', errors='replace')
+        if mime_type == 'text/plain':
+            plain.append(text)
+        elif mime_type == 'text/html':
+            rich.append(text)
+    if plain:
+        return "\n".join(plain)
+    return _SPACES.sub(' ', html.unescape(_TAGS.sub(' ', "\n".join(rich)))).strip()
+
+
+def strip_quoted(text: str, earlier: Iterable[str] = ()) -> Tuple[str, int]:
+    """Removes the history a reply quotes: "> " blocks, their attribution line and Outlook-style appended originals.
+
+    A block is only removed when it repeats one of the earlier messages of
+    the thread, so quotes of anything else (a document, a message from
+    another thread) stay. Forwarded messages are always kept, since their
+    content isn't shown anywhere else.
+
+    Args:
+        text: Plain-text body of the reply
+        earlier: Bodies (or Gmail snippets) of the messages before it in the thread
+
+    Returns:
+        Tuple[str, int]: The reply's own text and the number of lines removed
+    """
+    earlier_texts = [normalized for normalized in (_normalize(body) for body in earlier) if normalized]
+    lines = text.replace('\r\n', '\n').split('\n')
+    kept: List[str] = []
+    removed = 0
+    index = 0
+    while index < len(lines):
+        line = lines[index]
+        if _FORWARDED.match(line):
+            kept.extend(lines[index:])
+            break
+        if _ORIGINAL.match(line) or _is_outlook_header(lines, index):
+            if _repeats_earlier(_strip_outlook_header(lines[index:]), earlier_texts):
+                removed += len(lines) - index
+                break
+            kept.append(line)
+            index += 1
+            continue
+        if line.lstrip().startswith('>'):
+            end = _quote_end(lines, index)
+            if _repeats_earlier(lines[index:end], earlier_texts):
+                removed += end - index + _pop_attribution(kept)
+            else:
+                kept.extend(lines[index:end])
+            index = end
+            continue
+        kept.append(line)
+        index += 1
+    return _BLANK_RUNS.sub('\n\n', "\n".join(kept)).strip(), removed
+
+
+def split_signature(text: str) -> Tuple[str, Optional[str]]:
+    """Splits a body at its last signature delimiter, returning (body, signature or None)."""
+    lines = text.split('\n')
+    for index in range(len(lines) - 1, -1, -1):
+        if _SIGNATURE.match(lines[index]):
+            signature = "\n".join(lines[index + 1:]).strip()
+            # More than a dozen lines after "--" is more likely a separator in the body than a signature
+            if signature and len(lines) - index <= 12:
+                return "\n".join(lines[:index]).rstrip(), signature
+            break
+    return text, None
+
+
+def _normalize(text: str) -> str:
+    """Collapses a body or quote to lower-cased words without quote markers, for comparison."""
+    return _SPACES.sub(' ', _QUOTE_MARKERS.sub(' ', html.unescape(text))).strip().lower()
+
+
+def _repeats_earlier(block: List[str], earlier_texts: List[str]) -> bool:
+    """Whether a quoted block is (a part of, or the start of) one of the earlier messages."""
+    quoted = _normalize("\n".join(block))
+    if not quoted:
+        return True
+    for text in earlier_texts:
+        if quoted == text or (len(quoted) >= _MIN_PARTIAL_QUOTE and quoted in text):
+            return True
+        # A short earlier message ("Thanks") is only matched whole: as a prefix it would hide
+        # any quote that happens to start with the same words
+        if len(text) >= _QUOTE_PROBE_LENGTH and quoted.startswith(text[:_QUOTE_PROBE_LENGTH]):
+            return True
+    return False
+
+
+def _quote_end(lines: List[str], index: int) -> int:
+    """End of the "> " block starting at `index`; blank lines between quoted paragraphs belong to it."""
+    end = index
+    for position in range(index, len(lines)):
+        if lines[position].lstrip().startswith('>'):
+            end = position + 1
+        elif lines[position].strip():
+            break
+    return end
+
+
+def _pop_attribution(kept: List[str]) -> int:
+    """Drops the "On ..., X wrote:" line introducing a removed quote (wrapped onto two lines by some clients)."""
+    end = len(kept)
+    while end and not kept[end - 1].strip():
+        end -= 1
+    if end >= 1 and _ATTRIBUTION.match(kept[end - 1]):
+        start = end - 1
+    elif end >= 2 and _ATTRIBUTION.match(f"{kept[end - 2].strip()} {kept[end - 1].strip()}"):
+        start = end - 2
+    else:
+        return 0
+    del kept[start:end]
+    return end - start
+
+
+def _strip_outlook_header(lines: List[str]) -> List[str]:
+    """The body of an appended original, without the separator and From/Sent/To/Subject lines."""
+    for index, line in enumerate(lines):
+        if line.strip() and not (_ORIGINAL.match(line) or _OUTLOOK_FROM.match(line)
+                                 or _OUTLOOK_FIELDS.match(line) or _OUTLOOK_CC.match(line)):
+            return lines[index:]
+    return []
+
+
+def _is_outlook_header(lines: List[str], index: int) -> bool:
+    """A "From:" line after a blank line, followed by at least two of Sent/Date/To/Subject, starts an appended original."""
+    if not _OUTLOOK_FROM.match(lines[index]) or (index > 0 and lines[index - 1].strip()):
+        return False
+    fields = sum(1 for line in lines[index + 1:index + 6] if _OUTLOOK_FIELDS.match(line))
+    return fields >= 2
@@ -1,18 +1,44 @@
 # tools/gmail/gmail_toolkit.py
 
 import base64
+import random
+import time
+from collections import Counter
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import List, Optional, Dict, Any
-from datetime import datetime
+from typing import List, Optional, Dict, Any, Callable
+from googleapiclient.errors import HttpError
 from phi.tools import Toolkit
 from .gmail_auth import GmailAuth
-from .gmail_types import EmailMessage, EmailDraft, EmailLabel, EmailResponse, EmailAddress
+from .gmail_export import MailExporter, RETRYABLE_STATUSES
+from .gmail_merge import MailMerge
+from .gmail_text import header_map, message_text, split_signature, strip_quoted
+from .gmail_triage import DEFAULT_RULES, classify, compile_rules, label_changes, referenced_headers
+from ..sync.cache import ResourceCache
+from ..sync.memo import ToolMemo, mark_partial
+from ..tenancy.files import resolve_user_path
+from ..tenancy.pool import ServicePool, current_user
+from ..timeutil.parsing import parse_rfc2822
+from .gmail_types import EmailMessage, EmailDraft, EmailLabel, EmailResponse, EmailAddress, TriageRule
 
 class GmailTools(Toolkit):
-    def __init__(self):
+    def __init__(self,
+                 service: Optional[Any] = None,
+                 http: Optional[Any] = None,
+                 cache: Optional[ResourceCache] = None,
+                 pool: Optional[ServicePool] = None,
+                 memo: Optional[ToolMemo] = None,
+                 files_dir: str = "tmp/files"):
         super().__init__(name="gmail_tools")
-        self.service = GmailAuth.get_gmail_service()
+        # In multi-tenant mode each call uses the caller's service leased from the pool
+        self.pool = pool
+        self._service = None if pool is not None else (service or GmailAuth.get_gmail_service(http=http))
+        # Optional cache of fetched resources, kept fresh by tools.sync.push.PushSyncHub
+        self.cache = cache
+        # Optional persistent memo of read-only tool results, shared across sessions
+        self.memo = memo
+        # Exports (and mail merge files) are read and written under <files_dir>/<user>/ only
+        self.files_dir = files_dir
         
         # Register all the methods
         self.register(self.send_email)
@@ -24,6 +50,126 @@ class GmailTools(Toolkit):
         self.register(self.apply_label)
         self.register(self.search_emails)
         self.register(self.get_email_thread)
+        self.register(self.export_emails)
+        self.register(self.triage_inbox)
+        self.register(self.send_bulk_email)
+
+        if memo is not None:
+            memo.instrument(self, {
+                # A message's historyId changes whenever its labels do
+                'read_email': lambda args: self.service.users().messages().get(
+                    userId='me', id=args['message_id'], format='minimal', fields='historyId'
+                ).execute()['historyId'],
+                'get_email_thread': lambda args: self.service.users().threads().get(
+                    userId='me', id=args['thread_id'], format='minimal', fields='historyId'
+                ).execute()['historyId'],
+                # list_labels isn't memoized: label changes don't show up in any historyId,
+                # so there is no version to check
+            })
+        if pool is not None:
+            pool.bind(self)
+
+    @property
+    def service(self):
+        if self.pool is not None:
+            return self.pool.current()
+        return self._service
+
+    def _cached(self, kind: str, resource_id: str, fetch: Callable[[], Any], variant: Optional[str] = None) -> Any:
+        if self.cache is None:
+            return fetch()
+        return self.cache.get_or_fetch(current_user() or 'me', kind, resource_id, fetch, variant)
+
+    def _invalidate(self, kind: str, resource_id: Optional[str]):
+        if self.cache is not None and resource_id:
+            self.cache.invalidate(current_user() or 'me', kind, resource_id)
+
+    def _get_messages(self, message_ids: List[str], fmt: str = 'metadata',
+                      metadata_headers: Optional[List[str]] = None, max_attempts: int = 3) -> Dict[str, Dict[str, Any]]:
+        """Fetches many messages through the cache and batch requests; ids that can't be fetched are left out."""
+        user = current_user() or 'me'
+        if fmt == 'full':
+            variant = 'full'
+        elif not metadata_headers or {h.lower() for h in metadata_headers} <= {'from', 'subject', 'date'}:
+            variant = 'metadata'
+        else:
+            variant = ('metadata', tuple(sorted(h.lower() for h in metadata_headers)))
+
+        fetched: Dict[str, Dict[str, Any]] = {}
+        pending = []
+        for message_id in dict.fromkeys(message_ids):
+            cached = None
+            if self.cache is not None:
+                # A full message has every header, so it also answers metadata lookups
+                cached = self.cache.get(user, 'message', message_id, variant)
+                if cached is None and fmt != 'full':
+                    cached = self.cache.get(user, 'message', message_id, 'full')
+            if cached is not None:
+                fetched[message_id] = cached
+            else:
+                pending.append(message_id)
+
+        # Gmail allows 100 calls per batch; 50 keeps clear of per-user rate limits
+        for start in range(0, len(pending), 50):
+            chunk = pending[start:start + 50]
+            for attempt in range(max_attempts):
+                retry: List[str] = []
+
+                def callback(request_id, response, exception):
+                    if exception is None:
+                        fetched[request_id] = response
+                        if self.cache is not None:
+                            self.cache.put(user, 'message', request_id, response, variant)
+                    elif isinstance(exception, HttpError) and exception.resp.status in RETRYABLE_STATUSES:
+                        retry.append(request_id)
+
+                batch = self.service.new_batch_http_request(callback=callback)
+                for message_id in chunk:
+                    if fmt == 'full':
+                        request = self.service.users().messages().get(userId='me', id=message_id, format='full')
+                    else:
+                        request = self.service.users().messages().get(
+                            userId='me', id=message_id, format='metadata', metadataHeaders=metadata_headers or [])
+                    batch.add(request, request_id=message_id)
+                batch.execute()
+
+                if not retry:
+                    break
+                chunk = retry
+                if attempt + 1 < max_attempts:
+                    time.sleep(min(8.0, 2.0 ** attempt) * (0.5 + random.random() / 2))
+        return fetched
+
+    def _label_ids(self) -> Dict[str, str]:
+        results = self.service.users().labels().list(userId='me').execute()
+        return {label['name'].lower(): label['id'] for label in results.get('labels', [])}
+
+    def _label_ids_by_name(self, names: List[str], create: bool) -> Dict[str, str]:
+        """Resolves label names (case-insensitively) to ids, creating the missing ones if asked to."""
+        # Not cached: label changes made elsewhere don't produce any push notification
+        existing = self._label_ids()
+        label_ids = {}
+        for name in names:
+            if name.lower() in existing:
+                label_ids[name] = existing[name.lower()]
+            elif create:
+                try:
+                    created = self.service.users().labels().create(
+                        userId='me',
+                        body={'name': name, 'labelListVisibility': 'labelShow', 'messageListVisibility': 'show'}
+                    ).execute()
+                    existing[name.lower()] = label_ids[name] = created['id']
+                except HttpError as e:
+                    # Created concurrently (e.g. by another session) since the listing above
+                    if e.resp.status != 409:
+                        raise
+                    existing = self._label_ids()
+                    if name.lower() not in existing:
+                        raise
+                    label_ids[name] = existing[name.lower()]
+            else:
+                label_ids[name] = f"(new label {name})"
+        return label_ids
 
     def send_email(self, 
                   to: str,
@@ -64,6 +210,7 @@ class GmailTools(Toolkit):
                 userId='me',
                 body={'raw': raw_message}
             ).execute()
+            self._invalidate('thread', sent_message.get('threadId'))
             
             return f"✅ Email sent successfully. Message ID: {sent_message['id']}"
         except Exception as e:
@@ -143,12 +290,12 @@ class GmailTools(Toolkit):
             response = "📧 **Recent Emails**:\n\n"
             for idx, msg in enumerate(messages, 1):
                 try:
-                    message = self.service.users().messages().get(
+                    message = self._cached('message', msg['id'], lambda: self.service.users().messages().get(
                         userId='me',
                         id=msg['id'],
                         format='metadata',
                         metadataHeaders=['From', 'Subject', 'Date']
-                    ).execute()
+                    ).execute(), variant='metadata')
                     
                     headers = message['payload']['headers']
                     subject = next((h['value'] for h in headers if h['name'] == 'Subject'), 'No Subject')
@@ -160,10 +307,10 @@ class GmailTools(Toolkit):
                     sender = sender.replace('\r', ' ').replace('\n', ' ').strip()
                     
                     # Format the date
-                    try:
-                        parsed_date = datetime.strptime(date.split('(')[0].strip(), '%a, %d %b %Y %H:%M:%S %z')
+                    parsed_date = parse_rfc2822(date)
+                    if parsed_date is not None:
                         date = parsed_date.strftime('%Y-%m-%d %H:%M')
-                    except:
+                    else:
                         # If date parsing fails, clean up the raw date string
                         date = date.replace('\r', ' ').replace('\n', ' ').strip()
                     
@@ -190,11 +337,11 @@ class GmailTools(Toolkit):
             str: Formatted email content
         """
         try:
-            message = self.service.users().messages().get(
+            message = self._cached('message', message_id, lambda: self.service.users().messages().get(
                 userId='me',
                 id=message_id,
                 format='full'
-            ).execute()
+            ).execute(), variant='full')
             
             headers = message['payload']['headers']
             subject = next((h['value'] for h in headers if h['name'] == 'Subject'), 'No Subject')
@@ -294,11 +441,13 @@ class GmailTools(Toolkit):
                 'removeLabelIds': remove_labels or []
             }
             
-            self.service.users().messages().modify(
+            modified = self.service.users().messages().modify(
                 userId='me',
                 id=message_id,
                 body=body
             ).execute()
+            self._invalidate('message', message_id)
+            self._invalidate('thread', modified.get('threadId'))
             
             return f"✅ Labels updated successfully for message: {message_id}"
         except Exception as e:
@@ -329,12 +478,12 @@ class GmailTools(Toolkit):
             
             response = f"🔍 Search Results for: '{query}'\n\n"
             for msg in messages:
-                message = self.service.users().messages().get(
+                message = self._cached('message', msg['id'], lambda: self.service.users().messages().get(
                     userId='me',
                     id=msg['id'],
                     format='metadata',
                     metadataHeaders=['From', 'Subject', 'Date']
-                ).execute()
+                ).execute(), variant='metadata')
                 
                 headers = message['payload']['headers']
                 subject = next((h['value'] for h in headers if h['name'] == 'Subject'), 'No Subject')
@@ -350,52 +499,280 @@ class GmailTools(Toolkit):
         except Exception as e:
             return f"❌ Failed to search emails: {str(e)}"
 
-    def get_email_thread(self, thread_id: str) -> str:
-        """Gets all messages in an email thread.
-        
+    def get_email_thread(self,
+                         thread_id: str,
+                         offset: int = 0,
+                         max_messages: int = 10,
+                         include_quoted: bool = False) -> str:
+        """Gets the messages in an email thread, oldest first, a page at a time.
+
+        Quoted history and signatures already shown earlier in the thread are
+        left out, so each message shows only what it added.
+
         Args:
             thread_id: ID of the thread to retrieve
-        
+            offset: Number of messages to skip from the start of the thread (negative counts from the end,
+                e.g. -5 for the latest five)
+            max_messages: Maximum number of messages to show
+            include_quoted: Whether to keep the quoted text of earlier messages in replies
+
         Returns:
             str: Formatted thread content
         """
         try:
-            thread = self.service.users().threads().get(
+            # Headers for the whole thread are cheap; bodies are only fetched for the page shown
+            thread = self._cached('thread', thread_id, lambda: self.service.users().threads().get(
                 userId='me',
-                id=thread_id
-            ).execute()
-            
-            if not thread['messages']:
+                id=thread_id,
+                format='metadata',
+                metadataHeaders=['From', 'Subject', 'Date']
+            ).execute(), variant='metadata')
+
+            messages = thread.get('messages', [])
+            if not messages:
                 return "No messages found in thread."
-            
-            response = "📧 Email Thread:\n\n"
-            for message in thread['messages']:
-                headers = message['payload']['headers']
-                subject = next((h['value'] for h in headers if h['name'] == 'Subject'), 'No Subject')
-                sender = next((h['value'] for h in headers if h['name'] == 'From'), 'Unknown')
-                date = next((h['value'] for h in headers if h['name'] == 'Date'), '')
-                
-                response += f"### {subject}\n"
-                response += f"**From**: {sender}\n"
-                response += f"**Date**: {date}\n"
-                
-                # Get message body
-                if 'parts' in message['payload']:
-                    parts = message['payload']['parts']
-                    body = next((
-                        base64.urlsafe_b64decode(part['body']['data']).decode()
-                        for part in parts
-                        if part['mimeType'] in ['text/plain', 'text/html']
-                        and 'data' in part['body']
-                    ), "No readable content")
-                else:
-                    body = base64.urlsafe_b64decode(
-                        message['payload']['body'].get('data', '')).decode()
-                
+
+            total = len(messages)
+            start = max(0, total + offset) if offset < 0 else min(offset, total)
+            page = messages[start:start + max(1, max_messages)]
+            if not page:
+                return f"No messages at offset {offset}; the thread has {total} messages."
+            bodies = self._get_messages([message['id'] for message in page], 'full')
+
+            first = header_map(messages[0].get('payload', {}))
+            senders = list(dict.fromkeys(header_map(m.get('payload', {})).get('from', 'Unknown') for m in messages))
+            response = f"📧 Email Thread: {first.get('subject', 'No Subject')}\n"
+            response += f"**Participants**: {', '.join(senders)}\n"
+            response += f"**Messages**: {start + 1}-{start + len(page)} of {total}\n\n"
+
+            seen_signatures = set()
+            # Quotes are only hidden when they repeat an earlier message; snippets stand in for unfetched bodies
+            earlier = [message.get('snippet', '') for message in messages[:start]]
+            for position, message in enumerate(page, start + 1):
+                headers = header_map(message.get('payload', {}))
+                response += f"### {position}. {headers.get('from', 'Unknown')}\n"
+                response += f"**Date**: {headers.get('date', '')}\n"
+                response += f"**ID**: `{message['id']}`\n"
+
+                full = bodies.get(message['id'])
+                if full is None:
+                    response += "\n---\n⚠️ Could not load this message\n---\n\n"
+                    mark_partial()
+                    earlier.append(message.get('snippet', ''))
+                    continue
+                text = message_text(full.get('payload', {}))
+                body = text or "No readable content"
+                hidden = 0
+                if not include_quoted:
+                    body, hidden = strip_quoted(body, earlier)
+                    body, signature = split_signature(body)
+                    if signature is not None and signature not in seen_signatures:
+                        seen_signatures.add(signature)
+                        body += f"\n-- \n{signature}"
+
+                earlier.append(text)
                 response += "\n---\n"
                 response += body
+                if hidden:
+                    response += f"\n[{hidden} quoted lines hidden]"
                 response += "\n---\n\n"
-            
+
+            if start + len(page) < total:
+                response += f"**More**: {total - start - len(page)} later messages (use offset={start + len(page)})\n"
+            if start > 0:
+                response += f"**Earlier**: {start} messages before these (use offset={max(0, start - max_messages)})\n"
             return response
         except Exception as e:
             return f"❌ Failed to get thread: {str(e)}"
+
+    def export_emails(self,
+                      query: str,
+                      output_path: str,
+                      file_format: str = "mbox",
+                      max_messages: Optional[int] = None,
+                      resume: bool = True) -> str:
+        """Exports all emails matching a search query to an mbox or JSONL file (for backup or hand-off).
+
+        Interrupted exports continue where they stopped when run again with the same arguments.
+
+        Args:
+            query: Gmail search query (e.g. "from:alice@example.com after:2024/01/01"); empty for all mail
+            output_path: File to write the export to, relative to the user's files directory
+            file_format: "mbox" or "jsonl" (one JSON object with the base64url raw message per line)
+            max_messages: Maximum number of emails to export
+            resume: Whether to continue an interrupted export of the same query into the same file
+
+        Returns:
+            str: Export summary
+        """
+        try:
+            path = resolve_user_path(self.files_dir, output_path)
+            result = MailExporter(self.service).export(query, path, file_format, max_messages, resume)
+
+            response = (
+                f"✅ Exported {result.exported} emails matching '{query}' to {output_path} "
+                f"({file_format}, {result.bytes_written / (1024 * 1024):.1f} MB) in {result.elapsed:.1f}s"
+            )
+            if result.resumed_from:
+                response += f"\n**Resumed** after {result.resumed_from} previously exported emails"
+            if result.skipped:
+                response += f"\n⚠️ {result.skipped} emails could not be fetched and were skipped"
+            return response
+        except Exception as e:
+            return f"❌ Failed to export emails: {str(e)}"
+
+    def triage_inbox(self,
+                     rules: Optional[List[TriageRule]] = None,
+                     query: str = "in:inbox",
+                     max_results: int = 50,
+                     page_token: Optional[str] = None,
+                     dry_run: bool = False) -> str:
+        """Sorts a page of emails in one call: fetches them, matches them against rules and labels them in bulk.
+
+        Every rule whose patterns all match applies its label (created if missing),
+        and can also archive the email or mark it as read. Without rules, emails
+        are sorted into Triage/Newsletters, Triage/Notifications, Triage/Finance,
+        Triage/Calendar and Triage/Security.
+
+        Args:
+            rules: Triage rules to apply (defaults to the built-in rules). Each rule has a `label` and any of
+                `from_pattern`, `subject_pattern`, `header_patterns` (header name -> pattern) and `body_pattern`
+                (case-insensitive regexes), plus optional `archive` and `mark_read` flags
+            query: Gmail search query selecting the emails to triage
+            max_results: Maximum number of emails to triage (up to 500)
+            page_token: Token from a previous call's summary to triage the next page
+            dry_run: Only report what would be labeled, without changing anything
+
+        Returns:
+            str: Summary of the labels applied
+        """
+        try:
+            rules = rules or DEFAULT_RULES
+            compiled = compile_rules(rules)
+
+            results = self.service.users().messages().list(
+                userId='me',
+                q=query,
+                maxResults=min(max_results, 500),
+                pageToken=page_token
+            ).execute()
+            message_ids = [msg['id'] for msg in results.get('messages', [])]
+            next_page = results.get('nextPageToken')
+            if not message_ids:
+                return f"📭 No emails matching '{query}' to triage."
+
+            # Bodies are only downloaded when a rule looks at them
+            needs_body = any(rule.body_pattern for rule in rules)
+            if needs_body:
+                messages = self._get_messages(message_ids, 'full')
+            else:
+                messages = self._get_messages(message_ids, 'metadata', referenced_headers(rules))
+
+            label_ids = self._label_ids_by_name(list(dict.fromkeys(rule.label for rule in rules)), create=not dry_run)
+
+            # Emails getting the same label changes share one batchModify call
+            groups: Dict[tuple, List[Dict[str, Any]]] = {}
+            counts: Counter = Counter()
+            samples: Dict[str, List[str]] = {}
+            unmatched = 0
+            for message_id in message_ids:
+                message = messages.get(message_id)
+                if message is None:
+                    continue
+                matched = classify(compiled, message, needs_body)
+                changes = label_changes(matched, label_ids)
+                if changes is None:
+                    unmatched += 1
+                    continue
+                groups.setdefault(changes, []).append(message)
+                subject = header_map(message.get('payload', {})).get('subject', 'No Subject')
+                for label in dict.fromkeys(rule.label for rule in matched):
+                    counts[label] += 1
+                    if len(samples.setdefault(label, [])) < 3:
+                        samples[label].append(" ".join(subject.split())[:80])
+
+            if not dry_run:
+                for (add, remove), group in groups.items():
+                    for start in range(0, len(group), 1000):
+                        chunk = group[start:start + 1000]
+                        self.service.users().messages().batchModify(
+                            userId='me',
+                            body={'ids': [m['id'] for m in chunk], 'addLabelIds': list(add), 'removeLabelIds': list(remove)}
+                        ).execute()
+                        for message in chunk:
+                            self._invalidate('message', message['id'])
+                            self._invalidate('thread', message.get('threadId'))
+
+            labeled = sum(len(group) for group in groups.values())
+            skipped = len(message_ids) - len(messages)
+            response = (f"🗂️ {'Would label' if dry_run else 'Labeled'} {labeled} of {len(message_ids)} emails "
+                        f"matching '{query}'\n\n")
+            for rule in rules:
+                if rule.label in counts:
+                    actions = "".join([", archived" if rule.archive else "", ", marked read" if rule.mark_read else ""])
+                    response += f"- **{rule.label}**: {counts.pop(rule.label)}{actions} (e.g. {'; '.join(samples[rule.label])})\n"
+            response += f"- Unmatched: {unmatched}\n"
+            if skipped:
+                response += f"\n⚠️ {skipped} emails could not be fetched and were skipped\n"
+            if next_page:
+                response += f"\n**Next page token**: `{next_page}`\n"
+            return response
+        except Exception as e:
+            return f"❌ Failed to triage inbox: {str(e)}"
+
+    def send_bulk_email(self,
+                        recipients_file: str,
+                        subject: str,
+                        body: str,
+                        html: bool = False,
+                        journal_path: Optional[str] = None,
+                        max_sends: Optional[int] = None,
+                        dry_run: bool = False) -> str:
+        """Sends a personalized copy of a templated email to every recipient in a CSV or JSON-lines file (mail merge).
+
+        `{{column}}` placeholders in the subject and body are filled from each row;
+        the address comes from the `email` (or `to`) column. Sending runs at the
+        highest rate Gmail's quota allows and is journaled, so running the same
+        merge again continues where it stopped and never emails anyone twice.
+
+        Args:
+            recipients_file: CSV/TSV file with a header row, or JSON-lines file, with one recipient per row,
+                relative to the user's files directory
+            subject: Subject template, e.g. "Your {{event}} ticket"
+            body: Body template, e.g. "Hi {{first_name}}, ..."
+            html: Whether the body is HTML
+            journal_path: Progress journal, relative to the user's files directory
+                (defaults to the recipients file path plus ".journal")
+            max_sends: Maximum number of emails to send in this call (the rest are sent by the next call)
+            dry_run: Only validate the rows and preview the first email, without sending
+
+        Returns:
+            str: Send summary
+        """
+        try:
+            recipients_path = resolve_user_path(self.files_dir, recipients_file)
+            journal = resolve_user_path(self.files_dir, journal_path) if journal_path else None
+            result = MailMerge(self.service).run(recipients_path, subject, body, html, journal, max_sends, dry_run)
+
+            if dry_run:
+                response = f"📝 Would send {result.remaining} emails from {recipients_file}"
+                if result.already_sent:
+                    response += f"\n**Already sent** by an earlier run: {result.already_sent}"
+                if result.preview:
+                    response += f"\n\n**Preview**:\n```\n{result.preview}\n```"
+            else:
+                response = f"✅ Sent {result.sent} emails from {recipients_file} in {result.elapsed:.1f}s"
+                if result.already_sent or result.recovered:
+                    response += f"\n**Already sent** by an earlier run: {result.already_sent + result.recovered}"
+                if result.quota_exhausted:
+                    response += f"\n⚠️ Gmail's daily sending limit was reached; {result.remaining} emails are left"
+                    response += " and will be sent when this is run again later"
+                elif result.remaining:
+                    response += f"\n**Remaining**: {result.remaining} (run again to continue)"
+            if result.duplicates:
+                response += f"\n**Duplicates skipped**: {result.duplicates}"
+            if result.failed:
+                response += f"\n⚠️ {result.failed} rows failed:\n" + "\n".join(f"- {error}" for error in result.errors)
+            return response
+        except Exception as e:
+            return f"❌ Failed to send bulk email: {str(e)}"
@@ -0,0 +1,103 @@
+# tools/gmail/gmail_triage.py
+
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Pattern, Set
+
+from .gmail_text import header_map, message_text
+from .gmail_types import TriageRule
+
+# Used when the caller doesn't pass rules
+DEFAULT_RULES = [
+    TriageRule(label="Triage/Newsletters", header_patterns={'List-Unsubscribe': r'.'}),
+    TriageRule(label="Triage/Notifications",
+               from_pattern=r'\b(no-?reply|do-?not-?reply|notifications?|alerts?|mailer-daemon)@'),
+    TriageRule(label="Triage/Finance",
+               subject_pattern=r'\b(invoice|receipt|payment|statement|billing|order confirmation)\b'),
+    TriageRule(label="Triage/Calendar",
+               subject_pattern=r'^(invitation|updated invitation|accepted|declined|tentatively accepted|canceled event)\b'),
+    TriageRule(label="Triage/Security",
+               subject_pattern=r'\b(security alert|sign-?in|password|verification code|verify your)\b'),
+]
+
+# Headers every rule can see, on top of the ones rules reference
+BASE_HEADERS = ['From', 'Subject', 'Date']
+
+
+@dataclass
+class CompiledRule:
+    rule: TriageRule
+    sender: Optional[Pattern]
+    subject: Optional[Pattern]
+    headers: Dict[str, Pattern]
+    body: Optional[Pattern]
+
+    def matches(self, headers: Dict[str, str], body: Optional[str]) -> bool:
+        if self.sender and not self.sender.search(headers.get('from', '')):
+            return False
+        if self.subject and not self.subject.search(headers.get('subject', '')):
+            return False
+        for name, pattern in self.headers.items():
+            if name not in headers or not pattern.search(headers[name]):
+                return False
+        if self.body and not self.body.search(body or ''):
+            return False
+        return True
+
+
+def compile_rules(rules: List[TriageRule]) -> List[CompiledRule]:
+    """Compiles rule patterns once per call.
+
+    Raises:
+        ValueError: If a rule has an invalid pattern or no pattern at all
+    """
+    def compile_pattern(pattern: Optional[str], rule: TriageRule) -> Optional[Pattern]:
+        if pattern is None:
+            return None
+        try:
+            return re.compile(pattern, re.IGNORECASE)
+        except re.error as e:
+            raise ValueError(f"Invalid pattern '{pattern}' in rule for label '{rule.label}': {e}")
+
+    compiled = []
+    for rule in rules:
+        if not (rule.from_pattern or rule.subject_pattern or rule.header_patterns or rule.body_pattern):
+            raise ValueError(f"Rule for label '{rule.label}' has no patterns and would match every email")
+        compiled.append(CompiledRule(
+            rule=rule,
+            sender=compile_pattern(rule.from_pattern, rule),
+            subject=compile_pattern(rule.subject_pattern, rule),
+            headers={name.lower(): compile_pattern(pattern, rule) for name, pattern in (rule.header_patterns or {}).items()},
+            body=compile_pattern(rule.body_pattern, rule),
+        ))
+    return compiled
+
+
+def referenced_headers(rules: List[TriageRule]) -> List[str]:
+    """Headers to request with `format='metadata'` so every rule can be evaluated."""
+    names = {name.lower(): name for name in BASE_HEADERS}
+    for rule in rules:
+        for name in rule.header_patterns or {}:
+            names.setdefault(name.lower(), name)
+    return sorted(names.values(), key=str.lower)
+
+
+def classify(compiled: List[CompiledRule], message: Dict[str, Any], needs_body: bool) -> List[TriageRule]:
+    """Returns every rule that matches the message."""
+    payload = message.get('payload', {})
+    headers = header_map(payload)
+    body = message_text(payload) if needs_body else None
+    return [rule.rule for rule in compiled if rule.matches(headers, body)]
+
+
+def label_changes(matched: List[TriageRule], label_ids: Dict[str, str]) -> Optional[tuple]:
+    """Turns the matched rules into a hashable (add, remove) label id pair for grouping batchModify calls."""
+    if not matched:
+        return None
+    add: Set[str] = {label_ids[rule.label] for rule in matched}
+    remove: Set[str] = set()
+    if any(rule.archive for rule in matched):
+        remove.add('INBOX')
+    if any(rule.mark_read for rule in matched):
+        remove.add('UNREAD')
+    return tuple(sorted(add)), tuple(sorted(remove))
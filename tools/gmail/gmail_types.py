@@ -25,6 +25,19 @@ class EmailLabel(BaseModel):
     message_list_visibility: Optional[str] = "show"
     color: Optional[Dict[str, str]] = None
 
+class TriageRule(BaseModel):
+    """Labels messages whose sender, subject, headers and body all match the given patterns.
+
+    Patterns are case-insensitive regular expressions searched anywhere in the value.
+    """
+    label: str
+    from_pattern: Optional[str] = None
+    subject_pattern: Optional[str] = None
+    header_patterns: Optional[Dict[str, str]] = None
+    body_pattern: Optional[str] = None
+    archive: bool = False
+    mark_read: bool = False
+
 class EmailThread(BaseModel):
     thread_id: str
     history_id: Optional[str] = None
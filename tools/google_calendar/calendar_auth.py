@@ -5,7 +5,8 @@ import pickle
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
-from typing import Optional
+from google_auth_httplib2 import AuthorizedHttp
+from typing import Any, Callable, Optional
 
 class GoogleCalendarAuth:
     SCOPES = [
@@ -14,24 +15,42 @@ class GoogleCalendarAuth:
     ]
     
     @staticmethod
-    def get_calendar_service():
-        creds = None
-        # The file token.pickle stores the user's access and refresh tokens
-        if os.path.exists('token.pickle'):
-            with open('token.pickle', 'rb') as token:
-                creds = pickle.load(token)
-        
-        # If there are no (valid) credentials available, let the user log in
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
+    def get_calendar_service(http: Optional[Any] = None, credentials: Optional[Any] = None,
+                             save_credentials: Optional[Callable[[Any], None]] = None):
+        """Gets an authorized Calendar API service instance.
+
+        Args:
+            http: Optional httplib2-compatible transport to send requests through
+            credentials: Credentials to use instead of the local token file (e.g. from a per-user store)
+            save_credentials: Called with `credentials` after they are refreshed, to persist them where they came from
+        """
+        if credentials is not None:
+            # Per-user credentials never touch token.pickle, which belongs to the single-user setup
+            creds = credentials
+            if not creds.valid:
                 creds.refresh(Request())
-            else:
-                flow = InstalledAppFlow.from_client_secrets_file(
-                    'credentials.json', GoogleCalendarAuth.SCOPES)
-                creds = flow.run_local_server(port=0)
-            
-            # Save the credentials for the next run
-            with open('token.pickle', 'wb') as token:
-                pickle.dump(creds, token)
+                if save_credentials is not None:
+                    save_credentials(creds)
+        else:
+            creds = None
+            # The file token.pickle stores the user's access and refresh tokens
+            if os.path.exists('token.pickle'):
+                with open('token.pickle', 'rb') as token:
+                    creds = pickle.load(token)
+
+            # If there are no (valid) credentials available, let the user log in
+            if not creds or not creds.valid:
+                if creds and creds.expired and creds.refresh_token:
+                    creds.refresh(Request())
+                else:
+                    flow = InstalledAppFlow.from_client_secrets_file(
+                        'credentials.json', GoogleCalendarAuth.SCOPES)
+                    creds = flow.run_local_server(port=0)
+
+                # Save the credentials for the next run
+                with open('token.pickle', 'wb') as token:
+                    pickle.dump(creds, token)
 
+        if http is not None:
+            return build('calendar', 'v3', http=AuthorizedHttp(creds, http=http))
         return build('calendar', 'v3', credentials=creds)
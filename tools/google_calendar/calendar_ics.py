@@ -0,0 +1,532 @@
+# tools/google_calendar/calendar_ics.py
+
+import hashlib
+import random
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, TextIO
+
+from googleapiclient.errors import HttpError
+
+from ..timeutil.parsing import get_timezone, parse_rfc3339
+from ..timeutil.windows_zones import windows_to_iana
+
+PRODID = "-//CalendarAgent//Google Calendar Tools//EN"
+
+# Properties copied verbatim into an event's `recurrence` list
+RECURRENCE_PROPERTIES = ('RRULE', 'EXRULE', 'RDATE', 'EXDATE')
+
+PARTSTAT_TO_RESPONSE = {
+    'NEEDS-ACTION': 'needsAction',
+    'ACCEPTED': 'accepted',
+    'DECLINED': 'declined',
+    'TENTATIVE': 'tentative',
+}
+RESPONSE_TO_PARTSTAT = {value: key for key, value in PARTSTAT_TO_RESPONSE.items()}
+
+# Statuses worth retrying: rate limits and transient server errors
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+_UNESCAPE = re.compile(r'\\([\\;,nN])')
+_DURATION = re.compile(r'^(?P<sign>[+-])?P(?:(?P<weeks>\d+)W)?(?:(?P<days>\d+)D)?'
+                       r'(?:T(?:(?P<hours>\d+)H)?(?:(?P<minutes>\d+)M)?(?:(?P<seconds>\d+)S)?)?$')
+
+
+class ContentLine(NamedTuple):
+    name: str
+    params: Dict[str, str]
+    value: str
+
+    def raw(self) -> str:
+        params = "".join(f";{key}={_param_value(value)}" for key, value in self.params.items())
+        return f"{self.name}{params}:{self.value}"
+
+
+# Reading
+
+def unfold(lines: Iterable[str]) -> Iterator[str]:
+    """Joins folded content lines (continuations start with a space or tab) one line at a time."""
+    current: Optional[str] = None
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and current is not None:
+            current += line[1:]
+            continue
+        if current:
+            yield current
+        current = line
+    if current:
+        yield current
+
+
+def parse_content_line(line: str) -> ContentLine:
+    """Splits `NAME;PARAM=value;PARAM="quoted:value":VALUE` into its parts."""
+    in_quotes = False
+    for index, char in enumerate(line):
+        if char == '"':
+            in_quotes = not in_quotes
+        elif char == ':' and not in_quotes:
+            head, value = line[:index], line[index + 1:]
+            break
+    else:
+        raise ValueError(f"Malformed content line: {line[:80]}")
+
+    name, *raw_params = re.split(r';(?=(?:[^"]*"[^"]*")*[^"]*$)', head)
+    params = {}
+    for raw_param in raw_params:
+        key, _, param_value = raw_param.partition('=')
+        params[key.upper()] = param_value.strip('"')
+    return ContentLine(name.upper(), params, value)
+
+
+class IcsReader:
+    """Streams the VEVENTs of an iCalendar file without loading it into memory.
+
+    TZIDs are resolved as IANA names, then through the file's VTIMEZONE
+    X-LIC-LOCATION, then as Windows zone names (as written by Outlook).
+    Events using a zone that can't be resolved are rejected rather than
+    imported at a guessed time.
+
+    Args:
+        source: Text file (or any iterable of lines) containing the calendar
+    """
+
+    def __init__(self, source: Iterable[str]):
+        self.source = source
+        # X-WR-TIMEZONE: used for floating times
+        self.default_timezone = 'UTC'
+        # VTIMEZONE TZID -> X-LIC-LOCATION
+        self.timezone_aliases: Dict[str, str] = {}
+
+    def events(self) -> Iterator[List[ContentLine]]:
+        depth = 0
+        event: Optional[List[ContentLine]] = None
+        vtimezone: Optional[Dict[str, str]] = None
+        for line in unfold(self.source):
+            prop = parse_content_line(line)
+            if prop.name == 'BEGIN':
+                depth += 1
+                if prop.value.upper() == 'VEVENT' and event is None:
+                    event, depth = [], 0
+                elif prop.value.upper() == 'VTIMEZONE' and event is None:
+                    vtimezone = {}
+            elif prop.name == 'END':
+                if event is not None and depth == 0 and prop.value.upper() == 'VEVENT':
+                    yield event
+                    event = None
+                else:
+                    depth -= 1
+                    if prop.value.upper() == 'VTIMEZONE' and vtimezone is not None:
+                        if 'TZID' in vtimezone and 'X-LIC-LOCATION' in vtimezone:
+                            self.timezone_aliases[vtimezone['TZID']] = vtimezone['X-LIC-LOCATION']
+                        vtimezone = None
+            elif event is not None:
+                # Properties of nested components (e.g. VALARM) are skipped
+                if depth == 0:
+                    event.append(prop)
+            elif vtimezone is not None and prop.name in ('TZID', 'X-LIC-LOCATION'):
+                vtimezone.setdefault(prop.name, prop.value)
+            elif prop.name == 'X-WR-TIMEZONE':
+                self.default_timezone = self._timezone(prop.value) or self.default_timezone
+
+    def _timezone(self, tzid: str) -> Optional[str]:
+        return (_iana_timezone(tzid)
+                or (_iana_timezone(self.timezone_aliases[tzid]) if tzid in self.timezone_aliases else None)
+                or windows_to_iana(tzid))
+
+    def to_event_body(self, props: List[ContentLine]) -> Dict[str, Any]:
+        """Maps a VEVENT's properties to a Calendar API event body for `events.import`.
+
+        Raises:
+            ValueError: If the event has no start time
+        """
+        first = {}
+        for prop in props:
+            first.setdefault(prop.name, prop)
+        if 'DTSTART' not in first:
+            raise ValueError("VEVENT without DTSTART")
+
+        body: Dict[str, Any] = {
+            'iCalUID': first['UID'].value if 'UID' in first else self._synthetic_uid(props),
+            'start': self._time(first['DTSTART']),
+        }
+        if 'DTEND' in first:
+            body['end'] = self._time(first['DTEND'])
+        else:
+            duration = _parse_duration(first['DURATION'].value) if 'DURATION' in first else None
+            body['end'] = _shift(body['start'], duration if duration is not None
+                                 else timedelta(days=1) if 'date' in body['start'] else timedelta())
+
+        for name, key in (('SUMMARY', 'summary'), ('DESCRIPTION', 'description'), ('LOCATION', 'location')):
+            if name in first:
+                body[key] = _unescape(first[name].value)
+        if 'STATUS' in first and first['STATUS'].value.upper() == 'TENTATIVE':
+            body['status'] = 'tentative'
+        if 'TRANSP' in first and first['TRANSP'].value.upper() == 'TRANSPARENT':
+            body['transparency'] = 'transparent'
+        if 'CLASS' in first and first['CLASS'].value.upper() in ('PRIVATE', 'CONFIDENTIAL'):
+            body['visibility'] = 'private'
+        if 'SEQUENCE' in first and first['SEQUENCE'].value.isdigit():
+            body['sequence'] = int(first['SEQUENCE'].value)
+        if 'ORGANIZER' in first:
+            body['organizer'] = _person(first['ORGANIZER'])
+
+        recurrence = [self._normalize_tzid(prop).raw() for prop in props if prop.name in RECURRENCE_PROPERTIES]
+        if recurrence:
+            body['recurrence'] = recurrence
+        attendees = []
+        for prop in props:
+            if prop.name == 'ATTENDEE':
+                attendee = _person(prop)
+                attendee['responseStatus'] = PARTSTAT_TO_RESPONSE.get(prop.params.get('PARTSTAT', '').upper(), 'needsAction')
+                if prop.params.get('ROLE', '').upper() == 'OPT-PARTICIPANT':
+                    attendee['optional'] = True
+                attendees.append(attendee)
+        if attendees:
+            body['attendees'] = attendees
+        return body
+
+    def _time(self, prop: ContentLine) -> Dict[str, str]:
+        value = prop.value.strip()
+        if prop.params.get('VALUE', '').upper() == 'DATE' or len(value) == 8:
+            return {'date': f"{value[:4]}-{value[4:6]}-{value[6:8]}"}
+        local = f"{value[:4]}-{value[4:6]}-{value[6:8]}T{value[9:11]}:{value[11:13]}:{value[13:15]}"
+        if value.upper().endswith('Z'):
+            return {'dateTime': local + 'Z'}
+        tzid = prop.params.get('TZID')
+        return {'dateTime': local, 'timeZone': self._resolve_tzid(tzid) if tzid else self.default_timezone}
+
+    def _normalize_tzid(self, prop: ContentLine) -> ContentLine:
+        if 'TZID' not in prop.params:
+            return prop
+        return prop._replace(params={**prop.params, 'TZID': self._resolve_tzid(prop.params['TZID'])})
+
+    def _resolve_tzid(self, tzid: str) -> str:
+        timezone_name = self._timezone(tzid)
+        if timezone_name is None:
+            raise ValueError(f"Unknown time zone '{tzid}'")
+        return timezone_name
+
+    @staticmethod
+    def _synthetic_uid(props: List[ContentLine]) -> str:
+        # Stable across runs, so re-importing the same file still de-duplicates
+        digest = hashlib.sha1("\n".join(prop.raw() for prop in props).encode()).hexdigest()
+        return f"{digest}@calendar-import"
+
+
+def _iana_timezone(tzid: str) -> Optional[str]:
+    # Some producers prefix the IANA name (e.g. "/mozilla.org/20070129_1/Europe/Paris")
+    candidates = [tzid.strip('/')]
+    parts = tzid.strip('/').split('/')
+    candidates += ['/'.join(parts[i:]) for i in range(1, len(parts))]
+    for candidate in candidates:
+        try:
+            get_timezone(candidate)
+            return candidate
+        except ValueError:
+            continue
+    return None
+
+
+def _unescape(text: str) -> str:
+    return _UNESCAPE.sub(lambda m: '\n' if m.group(1) in 'nN' else m.group(1), text)
+
+
+def _person(prop: ContentLine) -> Dict[str, Any]:
+    email = re.sub(r'^mailto:', '', prop.value, flags=re.IGNORECASE)
+    person: Dict[str, Any] = {'email': email}
+    if prop.params.get('CN'):
+        person['displayName'] = prop.params['CN']
+    return person
+
+
+def _parse_duration(value: str) -> Optional[timedelta]:
+    match = _DURATION.match(value.strip().upper())
+    if not match:
+        return None
+    delta = timedelta(**{unit: int(match.group(unit) or 0)
+                         for unit in ('weeks', 'days', 'hours', 'minutes', 'seconds')})
+    return -delta if match.group('sign') == '-' else delta
+
+
+def _shift(when: Dict[str, str], delta: timedelta) -> Dict[str, str]:
+    if 'date' in when:
+        return {'date': (date.fromisoformat(when['date']) + timedelta(days=max(1, delta.days))).isoformat()}
+    utc = when['dateTime'].endswith('Z')
+    shifted = (datetime.fromisoformat(when['dateTime'].rstrip('Z')) + delta).isoformat()
+    return {**when, 'dateTime': shifted + ('Z' if utc else '')}
+
+
+@dataclass
+class ImportResult:
+    imported: int = 0
+    duplicates: int = 0
+    skipped: int = 0
+    cancelled: int = 0
+    failed: int = 0
+    errors: List[str] = field(default_factory=list)
+
+
+class IcsImporter:
+    """Imports the events of an .ics file into a calendar through batched `events.import` requests.
+
+    Events whose iCalUID already exists in the calendar (or earlier in the
+    file) are skipped, so re-running an interrupted import is safe. Modified
+    instances of recurring events (VEVENTs with RECURRENCE-ID) and cancelled
+    events (STATUS:CANCELLED) are skipped.
+
+    Args:
+        service: Calendar API service
+        calendar_id: Calendar to import into
+        batch_size: Events per batch request
+        max_attempts: Attempts per event before it counts as failed
+    """
+
+    def __init__(self, service: Any, calendar_id: str = 'primary', batch_size: int = 50, max_attempts: int = 5):
+        self.service = service
+        self.calendar_id = calendar_id
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+
+    def run(self, source: TextIO) -> ImportResult:
+        result = ImportResult()
+        seen = self._existing_uids()
+        reader = IcsReader(source)
+        batch: List[Dict[str, Any]] = []
+        for props in reader.events():
+            if any(prop.name == 'RECURRENCE-ID' for prop in props):
+                result.skipped += 1
+                continue
+            if any(prop.name == 'STATUS' and prop.value.strip().upper() == 'CANCELLED' for prop in props):
+                result.cancelled += 1
+                continue
+            try:
+                body = reader.to_event_body(props)
+            except ValueError as e:
+                result.skipped += 1
+                summary = next((prop.value for prop in props if prop.name == 'SUMMARY'), None)
+                self._note(result, f"{_unescape(summary)}: {e}" if summary else str(e))
+                continue
+            if body['iCalUID'] in seen:
+                result.duplicates += 1
+                continue
+            seen.add(body['iCalUID'])
+            batch.append(body)
+            if len(batch) == self.batch_size:
+                self._flush(batch, result)
+                batch = []
+        if batch:
+            self._flush(batch, result)
+        return result
+
+    def _existing_uids(self) -> set:
+        uids = set()
+        page_token = None
+        while True:
+            response = self.service.events().list(
+                calendarId=self.calendar_id,
+                maxResults=2500,
+                pageToken=page_token,
+                fields='items(iCalUID),nextPageToken'
+            ).execute()
+            uids.update(item['iCalUID'] for item in response.get('items', []) if 'iCalUID' in item)
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                return uids
+
+    def _flush(self, batch: List[Dict[str, Any]], result: ImportResult):
+        pending = {str(index): body for index, body in enumerate(batch)}
+        for attempt in range(self.max_attempts):
+            retry: Dict[str, Dict[str, Any]] = {}
+
+            def callback(request_id, response, exception):
+                if exception is None:
+                    result.imported += 1
+                elif _retryable(exception):
+                    retry[request_id] = pending[request_id]
+                else:
+                    result.failed += 1
+                    self._note(result, f"{pending[request_id].get('summary', pending[request_id]['iCalUID'])}: {exception}")
+
+            request = self.service.new_batch_http_request(callback=callback)
+            for request_id, body in pending.items():
+                request.add(self.service.events().import_(calendarId=self.calendar_id, body=body),
+                            request_id=request_id)
+            try:
+                request.execute()
+            except HttpError as e:
+                if not _retryable(e):
+                    raise
+                # The whole batch was rejected, so none of its events were imported
+                retry = dict(pending)
+
+            if not retry:
+                return
+            pending = retry
+            if attempt + 1 < self.max_attempts:
+                time.sleep(min(32.0, 2.0 ** attempt) * (0.5 + random.random() / 2))
+        result.failed += len(pending)
+        self._note(result, f"{len(pending)} events still rate limited after {self.max_attempts} attempts")
+
+    @staticmethod
+    def _note(result: ImportResult, error: str):
+        # Keep the summary short however many events fail
+        if len(result.errors) < 5:
+            result.errors.append(error)
+
+
+def _retryable(error: Exception) -> bool:
+    if not isinstance(error, HttpError):
+        return False
+    if error.resp.status == 403:
+        # Calendar reports per-user rate limits as 403 rateLimitExceeded/userRateLimitExceeded
+        return b'ateLimitExceeded' in (error.content or b'')
+    return error.resp.status in RETRYABLE_STATUSES
+
+
+# Writing
+
+def _escape(text: str) -> str:
+    return (text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def _param_value(value: str) -> str:
+    value = value.replace('"', "'").replace('\n', ' ')
+    return f'"{value}"' if any(char in value for char in ':;,') else value
+
+
+def fold(line: str) -> str:
+    """Folds a content line into CRLF-terminated chunks of at most 75 octets (RFC 5545 §3.1)."""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + "\r\n"
+    chunks, start, limit = [], 0, 75
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        # Don't split a multi-byte character
+        while end < len(encoded) and (encoded[end] & 0xC0) == 0x80:
+            end -= 1
+        chunks.append(encoded[start:end].decode('utf-8'))
+        start, limit = end, 74
+    return "\r\n ".join(chunks) + "\r\n"
+
+
+def _ics_time(name: str, when: Dict[str, str]) -> str:
+    if 'date' in when:
+        return f"{name};VALUE=DATE:{when['date'].replace('-', '')}"
+    moment = parse_rfc3339(when['dateTime'])
+    if when.get('timeZone'):
+        local = moment.astimezone(get_timezone(when['timeZone'])) if moment.tzinfo else moment
+        return f"{name};TZID={when['timeZone']}:{local.strftime('%Y%m%dT%H%M%S')}"
+    if moment.tzinfo is None:
+        return f"{name}:{moment.strftime('%Y%m%dT%H%M%S')}"
+    return f"{name}:{moment.astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}"
+
+
+def event_to_vevent(event: Dict[str, Any]) -> str:
+    """Renders a Calendar API event as a folded VEVENT block."""
+    stamp = parse_rfc3339(event['updated']) if event.get('updated') else datetime.now(timezone.utc)
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{event.get('iCalUID') or event['id']}",
+        f"DTSTAMP:{stamp.astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}",
+        _ics_time('DTSTART', event['start']),
+        _ics_time('DTEND', event['end']),
+    ]
+    if event.get('originalStartTime'):
+        lines.append(_ics_time('RECURRENCE-ID', event['originalStartTime']))
+    for key, name in (('summary', 'SUMMARY'), ('description', 'DESCRIPTION'), ('location', 'LOCATION')):
+        if event.get(key):
+            lines.append(f"{name}:{_escape(event[key])}")
+    lines.append(f"STATUS:{'TENTATIVE' if event.get('status') == 'tentative' else 'CONFIRMED'}")
+    if event.get('transparency') == 'transparent':
+        lines.append("TRANSP:TRANSPARENT")
+    if event.get('visibility') in ('private', 'confidential'):
+        lines.append("CLASS:PRIVATE")
+    if 'sequence' in event:
+        lines.append(f"SEQUENCE:{event['sequence']}")
+    organizer = event.get('organizer')
+    if organizer and organizer.get('email'):
+        name = f";CN={_param_value(organizer['displayName'])}" if organizer.get('displayName') else ""
+        lines.append(f"ORGANIZER{name}:mailto:{organizer['email']}")
+    for attendee in event.get('attendees', []):
+        params = ""
+        if attendee.get('displayName'):
+            params += f";CN={_param_value(attendee['displayName'])}"
+        params += f";PARTSTAT={RESPONSE_TO_PARTSTAT.get(attendee.get('responseStatus'), 'NEEDS-ACTION')}"
+        params += f";ROLE={'OPT-PARTICIPANT' if attendee.get('optional') else 'REQ-PARTICIPANT'}"
+        lines.append(f"ATTENDEE{params}:mailto:{attendee['email']}")
+    lines.extend(event.get('recurrence', []))
+    lines.append("END:VEVENT")
+    return "".join(fold(line) for line in lines)
+
+
+def cancelled_vevent(uid: str, original_start: Dict[str, str]) -> str:
+    """Renders a deleted occurrence of a recurring event as a cancelled RECURRENCE-ID override."""
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{uid}",
+        f"DTSTAMP:{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}",
+        _ics_time('RECURRENCE-ID', original_start),
+        _ics_time('DTSTART', original_start),
+        "STATUS:CANCELLED",
+        "END:VEVENT",
+    ]
+    return "".join(fold(line) for line in lines)
+
+
+def write_ics(service: Any, out: TextIO, calendar_id: str = 'primary',
+              time_min: Optional[str] = None, time_max: Optional[str] = None) -> int:
+    """Streams a calendar's events to `out` as an iCalendar file and returns the number written.
+
+    Recurring events are written once with their RRULE/EXDATE lines, and
+    modified instances as overrides with RECURRENCE-ID. Deleted occurrences
+    listed before their recurring event become EXDATE lines on it; ones
+    listed after it are written as cancelled overrides. Times keep their IANA
+    TZID; VTIMEZONE blocks are omitted, as Google Calendar does for IANA zones.
+    """
+    out.write("".join(fold(line) for line in (
+        "BEGIN:VCALENDAR", "VERSION:2.0", f"PRODID:{PRODID}", "CALSCALE:GREGORIAN", "METHOD:PUBLISH")))
+    count = 0
+    page_token = None
+    first_page = True
+    written_uids: Dict[str, str] = {}  # recurring event id -> UID, for recurring events already written
+    # recurring event id -> deleted occurrences waiting for it (dropped if it's never listed)
+    deleted: Dict[str, List[Dict[str, str]]] = {}
+    while True:
+        response = service.events().list(
+            calendarId=calendar_id,
+            timeMin=time_min,
+            timeMax=time_max,
+            maxResults=2500,
+            pageToken=page_token
+        ).execute()
+        if first_page and response.get('timeZone'):
+            out.write(fold(f"X-WR-TIMEZONE:{response['timeZone']}"))
+        first_page = False
+        for event in response.get('items', []):
+            if event.get('status') == 'cancelled':
+                parent_id, original_start = event.get('recurringEventId'), event.get('originalStartTime')
+                if parent_id and original_start:
+                    if parent_id in written_uids:
+                        out.write(cancelled_vevent(written_uids[parent_id], original_start))
+                    else:
+                        deleted.setdefault(parent_id, []).append(original_start)
+                continue
+            if 'start' not in event:
+                continue
+            if event.get('recurrence'):
+                written_uids[event['id']] = event.get('iCalUID') or event['id']
+                exdates = [_ics_time('EXDATE', original_start) for original_start in deleted.pop(event['id'], [])]
+                if exdates:
+                    event = {**event, 'recurrence': event['recurrence'] + exdates}
+            out.write(event_to_vevent(event))
+            count += 1
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            break
+    out.write(fold("END:VCALENDAR"))
+    return count
@@ -1,16 +1,35 @@
 # tools/google_calendar/calendar_toolkit.py
 
+import os
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
 from phi.tools import Toolkit
 from .calendar_auth import GoogleCalendarAuth
-from dateutil import parser
-import pytz
+from .calendar_ics import IcsImporter, write_ics
+from ..sync.cache import ResourceCache
+from ..sync.memo import ToolMemo
+from ..tenancy.files import resolve_user_path
+from ..tenancy.pool import ServicePool, current_user
+from ..timeutil.parsing import add_duration, format_rfc3339, parse_event_time, resolve_datetime
 
 class GoogleCalendarTools(Toolkit):
-    def __init__(self):
+    def __init__(self,
+                 service: Optional[Any] = None,
+                 http: Optional[Any] = None,
+                 cache: Optional[ResourceCache] = None,
+                 pool: Optional[ServicePool] = None,
+                 memo: Optional[ToolMemo] = None,
+                 files_dir: str = "tmp/files"):
         super().__init__(name="google_calendar_tools")
-        self.service = GoogleCalendarAuth.get_calendar_service()
+        # In multi-tenant mode each call uses the caller's service leased from the pool
+        self.pool = pool
+        self._service = None if pool is not None else (service or GoogleCalendarAuth.get_calendar_service(http=http))
+        # Optional cache of fetched events, kept fresh by tools.sync.push.PushSyncHub
+        self.cache = cache
+        # Optional persistent memo of read-only tool results, shared across sessions
+        self.memo = memo
+        # .ics files are read and written under <files_dir>/<user>/ only
+        self.files_dir = files_dir
         
         # Register all the methods
         self.register(self.create_event)
@@ -18,6 +37,23 @@ class GoogleCalendarTools(Toolkit):
         self.register(self.get_event)
         self.register(self.delete_event)
         self.register(self.quick_add_event)
+        self.register(self.import_ics)
+        self.register(self.export_ics)
+
+        if memo is not None:
+            memo.instrument(self, {
+                'get_event': lambda args: self.service.events().get(
+                    calendarId='primary', eventId=args['event_id'], fields='etag'
+                ).execute()['etag'],
+            })
+        if pool is not None:
+            pool.bind(self)
+
+    @property
+    def service(self):
+        if self.pool is not None:
+            return self.pool.current()
+        return self._service
 
     def create_event(self, 
                     title: str,
@@ -39,10 +75,10 @@ class GoogleCalendarTools(Toolkit):
             timezone: Timezone for the event
         """
         try:
-            # Parse the start datetime
-            start_dt = parser.parse(start_time)
+            # Resolve the start time (absolute or relative) in the event's timezone
+            start_dt = resolve_datetime(start_time, timezone)
             # Calculate end time based on duration
-            end_dt = start_dt + timedelta(minutes=duration_minutes)
+            end_dt = add_duration(start_dt, timedelta(minutes=duration_minutes))
             
             event_body = {
                 'summary': title,
@@ -97,11 +133,11 @@ class GoogleCalendarTools(Toolkit):
         """
         try:
             now = datetime.utcnow()
-            time_max = (now + timedelta(days=days)).isoformat() + 'Z'
+            time_max = format_rfc3339(now + timedelta(days=days))
             
             events_result = self.service.events().list(
                 calendarId='primary',
-                timeMin=now.isoformat() + 'Z',
+                timeMin=format_rfc3339(now),
                 timeMax=time_max,
                 maxResults=max_results,
                 singleEvents=True,
@@ -114,7 +150,7 @@ class GoogleCalendarTools(Toolkit):
             
             response = f"📅 **Upcoming Events** (Next {days} days)\n\n"
             for event in events:
-                start = parser.parse(event['start'].get('dateTime', event['start'].get('date')))
+                start = parse_event_time(event['start'])
                 response += f"### {event['summary']}\n"
                 response += f"**When**: {start.strftime('%Y-%m-%d %I:%M %p')}\n"
                 
@@ -129,6 +165,15 @@ class GoogleCalendarTools(Toolkit):
         except Exception as e:
             return f"❌ Failed to list events: {str(e)}"
 
+    def _fetch_event(self, event_id: str) -> Dict[str, Any]:
+        fetch = lambda: self.service.events().get(
+            calendarId='primary',
+            eventId=event_id
+        ).execute()
+        if self.cache is None:
+            return fetch()
+        return self.cache.get_or_fetch(current_user() or 'me', 'event', event_id, fetch)
+
     def get_event(self, event_id: str) -> str:
         """Gets details of a specific event.
         
@@ -136,13 +181,10 @@ class GoogleCalendarTools(Toolkit):
             event_id: ID of the event to retrieve
         """
         try:
-            event = self.service.events().get(
-                calendarId='primary',
-                eventId=event_id
-            ).execute()
+            event = self._fetch_event(event_id)
 
-            start = parser.parse(event['start'].get('dateTime', event['start'].get('date')))
-            end = parser.parse(event['end'].get('dateTime', event['end'].get('date')))
+            start = parse_event_time(event['start'])
+            end = parse_event_time(event['end'])
             
             response = f"📅 **Event Details**\n\n"
             response += f"### {event['summary']}\n"
@@ -172,10 +214,7 @@ class GoogleCalendarTools(Toolkit):
         """
         try:
             # First get the event to confirm it exists
-            event = self.service.events().get(
-                calendarId='primary',
-                eventId=event_id
-            ).execute()
+            event = self._fetch_event(event_id)
             
             # Then delete it
             self.service.events().delete(
@@ -183,6 +222,8 @@ class GoogleCalendarTools(Toolkit):
                 eventId=event_id,
                 sendUpdates='all'
             ).execute()
+            if self.cache is not None:
+                self.cache.invalidate(current_user() or 'me', 'event', event_id)
             
             return f"✅ Event '{event.get('summary')}' has been deleted successfully"
         except Exception as e:
@@ -201,7 +242,7 @@ class GoogleCalendarTools(Toolkit):
                 sendUpdates='all'
             ).execute()
             
-            start = parser.parse(event['start'].get('dateTime', event['start'].get('date')))
+            start = parse_event_time(event['start'])
             
             response = f"✅ **Event Created Successfully!**\n\n"
             response += f"**Title**: {event.get('summary')}\n"
@@ -212,3 +253,57 @@ class GoogleCalendarTools(Toolkit):
             return response
         except Exception as e:
             return f"❌ Failed to create event: {str(e)}"
+
+    def import_ics(self, file_path: str) -> str:
+        """Imports all events from an iCalendar (.ics) file, e.g. when migrating from another calendar.
+
+        Events that already exist (same iCalUID) are skipped, so re-running an import is safe.
+        Attendees are not notified.
+
+        Args:
+            file_path: Path of the .ics file to import, relative to the user's files directory
+        """
+        try:
+            with open(resolve_user_path(self.files_dir, file_path), encoding='utf-8', errors='replace') as source:
+                result = IcsImporter(self.service).run(source)
+            if self.cache is not None and result.imported:
+                self.cache.invalidate_kind(current_user() or 'me', 'event')
+
+            response = f"✅ Imported {result.imported} events from {file_path}\n"
+            if result.duplicates:
+                response += f"**Already present**: {result.duplicates} events skipped\n"
+            if result.cancelled:
+                response += f"**Cancelled**: {result.cancelled} events skipped\n"
+            if result.skipped:
+                response += (f"**Unsupported**: {result.skipped} entries skipped "
+                             f"(modified recurring instances, unknown time zones or invalid events)\n")
+            if result.failed:
+                response += f"**Failed**: {result.failed} events\n"
+            response += "".join(f"- {error}\n" for error in result.errors)
+            return response
+        except Exception as e:
+            return f"❌ Failed to import events: {str(e)}"
+
+    def export_ics(self,
+                   file_path: str,
+                   start: Optional[str] = None,
+                   end: Optional[str] = None,
+                   timezone: str = "UTC") -> str:
+        """Exports calendar events to an iCalendar (.ics) file.
+
+        Args:
+            file_path: Path of the .ics file to write, relative to the user's files directory
+            start: Only export events ending after this time (e.g. "2024-01-01" or "90 days ago"); all if omitted
+            end: Only export events starting before this time; all if omitted
+            timezone: Timezone used to interpret start and end
+        """
+        try:
+            time_min = format_rfc3339(resolve_datetime(start, timezone)) if start else None
+            time_max = format_rfc3339(resolve_datetime(end, timezone)) if end else None
+            path = resolve_user_path(self.files_dir, file_path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w', encoding='utf-8', newline='') as out:
+                count = write_ics(self.service, out, time_min=time_min, time_max=time_max)
+            return f"✅ Exported {count} events to {file_path}"
+        except Exception as e:
+            return f"❌ Failed to export events: {str(e)}"
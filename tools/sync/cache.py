@@ -0,0 +1,86 @@
+# tools/sync/cache.py
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+Key = Tuple[str, str, str]
+
+
+class ResourceCache:
+    """Thread-safe LRU cache of Google API resources, keyed per user.
+
+    Entries are addressed by (user, kind, resource_id) and may hold several
+    variants (e.g. a message fetched in 'metadata' and 'full' format).
+    Invalidation drops every variant of a resource, so push notifications only
+    need to know which resource changed.
+
+    Args:
+        max_entries: Maximum number of resources kept before least recently used ones are evicted
+        ttl_seconds: Optional safety-net expiry for entries that never receive a notification
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Key, Dict[Hashable, Tuple[float, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, user: str, kind: str, resource_id: str, variant: Hashable = None) -> Optional[Any]:
+        key = (user, kind, resource_id)
+        with self._lock:
+            variants = self._entries.get(key)
+            entry = variants.get(variant) if variants else None
+            if entry is None or (self.ttl_seconds and time.monotonic() - entry[0] > self.ttl_seconds):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, user: str, kind: str, resource_id: str, value: Any, variant: Hashable = None):
+        key = (user, kind, resource_id)
+        with self._lock:
+            self._entries.setdefault(key, {})[variant] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_fetch(self, user: str, kind: str, resource_id: str,
+                     fetch: Callable[[], Any], variant: Hashable = None) -> Any:
+        """Returns the cached value, or calls `fetch` and caches its result."""
+        value = self.get(user, kind, resource_id, variant)
+        if value is None:
+            value = fetch()
+            self.put(user, kind, resource_id, value, variant)
+        return value
+
+    def invalidate(self, user: str, kind: str, resource_id: str) -> bool:
+        with self._lock:
+            removed = self._entries.pop((user, kind, resource_id), None) is not None
+            self.invalidations += int(removed)
+            return removed
+
+    def invalidate_kind(self, user: str, kind: str) -> int:
+        """Drops every resource of one kind for a user (used when an incremental sync isn't possible)."""
+        with self._lock:
+            keys = [key for key in self._entries if key[0] == user and key[1] == kind]
+            for key in keys:
+                del self._entries[key]
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def invalidate_user(self, user: str) -> int:
+        with self._lock:
+            keys = [key for key in self._entries if key[0] == user]
+            for key in keys:
+                del self._entries[key]
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,194 @@
+# tools/sync/memo.py
+
+import contextvars
+import functools
+import inspect
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from ..tenancy.pool import current_user
+
+# Given a tool call's arguments, returns the current version of the resource it reads
+# (an event etag, a message historyId, ...), or None if the call shouldn't be memoized
+VersionProbe = Callable[[Dict[str, Any]], Optional[str]]
+
+_partial: contextvars.ContextVar[bool] = contextvars.ContextVar('tool_memo_partial', default=False)
+
+
+def mark_partial():
+    """Flags the running tool's result as incomplete (e.g. a message failed to load), so it isn't memoized."""
+    _partial.set(True)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tool_memo (
+    user TEXT NOT NULL,
+    tool TEXT NOT NULL,
+    args TEXT NOT NULL,
+    version TEXT NOT NULL,
+    result TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL,
+    PRIMARY KEY (user, tool, args)
+);
+CREATE INDEX IF NOT EXISTS tool_memo_accessed ON tool_memo (accessed);
+"""
+
+
+class ToolMemo:
+    """Persistent memo of read-only tool results, stored in SQLite and shared by every session and worker.
+
+    A result is keyed by user, tool and arguments and tagged with the version
+    of the resource it was rendered from. Before a memoized tool runs, a cheap
+    probe (e.g. `events.get` with `fields=etag`) fetches the current version;
+    if it matches, the stored result is returned without fetching or rendering
+    the resource again. Changed resources simply miss, so writes never need to
+    invalidate anything, whichever process makes them. Errors and results the
+    tool flagged with `mark_partial()` are not stored.
+
+    The database runs in WAL mode so concurrent readers don't block the writer.
+    Once it holds more than `max_bytes` of results, the least recently used
+    ones are evicted. The total is only summed after each process has written
+    another hundredth of `max_bytes`, so the limit can be exceeded by that much
+    per process.
+
+    Args:
+        path: SQLite database file (e.g. next to the agent storage database)
+        max_bytes: Total size of stored results before eviction starts
+        ttl_seconds: Optional safety-net expiry for results whose version probe can miss changes
+    """
+
+    def __init__(self, path: str, max_bytes: int = 64 * 1024 * 1024, ttl_seconds: Optional[float] = None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        self._evict_lock = threading.Lock()
+        # Bytes this process has stored since the total size was last checked
+        self._unchecked_bytes = 0
+        self._check_bytes = max(1, max_bytes // 100)
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections can't be shared between threads
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, user: str, tool: str, args: str, version: str) -> Optional[str]:
+        row = self._connection().execute(
+            "SELECT result, created FROM tool_memo WHERE user = ? AND tool = ? AND args = ? AND version = ?",
+            (user, tool, args, version)
+        ).fetchone()
+        if row is None or (self.ttl_seconds and time.time() - row[1] > self.ttl_seconds):
+            self.misses += 1
+            return None
+        self._connection().execute(
+            "UPDATE tool_memo SET accessed = ? WHERE user = ? AND tool = ? AND args = ?",
+            (time.time(), user, tool, args)
+        )
+        self.hits += 1
+        return row[0]
+
+    def put(self, user: str, tool: str, args: str, version: str, result: str):
+        size = len(result.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        self._connection().execute(
+            "INSERT OR REPLACE INTO tool_memo (user, tool, args, version, result, size, created, accessed) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (user, tool, args, version, result, size, now, now)
+        )
+        with self._evict_lock:
+            self._unchecked_bytes += size
+            if self._unchecked_bytes < self._check_bytes:
+                return
+            self._unchecked_bytes = 0
+        self._evict()
+
+    def invalidate(self, user: str, tool: str) -> int:
+        """Drops every stored result of one tool for a user (for changes no version probe sees)."""
+        return self._connection().execute(
+            "DELETE FROM tool_memo WHERE user = ? AND tool = ?", (user, tool)
+        ).rowcount
+
+    def invalidate_user(self, user: str) -> int:
+        return self._connection().execute("DELETE FROM tool_memo WHERE user = ?", (user,)).rowcount
+
+    def size(self) -> int:
+        return self._connection().execute("SELECT COALESCE(SUM(size), 0) FROM tool_memo").fetchone()[0]
+
+    def _evict(self):
+        with self._evict_lock:
+            excess = self.size() - self.max_bytes
+            if excess <= 0:
+                return
+            # Free a tenth more than needed so eviction doesn't run on every insert
+            excess += self.max_bytes // 10
+            connection = self._connection()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                victims = []
+                for rowid, size in connection.execute("SELECT rowid, size FROM tool_memo ORDER BY accessed"):
+                    victims.append((rowid,))
+                    excess -= size
+                    if excess <= 0:
+                        break
+                connection.executemany("DELETE FROM tool_memo WHERE rowid = ?", victims)
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+
+    def instrument(self, toolkit, probes: Dict[str, VersionProbe]):
+        """Wraps the given tools of `toolkit` so their results are served from the memo while the resource is unchanged."""
+        for name, probe in probes.items():
+            function = toolkit.functions[name]
+            function.entrypoint = self._wrap(f"{toolkit.name}.{name}", function.entrypoint, probe)
+        return toolkit
+
+    def _wrap(self, tool: str, entrypoint: Callable, probe: VersionProbe) -> Callable:
+        signature = inspect.signature(entrypoint)
+
+        @functools.wraps(entrypoint)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = dict(bound.arguments)
+            try:
+                version = probe(arguments)
+            except Exception:
+                # Let the tool itself report e.g. a deleted resource
+                version = None
+            if version is None:
+                return entrypoint(*args, **kwargs)
+
+            user = current_user() or 'me'
+            key = json.dumps(arguments, sort_keys=True, default=str)
+            result = self.get(user, tool, key, version)
+            if result is None:
+                token = _partial.set(False)
+                try:
+                    result = entrypoint(*args, **kwargs)
+                    partial = _partial.get()
+                finally:
+                    _partial.reset(token)
+                if isinstance(result, str) and not result.startswith("❌") and not partial:
+                    self.put(user, tool, key, version, result)
+            return result
+        return wrapper
@@ -0,0 +1,315 @@
+# tools/sync/push.py
+
+import base64
+import json
+import logging
+import secrets
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+from googleapiclient.errors import HttpError
+
+from .cache import ResourceCache
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class GmailWatch:
+    user: str
+    email: str
+    service: Any
+    label_ids: Optional[List[str]]
+    history_id: int = 0
+    expiration: float = 0.0
+    pending: bool = False
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+
+@dataclass
+class CalendarWatch:
+    user: str
+    calendar_id: str
+    service: Any
+    channel_id: str = ""
+    resource_id: str = ""
+    sync_token: Optional[str] = None
+    expiration: float = 0.0
+    pending: bool = False
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+
+class PushSyncHub:
+    """Keeps a ResourceCache fresh from Gmail and Calendar push notifications.
+
+    Registers `users().watch` / `events().watch` channels, turns each incoming
+    notification into an incremental sync (Gmail history / Calendar sync token)
+    for just the affected user and resource, invalidates only the resources that
+    changed, and renews channels before they expire.
+
+    The services given to `watch_*` are used from the webhook and renewal
+    threads, so they should not be shared with a toolkit.
+
+    Args:
+        cache: Cache to invalidate
+        webhook_base_url: Public URL of the mounted webhook router (e.g. https://example.com/webhooks/google)
+        gmail_topic: Cloud Pub/Sub topic Gmail publishes to (push subscription must target the Gmail webhook)
+        channel_ttl_seconds: Requested lifetime of Calendar channels
+        renew_margin_seconds: Renew channels that expire within this window
+        verification_token: Shared secret checked on incoming notifications. Required with `gmail_topic`,
+            since the Pub/Sub push subscription URL must carry it; generated per process if Calendar alone is watched
+
+    Raises:
+        ValueError: If `gmail_topic` is given without a `verification_token`
+    """
+
+    def __init__(self,
+                 cache: ResourceCache,
+                 webhook_base_url: str,
+                 gmail_topic: Optional[str] = None,
+                 channel_ttl_seconds: int = 7 * 24 * 3600,
+                 renew_margin_seconds: int = 3600,
+                 verification_token: Optional[str] = None):
+        if gmail_topic and not verification_token:
+            # A generated token can't match the one configured on the Pub/Sub subscription,
+            # so every Gmail notification would be rejected and the cache would silently go stale
+            raise ValueError("verification_token is required with gmail_topic: configure the same secret "
+                             "on the Pub/Sub push subscription")
+        self.cache = cache
+        self.webhook_base_url = webhook_base_url.rstrip('/')
+        self.gmail_topic = gmail_topic
+        self.channel_ttl_seconds = channel_ttl_seconds
+        self.renew_margin_seconds = renew_margin_seconds
+        self.verification_token = verification_token or secrets.token_urlsafe(24)
+        self.gmail_watches: Dict[str, GmailWatch] = {}  # keyed by lower-cased email address
+        self.calendar_watches: Dict[str, CalendarWatch] = {}  # keyed by channel id
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._renewal_thread: Optional[threading.Thread] = None
+
+    # Registration
+
+    def watch_gmail(self, user: str, service: Any, label_ids: Optional[List[str]] = None) -> GmailWatch:
+        """Starts Gmail push notifications for `user` (the cache key the toolkit uses for this account)."""
+        if not self.gmail_topic:
+            raise ValueError("gmail_topic is required to watch Gmail")
+        email = service.users().getProfile(userId='me').execute()['emailAddress']
+        watch = GmailWatch(user=user, email=email, service=service, label_ids=label_ids)
+        self._register_gmail(watch)
+        with self._lock:
+            self.gmail_watches[email.lower()] = watch
+        return watch
+
+    def _register_gmail(self, watch: GmailWatch):
+        body: Dict[str, Any] = {'topicName': self.gmail_topic}
+        if watch.label_ids:
+            body.update({'labelIds': watch.label_ids, 'labelFilterBehavior': 'include'})
+        response = watch.service.users().watch(userId='me', body=body).execute()
+        if not watch.history_id:
+            watch.history_id = int(response['historyId'])
+        watch.expiration = int(response['expiration']) / 1000.0
+
+    def watch_calendar(self, user: str, service: Any, calendar_id: str = 'primary') -> CalendarWatch:
+        """Starts Calendar push notifications for one calendar of `user`."""
+        watch = CalendarWatch(user=user, calendar_id=calendar_id, service=service)
+        watch.sync_token = self._initial_sync_token(watch)
+        self._register_calendar(watch)
+        return watch
+
+    def _register_calendar(self, watch: CalendarWatch):
+        previous = (watch.channel_id, watch.resource_id)
+        channel = watch.service.events().watch(calendarId=watch.calendar_id, body={
+            'id': str(uuid.uuid4()),
+            'type': 'web_hook',
+            'address': f"{self.webhook_base_url}/calendar",
+            'token': self.verification_token,
+            'params': {'ttl': str(self.channel_ttl_seconds)},
+        }).execute()
+        watch.channel_id = channel['id']
+        watch.resource_id = channel['resourceId']
+        watch.expiration = int(channel.get('expiration', 0)) / 1000.0 or time.time() + self.channel_ttl_seconds
+        with self._lock:
+            self.calendar_watches[watch.channel_id] = watch
+        if previous[0]:
+            self._stop_channel(watch.service, *previous)
+
+    def _stop_channel(self, service: Any, channel_id: str, resource_id: str):
+        with self._lock:
+            self.calendar_watches.pop(channel_id, None)
+        try:
+            service.channels().stop(body={'id': channel_id, 'resourceId': resource_id}).execute()
+        except HttpError as e:
+            # The channel may already have expired; nothing else to clean up
+            logger.warning(f"Failed to stop calendar channel {channel_id}: {e}")
+
+    def unwatch_all(self):
+        """Stops every channel registered by this hub."""
+        for watch in list(self.calendar_watches.values()):
+            self._stop_channel(watch.service, watch.channel_id, watch.resource_id)
+        for key, watch in list(self.gmail_watches.items()):
+            watch.service.users().stop(userId='me').execute()
+            with self._lock:
+                self.gmail_watches.pop(key, None)
+
+    # Notifications
+
+    def handle_gmail_notification(self, envelope: Mapping[str, Any]) -> Optional[GmailWatch]:
+        """Decodes a Pub/Sub push envelope and returns the watch that needs syncing, if any."""
+        data = json.loads(base64.b64decode(envelope['message']['data']))
+        watch = self.gmail_watches.get(data['emailAddress'].lower())
+        if watch is None or int(data['historyId']) <= watch.history_id:
+            return None
+        return watch
+
+    def handle_calendar_notification(self, headers: Mapping[str, str]) -> Optional[CalendarWatch]:
+        """Validates Calendar channel headers and returns the watch that needs syncing, if any.
+
+        Raises:
+            PermissionError: If the channel token doesn't match
+        """
+        if headers.get('x-goog-channel-token') != self.verification_token:
+            raise PermissionError("Invalid channel token")
+        watch = self.calendar_watches.get(headers.get('x-goog-channel-id', ''))
+        if watch is None or headers.get('x-goog-resource-id') != watch.resource_id:
+            return None
+        # 'sync' is the handshake sent when a channel is created; nothing has changed yet
+        if headers.get('x-goog-resource-state') == 'sync':
+            return None
+        return watch
+
+    # Incremental sync
+
+    def _coalesced(self, watch: Any, sync: Callable[[Any], int]) -> int:
+        """Runs `sync` for a watch, folding notifications that arrive mid-sync into one re-run."""
+        total = 0
+        while True:
+            watch.pending = True
+            if not watch.lock.acquire(blocking=False):
+                return total
+            try:
+                while watch.pending:
+                    watch.pending = False
+                    total += sync(watch)
+            finally:
+                watch.lock.release()
+            if not watch.pending:
+                return total
+
+    def sync_gmail(self, watch: GmailWatch) -> int:
+        """Applies Gmail history since the last sync and returns the number of invalidated resources."""
+        return self._coalesced(watch, self._sync_gmail)
+
+    def _sync_gmail(self, watch: GmailWatch) -> int:
+        changed: Dict[Tuple[str, str], None] = {}
+        page_token = None
+        try:
+            while True:
+                response = watch.service.users().history().list(
+                    userId='me',
+                    startHistoryId=watch.history_id,
+                    pageToken=page_token
+                ).execute()
+                for record in response.get('history', []):
+                    for entry_type in ('messagesAdded', 'messagesDeleted', 'labelsAdded', 'labelsRemoved'):
+                        for entry in record.get(entry_type, []):
+                            changed[('message', entry['message']['id'])] = None
+                            changed[('thread', entry['message']['threadId'])] = None
+                page_token = response.get('nextPageToken')
+                if not page_token:
+                    break
+        except HttpError as e:
+            if e.resp.status != 404:
+                raise
+            # History older than Gmail retains: fall back to dropping everything for this user
+            logger.info(f"Gmail history expired for {watch.user}, invalidating all mail resources")
+            profile = watch.service.users().getProfile(userId='me').execute()
+            watch.history_id = int(profile['historyId'])
+            return self.cache.invalidate_kind(watch.user, 'message') + self.cache.invalidate_kind(watch.user, 'thread')
+
+        watch.history_id = max(watch.history_id, int(response['historyId']))
+        return sum(self.cache.invalidate(watch.user, kind, resource_id) for kind, resource_id in changed)
+
+    def sync_calendar(self, watch: CalendarWatch) -> int:
+        """Applies Calendar changes since the last sync token and returns the number of invalidated events."""
+        return self._coalesced(watch, self._sync_calendar)
+
+    def _sync_calendar(self, watch: CalendarWatch) -> int:
+        changed = set()
+        page_token = None
+        try:
+            while True:
+                response = watch.service.events().list(
+                    calendarId=watch.calendar_id,
+                    syncToken=watch.sync_token,
+                    pageToken=page_token
+                ).execute()
+                changed.update(event['id'] for event in response.get('items', []))
+                page_token = response.get('nextPageToken')
+                if not page_token:
+                    break
+        except HttpError as e:
+            if e.resp.status != 410:
+                raise
+            # Sync token invalidated by the server: start over from a full listing
+            logger.info(f"Calendar sync token expired for {watch.user}, invalidating all events")
+            watch.sync_token = self._initial_sync_token(watch)
+            return self.cache.invalidate_kind(watch.user, 'event')
+
+        watch.sync_token = response.get('nextSyncToken', watch.sync_token)
+        return sum(self.cache.invalidate(watch.user, 'event', event_id) for event_id in changed)
+
+    def _initial_sync_token(self, watch: CalendarWatch) -> Optional[str]:
+        page_token = None
+        while True:
+            response = watch.service.events().list(
+                calendarId=watch.calendar_id,
+                maxResults=2500,
+                pageToken=page_token,
+                fields='nextPageToken,nextSyncToken'
+            ).execute()
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                return response.get('nextSyncToken')
+
+    # Renewal
+
+    def renew_due(self, now: Optional[float] = None) -> int:
+        """Renews every channel expiring within the renewal margin and returns how many were renewed."""
+        deadline = (now or time.time()) + self.renew_margin_seconds
+        renewed = 0
+        for watch in list(self.gmail_watches.values()):
+            if watch.expiration <= deadline:
+                with watch.lock:
+                    self._register_gmail(watch)
+                renewed += 1
+                if watch.pending:
+                    self.sync_gmail(watch)
+        for watch in list(self.calendar_watches.values()):
+            if watch.expiration <= deadline:
+                with watch.lock:
+                    self._register_calendar(watch)
+                renewed += 1
+                if watch.pending:
+                    self.sync_calendar(watch)
+        return renewed
+
+    def start_renewal(self, interval_seconds: float = 300):
+        """Renews channels from a background thread until `stop()` is called."""
+        def loop():
+            while not self._stop.wait(interval_seconds):
+                try:
+                    self.renew_due()
+                except Exception as e:
+                    logger.warning(f"Channel renewal failed: {e}")
+
+        self._stop.clear()
+        self._renewal_thread = threading.Thread(target=loop, name="push-channel-renewal", daemon=True)
+        self._renewal_thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._renewal_thread:
+            self._renewal_thread.join()
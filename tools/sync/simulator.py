@@ -0,0 +1,75 @@
+# tools/sync/simulator.py
+
+import base64
+import itertools
+import json
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+
+class NotificationSimulator:
+    """Sends Gmail (Pub/Sub) and Calendar (web_hook channel) notifications exactly as Google formats them.
+
+    Works with any client exposing `post(url, content=..., headers=...)`, such as
+    `fastapi.testclient.TestClient(app)` for in-process tests or
+    `httpx.Client(base_url=...)` for a running playground.
+
+    Example:
+        simulator = NotificationSimulator(TestClient(app), verification_token=hub.verification_token)
+        simulator.calendar(watch.channel_id, watch.resource_id)
+
+    Args:
+        client: HTTP client used to deliver notifications
+        verification_token: Token the hub expects on notifications
+        prefix: Route prefix the webhook router is mounted under
+    """
+
+    def __init__(self, client: Any, verification_token: str, prefix: str = "/webhooks/google"):
+        self.client = client
+        self.verification_token = verification_token
+        self.prefix = prefix.rstrip('/')
+        self._message_numbers = itertools.count(1)
+
+    @staticmethod
+    def gmail_envelope(email: str, history_id: int, subscription: str = "projects/local/subscriptions/gmail-push") -> Dict[str, Any]:
+        data = json.dumps({'emailAddress': email, 'historyId': history_id}).encode()
+        return {
+            'message': {
+                'data': base64.b64encode(data).decode(),
+                'messageId': str(uuid.uuid4().int)[:16],
+                'publishTime': datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z'),
+            },
+            'subscription': subscription,
+        }
+
+    def calendar_headers(self, channel_id: str, resource_id: str, state: str = 'exists',
+                         token: Optional[str] = None, calendar_id: str = 'primary') -> Dict[str, str]:
+        return {
+            'X-Goog-Channel-ID': channel_id,
+            'X-Goog-Channel-Token': token if token is not None else self.verification_token,
+            'X-Goog-Message-Number': str(next(self._message_numbers)),
+            'X-Goog-Resource-ID': resource_id,
+            'X-Goog-Resource-State': state,
+            'X-Goog-Resource-URI': f"https://www.googleapis.com/calendar/v3/calendars/{calendar_id}/events?alt=json",
+        }
+
+    def gmail(self, email: str, history_id: int, token: Optional[str] = None) -> int:
+        """Delivers a Gmail history notification and returns the webhook's status code."""
+        token = token if token is not None else self.verification_token
+        response = self.client.post(
+            f"{self.prefix}/gmail?token={token}",
+            content=json.dumps(self.gmail_envelope(email, history_id)),
+            headers={'Content-Type': 'application/json'},
+        )
+        return response.status_code
+
+    def calendar(self, channel_id: str, resource_id: str, state: str = 'exists',
+                 token: Optional[str] = None) -> int:
+        """Delivers a Calendar channel notification and returns the webhook's status code."""
+        response = self.client.post(
+            f"{self.prefix}/calendar",
+            content=b"",
+            headers=self.calendar_headers(channel_id, resource_id, state, token),
+        )
+        return response.status_code
@@ -0,0 +1,43 @@
+# tools/sync/webhook.py
+
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Request, Response
+
+from .push import PushSyncHub
+
+
+def build_webhook_router(hub: PushSyncHub, prefix: str = "/webhooks/google") -> APIRouter:
+    """Creates the FastAPI routes that receive Gmail and Calendar push notifications.
+
+    Notifications are acknowledged immediately; the incremental sync runs as a
+    background task so Google never waits on (or retries because of) our API calls.
+
+    Args:
+        hub: Hub that owns the watches and cache
+        prefix: Route prefix; must match the hub's `webhook_base_url`
+    """
+    router = APIRouter(prefix=prefix)
+
+    @router.post("/gmail", status_code=204)
+    async def gmail_notification(request: Request, background_tasks: BackgroundTasks, token: str = ""):
+        # Pub/Sub push subscriptions can't send custom headers, so the secret rides in the query string
+        if token != hub.verification_token:
+            raise HTTPException(status_code=403, detail="Invalid verification token")
+        try:
+            watch = hub.handle_gmail_notification(await request.json())
+        except (KeyError, ValueError):
+            raise HTTPException(status_code=400, detail="Malformed Pub/Sub envelope")
+        if watch is not None:
+            background_tasks.add_task(hub.sync_gmail, watch)
+        return Response(status_code=204)
+
+    @router.post("/calendar", status_code=204)
+    async def calendar_notification(request: Request, background_tasks: BackgroundTasks):
+        try:
+            watch = hub.handle_calendar_notification(request.headers)
+        except PermissionError:
+            raise HTTPException(status_code=403, detail="Invalid channel token")
+        if watch is not None:
+            background_tasks.add_task(hub.sync_calendar, watch)
+        return Response(status_code=204)
+
+    return router
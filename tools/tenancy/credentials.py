@@ -0,0 +1,117 @@
+# tools/tenancy/credentials.py
+
+import json
+import os
+import re
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional
+from urllib.parse import quote
+
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from google_auth_oauthlib.flow import InstalledAppFlow
+
+# User ids become directory names, so only email-like ids are accepted (no separators, no leading dot)
+USER_ID_PATTERN = re.compile(r'[A-Za-z0-9][A-Za-z0-9._@+-]{0,253}')
+
+class MissingCredentialsError(Exception):
+    """Raised when a user has not authorized access to an API yet."""
+
+
+class FileCredentialStore:
+    """Per-user OAuth credential storage on the local filesystem.
+
+    Credentials are kept as authorized-user JSON at
+    `<directory>/<user>/<api>.json` (mode 0600), refreshed on read when expired
+    and written back atomically, so many workers can share one directory.
+    User ids must match `USER_ID_PATTERN`; anything else (e.g. `../other`) is
+    rejected with a ValueError before the filesystem is touched.
+
+    Args:
+        directory: Root directory for stored credentials
+    """
+
+    def __init__(self, directory: str):
+        self.directory = os.path.realpath(directory)
+        self._locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+        self._locks_guard = threading.Lock()
+
+    def _path(self, user: str, api: str) -> str:
+        if not USER_ID_PATTERN.fullmatch(user) or not USER_ID_PATTERN.fullmatch(api):
+            raise ValueError(f"Invalid user id or API name: {user!r}, {api!r}")
+        path = os.path.realpath(os.path.join(self.directory, quote(user, safe='@.'), f"{api}.json"))
+        # Also guards against symlinks placed inside the directory
+        if os.path.commonpath([path, self.directory]) != self.directory:
+            raise ValueError(f"Credentials path for {user!r} is outside {self.directory}")
+        return path
+
+    def _lock(self, user: str, api: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks[f"{user}/{api}"]
+
+    def save(self, user: str, api: str, creds: Credentials):
+        path = self._path(user, api)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            f.write(creds.to_json())
+        os.replace(tmp_path, path)
+
+    def load(self, user: str, api: str, scopes: List[str]) -> Credentials:
+        """Returns valid credentials for `user`, refreshing them if needed.
+
+        Raises:
+            MissingCredentialsError: If the user hasn't authorized this API or the grant was revoked
+        """
+        path = self._path(user, api)
+        with self._lock(user, api):
+            if not os.path.exists(path):
+                raise MissingCredentialsError(f"No {api} credentials stored for {user}")
+            with open(path) as f:
+                creds = Credentials.from_authorized_user_info(json.load(f), scopes)
+            if not creds.valid:
+                if not creds.refresh_token:
+                    raise MissingCredentialsError(f"Stored {api} credentials for {user} can't be refreshed")
+                try:
+                    creds.refresh(Request())
+                except Exception as e:
+                    raise MissingCredentialsError(f"Refreshing {api} credentials for {user} failed: {e}")
+                self.save(user, api, creds)
+            return creds
+
+    def delete(self, user: str, api: str):
+        path = self._path(user, api)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def authorize(self, user: str, api: str, scopes: List[str],
+                  client_secrets_file: str = 'credentials.json') -> Credentials:
+        """Runs the local browser consent flow for `user` and stores the result."""
+        flow = InstalledAppFlow.from_client_secrets_file(client_secrets_file, scopes)
+        creds = flow.run_local_server(port=0)
+        self.save(user, api, creds)
+        return creds
+
+
+def main():
+    import argparse
+    from tools.gmail.gmail_auth import GmailAuth
+    from tools.google_calendar.calendar_auth import GoogleCalendarAuth
+
+    parser = argparse.ArgumentParser(description="Authorize a user for multi-tenant mode.")
+    parser.add_argument('user', help="User id the playground will receive for this account")
+    parser.add_argument('--directory', default=os.getenv("MULTI_TENANT_CREDENTIALS_DIR", "tmp/credentials"))
+    parser.add_argument('--api', choices=['calendar', 'gmail'], nargs='*', default=['calendar', 'gmail'])
+    args = parser.parse_args()
+
+    store = FileCredentialStore(args.directory)
+    scopes = {'calendar': GoogleCalendarAuth.SCOPES, 'gmail': GmailAuth.SCOPES}
+    for api in args.api:
+        store.authorize(args.user, api, scopes[api])
+        print(f"✅ Stored {api} credentials for {args.user}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+# tools/tenancy/files.py
+
+import os
+from typing import Optional
+
+from .credentials import USER_ID_PATTERN
+from .pool import current_user
+
+
+def user_directory(base_directory: str, user: Optional[str] = None) -> str:
+    """Returns the directory holding the files of `user` (by default the caller of the running tool)."""
+    user = user or current_user() or 'me'
+    if not USER_ID_PATTERN.fullmatch(user):
+        raise ValueError(f"Invalid user id: {user!r}")
+    return os.path.join(os.path.realpath(base_directory), user)
+
+
+def resolve_user_path(base_directory: str, path: str, user: Optional[str] = None) -> str:
+    """Resolves a file path given to a tool inside the calling user's directory.
+
+    Tool arguments come from the model, so only relative paths without `..`
+    are accepted, and the result must stay inside the user's directory after
+    symlinks are resolved. The user's directory is created if missing.
+
+    Args:
+        base_directory: Directory holding one subdirectory per user
+        path: Relative path supplied to the tool
+        user: User whose directory to use (defaults to the caller of the running tool)
+
+    Returns:
+        str: Absolute path inside the user's directory
+
+    Raises:
+        ValueError: If the path is absolute, contains `..` or resolves outside the user's directory
+    """
+    if not path or os.path.isabs(path) or '..' in path.replace('\\', '/').split('/'):
+        raise ValueError(f"'{path}' is not allowed; use a relative path without '..'")
+    directory = user_directory(base_directory, user)
+    resolved = os.path.realpath(os.path.join(directory, path))
+    if os.path.commonpath([resolved, directory]) != directory:
+        raise ValueError(f"'{path}' is outside your files directory")
+    os.makedirs(directory, exist_ok=True)
+    return resolved
@@ -0,0 +1,191 @@
+# tools/tenancy/pool.py
+
+import contextvars
+import functools
+import inspect
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+_current_user: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar('google_tools_user', default=None)
+
+
+def current_user() -> Optional[str]:
+    """Returns the user the current tool call is acting for, if any."""
+    return _current_user.get()
+
+
+@contextmanager
+def acting_as(user: str) -> Iterator[None]:
+    """Makes `user` the identity for tool calls in this context (e.g. from a request middleware)."""
+    token = _current_user.set(user)
+    try:
+        yield
+    finally:
+        _current_user.reset(token)
+
+
+class ServiceUnavailableError(Exception):
+    """Raised when a service can't be built for a user (e.g. missing or revoked credentials)."""
+
+
+class _PoolEntry:
+    __slots__ = ('service', 'lock', 'last_used', 'evicted')
+
+    def __init__(self):
+        self.service: Any = None
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+        self.evicted = False
+
+
+class ServicePool:
+    """Bounded LRU pool of authorized per-user Google API services.
+
+    Services are built on first use, reused while warm, and closed when they
+    fall out of the LRU window or sit idle, so memory and open connections
+    stay flat however many users the process serves. A service is leased to
+    one call at a time because googleapiclient services aren't thread-safe.
+
+    Args:
+        factory: Builds an authorized service for a user id
+        max_size: Maximum number of services kept alive
+        idle_timeout_seconds: Services unused for this long are closed
+    """
+
+    def __init__(self, factory: Callable[[str], Any], max_size: int = 256, idle_timeout_seconds: float = 900):
+        self.factory = factory
+        self.max_size = max_size
+        self.idle_timeout_seconds = idle_timeout_seconds
+        self._entries: "OrderedDict[str, _PoolEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._leased: contextvars.ContextVar[Any] = contextvars.ContextVar(f'leased_service_{id(self)}', default=None)
+        self._stop = threading.Event()
+        self._reaper: Optional[threading.Thread] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _entry(self, user: str) -> _PoolEntry:
+        with self._lock:
+            entry = self._entries.get(user)
+            if entry is not None:
+                self._entries.move_to_end(user)
+                self.hits += 1
+                return entry
+            self.misses += 1
+            entry = self._entries[user] = _PoolEntry()
+            # Evict least recently used entries that aren't currently leased
+            for candidate_user in list(self._entries):
+                if len(self._entries) <= self.max_size:
+                    break
+                candidate = self._entries[candidate_user]
+                if candidate is not entry and not candidate.lock.locked():
+                    self._remove_locked(candidate_user)
+            return entry
+
+    def _remove_locked(self, user: str):
+        entry = self._entries.pop(user)
+        entry.evicted = True
+        self.evictions += 1
+        if not entry.lock.locked():
+            self._close(entry)
+
+    @staticmethod
+    def _close(entry: _PoolEntry):
+        service, entry.service = entry.service, None
+        if service is not None:
+            try:
+                service.close()
+            except Exception as e:
+                logger.debug(f"Failed to close pooled service: {e}")
+
+    @contextmanager
+    def lease(self, user: str) -> Iterator[Any]:
+        """Yields the user's service for exclusive use, building it if needed."""
+        entry = self._entry(user)
+        with entry.lock:
+            if entry.service is None:
+                try:
+                    entry.service = self.factory(user)
+                except Exception as e:
+                    raise ServiceUnavailableError(f"Can't access Google services for {user}: {e}") from e
+            token = self._leased.set(entry.service)
+            try:
+                yield entry.service
+            finally:
+                self._leased.reset(token)
+                entry.last_used = time.monotonic()
+                if entry.evicted:
+                    self._close(entry)
+
+    def current(self) -> Any:
+        """Returns the service leased to the running tool call."""
+        service = self._leased.get()
+        if service is None:
+            raise RuntimeError("No service leased for this call; is the toolkit bound to the pool?")
+        return service
+
+    def bind(self, toolkit):
+        """Wraps every registered tool so it leases the caller's service for the duration of the call.
+
+        The caller is `agent.user_id` (phi passes `agent` to tools that accept
+        it), falling back to the identity set with `acting_as`.
+        """
+        for function in toolkit.functions.values():
+            function.entrypoint = self._with_lease(function.entrypoint)
+        return toolkit
+
+    def _with_lease(self, entrypoint: Callable) -> Callable:
+        @functools.wraps(entrypoint)
+        def wrapper(*args, agent: Any = None, **kwargs):
+            user = getattr(agent, 'user_id', None) or current_user()
+            if not user:
+                return "❌ No user identity available for this call"
+            try:
+                with acting_as(user), self.lease(user):
+                    return entrypoint(*args, **kwargs)
+            except ServiceUnavailableError as e:
+                return f"❌ {str(e)}"
+
+        signature = inspect.signature(entrypoint)
+        agent_parameter = inspect.Parameter('agent', inspect.Parameter.KEYWORD_ONLY, default=None, annotation=Any)
+        wrapper.__signature__ = signature.replace(parameters=[*signature.parameters.values(), agent_parameter])
+        wrapper.__annotations__ = {**getattr(entrypoint, '__annotations__', {}), 'agent': Any}
+        return wrapper
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        """Closes services idle for longer than the timeout and returns how many were evicted."""
+        cutoff = (now or time.monotonic()) - self.idle_timeout_seconds
+        with self._lock:
+            idle = [user for user, entry in self._entries.items()
+                    if entry.last_used < cutoff and not entry.lock.locked()]
+            for user in idle:
+                self._remove_locked(user)
+        return len(idle)
+
+    def start_reaper(self, interval_seconds: float = 60):
+        """Evicts idle services from a background thread until `stop()` is called."""
+        def loop():
+            while not self._stop.wait(interval_seconds):
+                self.evict_idle()
+
+        self._stop.clear()
+        self._reaper = threading.Thread(target=loop, name="service-pool-reaper", daemon=True)
+        self._reaper.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._reaper:
+            self._reaper.join()
+        with self._lock:
+            for user in list(self._entries):
+                self._remove_locked(user)
+
+    def __len__(self) -> int:
+        return len(self._entries)
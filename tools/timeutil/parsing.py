@@ -0,0 +1,210 @@
+# tools/timeutil/parsing.py
+
+import re
+from datetime import date, datetime, time, timedelta, tzinfo
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from typing import Any, Mapping, Optional
+
+import pytz
+from dateutil import parser as dateutil_parser
+
+WEEKDAYS = {
+    'monday': 0, 'mon': 0,
+    'tuesday': 1, 'tue': 1, 'tues': 1,
+    'wednesday': 2, 'wed': 2,
+    'thursday': 3, 'thu': 3, 'thurs': 3,
+    'friday': 4, 'fri': 4,
+    'saturday': 5, 'sat': 5,
+    'sunday': 6, 'sun': 6,
+}
+
+DAY_OFFSETS = {'today': 0, 'tonight': 0, 'tomorrow': 1, 'day after tomorrow': 2, 'yesterday': -1}
+
+NAMED_TIMES = {
+    'midnight': time(0, 0),
+    'morning': time(9, 0),
+    'noon': time(12, 0),
+    'midday': time(12, 0),
+    'afternoon': time(14, 0),
+    'evening': time(18, 0),
+    'tonight': time(20, 0),
+}
+
+UNITS = {'minute': 'minutes', 'min': 'minutes', 'hour': 'hours', 'hr': 'hours', 'day': 'days', 'week': 'weeks'}
+
+_DAY = (r"(?:(?P<day>day after tomorrow|today|tonight|tomorrow|yesterday)"
+        r"|(?:(?P<which>next|this|coming)\s+)?(?P<weekday>" + "|".join(sorted(WEEKDAYS, key=len, reverse=True)) + r"))")
+_TIME = (r"(?:(?P<named>" + "|".join(NAMED_TIMES) + r")"
+         r"|(?P<hour>\d{1,2})(?::(?P<minute>\d{2}))?\s*(?P<meridiem>[ap]\.?m\.?)?)")
+_DAY_THEN_TIME = re.compile(rf"^{_DAY}(?:\s*,?\s+(?:at\s+|in the\s+)?{_TIME})?$")
+_TIME_THEN_DAY = re.compile(rf"^(?P<at>at\s+)?{_TIME}(?:\s*,?\s+(?:on\s+)?{_DAY})?$")
+_OFFSET = re.compile(r"^(?:in\s+(?P<n1>\d+|an?)\s+(?P<u1>[a-z]+?)s?|(?P<n2>\d+|an?)\s+(?P<u2>[a-z]+?)s?\s+(?P<dir>from now|ago))$")
+
+# "2024-03-05T14:00:00Z", "2024-03-05 14:00", "2024-03-05" and friends
+_ISO_LIKE = re.compile(r"^\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?(?:Z|[+-]\d{2}:?\d{2})?$", re.IGNORECASE)
+
+
+@lru_cache(maxsize=None)
+def get_timezone(name: str) -> tzinfo:
+    """Returns the (memoized) tzinfo for an IANA name such as "Europe/Paris".
+
+    Raises:
+        ValueError: If the timezone is unknown
+    """
+    try:
+        return pytz.timezone(name)
+    except pytz.UnknownTimeZoneError:
+        raise ValueError(f"Unknown timezone '{name}'")
+
+
+def localize(value: datetime, tz: tzinfo) -> datetime:
+    """Attaches `tz` to a naive wall-clock time, or converts an aware datetime to it."""
+    if value.tzinfo is not None:
+        return value.astimezone(tz)
+    if hasattr(tz, 'localize'):
+        return tz.localize(value)
+    return value.replace(tzinfo=tz)
+
+
+@lru_cache(maxsize=4096)
+def parse_rfc3339(value: str) -> datetime:
+    """Parses an RFC3339 timestamp (or an all-day `YYYY-MM-DD` date) as returned by Google APIs.
+
+    All-day dates come back as naive midnight datetimes. Uses the C-level
+    `fromisoformat` and only falls back to dateutil for unusual forms.
+    """
+    try:
+        if len(value) == 10:
+            return datetime.combine(date.fromisoformat(value), time())
+        if value.endswith(('Z', 'z')):
+            value = value[:-1] + '+00:00'
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return dateutil_parser.isoparse(value)
+
+
+def parse_event_time(when: Mapping[str, Any]) -> datetime:
+    """Parses an event's `start`/`end` object, which holds either `dateTime` or `date`."""
+    return parse_rfc3339(when.get('dateTime') or when['date'])
+
+
+def add_duration(value: datetime, delta: timedelta) -> datetime:
+    """Adds elapsed time to an aware datetime, fixing up its UTC offset if a DST change is crossed."""
+    result = value + delta
+    normalize = getattr(value.tzinfo, 'normalize', None)
+    return normalize(result) if normalize else result
+
+
+def format_rfc3339(value: datetime) -> str:
+    """Formats a datetime for API query parameters such as `timeMin` (naive values are taken as UTC)."""
+    if value.tzinfo is None:
+        return value.isoformat() + 'Z'
+    return value.isoformat()
+
+
+def parse_rfc2822(value: str) -> Optional[datetime]:
+    """Parses an email `Date` header, returning None if it isn't a valid RFC 2822 date."""
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def resolve_datetime(expression: str, timezone: str = "UTC", now: Optional[datetime] = None) -> datetime:
+    """Resolves an absolute or relative date/time expression to an aware datetime in `timezone`.
+
+    Understands ISO/RFC3339 timestamps, relative days and weekdays with an
+    optional time ("tomorrow at 2pm", "next friday 9:30", "3pm today",
+    "tonight"), offsets ("in 2 hours", "3 days from now") and, as a fallback,
+    anything dateutil can parse ("March 5 2025 at 14:00"). Naive times are
+    interpreted as wall-clock time in `timezone`. A bare weekday means its next
+    occurrence including today; "next <weekday>" always lies after today.
+
+    Results are memoized per expression, timezone and minute.
+
+    Args:
+        expression: Date/time expression
+        timezone: IANA timezone the expression is relative to
+        now: Reference time (defaults to the current time)
+
+    Returns:
+        datetime: Timezone-aware datetime in `timezone`
+
+    Raises:
+        ValueError: If the timezone is unknown or the expression can't be understood
+    """
+    tz = get_timezone(timezone)
+    anchor = localize(now, tz) if now is not None else datetime.now(tz)
+    return _resolve(" ".join(expression.lower().split()), timezone, anchor.replace(second=0, microsecond=0))
+
+
+@lru_cache(maxsize=1024)
+def _resolve(expression: str, timezone: str, anchor: datetime) -> datetime:
+    tz = get_timezone(timezone)
+
+    if _ISO_LIKE.match(expression):
+        return localize(parse_rfc3339(expression.upper().replace(' ', 'T')), tz)
+
+    if expression == 'now':
+        return anchor
+
+    match = _OFFSET.match(expression)
+    if match:
+        count, unit = match.group('n1', 'u1') if match.group('n1') else match.group('n2', 'u2')
+        if unit in UNITS:
+            amount = 1 if count in ('a', 'an') else int(count)
+            if match.group('dir') == 'ago':
+                amount = -amount
+            offset = timedelta(**{UNITS[unit]: amount})
+            if UNITS[unit] in ('minutes', 'hours'):
+                # Elapsed time: do the arithmetic in UTC so DST changes don't skew it
+                return (anchor.astimezone(pytz.utc) + offset).astimezone(tz)
+            # Calendar days keep the wall-clock time across DST changes
+            return localize(anchor.replace(tzinfo=None) + offset, tz)
+
+    match = _DAY_THEN_TIME.match(expression) or _TIME_THEN_DAY.match(expression)
+    if match:
+        time_of_day = _resolve_time(match)
+        if time_of_day is not None:
+            return localize(datetime.combine(_resolve_day(match, anchor.date()), time_of_day), tz)
+
+    try:
+        parsed = dateutil_parser.parse(expression, default=anchor.replace(hour=0, minute=0, tzinfo=None))
+    except (ValueError, OverflowError):
+        raise ValueError(f"Could not understand the date/time '{expression}'")
+    return localize(parsed, tz)
+
+
+def _resolve_day(match: re.Match, today: date) -> date:
+    if match.group('day'):
+        return today + timedelta(days=DAY_OFFSETS[match.group('day')])
+    if match.group('weekday'):
+        days_ahead = (WEEKDAYS[match.group('weekday')] - today.weekday()) % 7
+        if match.group('which') == 'next' and days_ahead == 0:
+            days_ahead = 7
+        return today + timedelta(days=days_ahead)
+    return today
+
+
+def _resolve_time(match: re.Match) -> Optional[time]:
+    if match.group('named'):
+        return NAMED_TIMES[match.group('named')]
+    if match.group('hour') is None:
+        return NAMED_TIMES['tonight'] if match.group('day') == 'tonight' else time(0, 0)
+
+    hour, minute = int(match.group('hour')), int(match.group('minute') or 0)
+    meridiem = (match.group('meridiem') or '').replace('.', '')
+    if meridiem:
+        if not 1 <= hour <= 12:
+            raise ValueError(f"Invalid hour '{hour}{meridiem}'")
+        hour = hour % 12 + (12 if meridiem == 'pm' else 0)
+    elif (match.group('minute') is None and match.group('day') is None and match.group('weekday') is None
+          and not match.groupdict().get('at')):
+        # A lone number ("15") is a day of month to dateutil, not a time; "at 15" is an hour
+        return None
+    if hour > 23 or minute > 59:
+        raise ValueError(f"Invalid time '{match.group('hour')}:{match.group('minute') or '00'}'")
+    return time(hour, minute)
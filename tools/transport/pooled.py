@@ -0,0 +1,193 @@
+# tools/transport/pooled.py
+
+import copy
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Optional
+
+import httplib2
+import urllib3
+from google_auth_httplib2 import AuthorizedHttp
+from urllib3.util.retry import Retry
+
+DEFAULT_MAX_HOSTS = 16
+DEFAULT_CONNECTIONS_PER_HOST = 10
+
+# Hosts the Calendar and Gmail clients talk to (API calls, batches and token refreshes)
+GOOGLE_API_HOSTS = (
+    "https://www.googleapis.com/",
+    "https://gmail.googleapis.com/",
+    "https://oauth2.googleapis.com/",
+)
+
+_shared_lock = threading.Lock()
+_shared_pool: Optional[urllib3.PoolManager] = None
+
+
+def shared_pool_manager(max_hosts: int = DEFAULT_MAX_HOSTS,
+                        connections_per_host: int = DEFAULT_CONNECTIONS_PER_HOST) -> urllib3.PoolManager:
+    """Returns the process-wide connection pool, creating it on first use.
+
+    The limits only apply to the call that creates the pool; later callers
+    share it as is.
+
+    Args:
+        max_hosts: Number of hosts whose connections are kept
+        connections_per_host: Maximum open connections per host; callers beyond it wait for a free one
+    """
+    global _shared_pool
+    with _shared_lock:
+        if _shared_pool is None:
+            _shared_pool = urllib3.PoolManager(
+                num_pools=max_hosts,
+                maxsize=connections_per_host,
+                block=True,
+            )
+        return _shared_pool
+
+
+class PooledHttp:
+    """httplib2-compatible transport backed by a shared keep-alive connection pool.
+
+    `httplib2.Http` keeps one connection per host per instance and isn't
+    thread-safe, so every service pays its own TLS handshakes. This transport
+    sends requests over a urllib3 pool shared by all services in the process
+    (Calendar, Gmail and credential refreshes alike), bounded per host, with
+    gzip-compressed responses decoded transparently. It is thread-safe and
+    can be passed as `http=` to `get_calendar_service`/`get_gmail_service`.
+
+    Args:
+        pool: Connection pool to use; the process-wide pool if omitted
+        timeout: Read timeout in seconds
+        connect_timeout: Connect timeout in seconds
+        pool_timeout: Seconds to wait for a free connection when a host is at its limit
+    """
+
+    follow_redirects = True
+    redirect_codes = frozenset(httplib2.REDIRECT_CODES) - {308}
+
+    def __init__(self,
+                 pool: Optional[urllib3.PoolManager] = None,
+                 timeout: float = 60,
+                 connect_timeout: float = 10,
+                 pool_timeout: Optional[float] = 30):
+        self.pool = pool if pool is not None else shared_pool_manager()
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.pool_timeout = pool_timeout
+
+    def request(self, uri, method="GET", body=None, headers=None,
+                redirections=httplib2.DEFAULT_MAX_REDIRECTS, connection_type=None):
+        headers = dict(headers or {})
+        if not any(key.lower() == 'accept-encoding' for key in headers):
+            headers['accept-encoding'] = 'gzip, deflate'
+        # Reused connections the server already closed are retried once; reads
+        # are never retried for non-idempotent methods so a send can't go out twice
+        retries = Retry(
+            connect=2,
+            read=1,
+            status=0,
+            redirect=redirections if self.follow_redirects else 0,
+            raise_on_redirect=False,
+        )
+        try:
+            response = self.pool.urlopen(
+                method,
+                uri,
+                body=body,
+                headers=headers,
+                retries=retries,
+                redirect=self.follow_redirects,
+                timeout=urllib3.Timeout(connect=self.connect_timeout, read=self.timeout),
+                pool_timeout=self.pool_timeout,
+                preload_content=True,
+                decode_content=True,
+            )
+        except urllib3.exceptions.MaxRetryError as e:
+            raise self._translate(e.reason or e) from e
+        except urllib3.exceptions.HTTPError as e:
+            raise self._translate(e) from e
+        return self._to_httplib2(response), response.data
+
+    @staticmethod
+    def _translate(error: Exception) -> Exception:
+        # googleapiclient retries socket timeouts and ConnectionErrors, not urllib3's exceptions
+        if isinstance(error, urllib3.exceptions.NewConnectionError):
+            # Subclasses urllib3's TimeoutError for historical reasons, but is a refused/failed connect
+            return ConnectionError(str(error))
+        if isinstance(error, (urllib3.exceptions.TimeoutError, urllib3.exceptions.EmptyPoolError)):
+            return socket.timeout(str(error))
+        if isinstance(error, OSError):
+            return error
+        return ConnectionError(str(error))
+
+    @staticmethod
+    def _to_httplib2(response: urllib3.BaseHTTPResponse) -> httplib2.Response:
+        info: Dict[str, Any] = {}
+        for key, value in response.headers.items():
+            key = key.lower()
+            info[key] = f"{info[key]}, {value}" if key in info else value
+        info['status'] = str(response.status)
+        if 'content-encoding' in info:
+            # The body was already decompressed; mirror httplib2's bookkeeping
+            info['-content-encoding'] = info.pop('content-encoding')
+            info['content-length'] = str(len(response.data))
+        result = httplib2.Response(info)
+        result.reason = response.reason
+        return result
+
+    def warm(self, urls: Iterable[str] = GOOGLE_API_HOSTS, connections: int = 1):
+        """Opens connections ahead of the first tool call so TLS setup isn't billed to it.
+
+        Each connection is opened by a cheap unauthenticated HEAD request and
+        returned to the pool; concurrent requests open several per host.
+
+        Args:
+            urls: URLs whose hosts should be connected
+            connections: Connections to open per host
+        """
+        def head(url: str):
+            try:
+                self.pool.request(
+                    'HEAD',
+                    url,
+                    retries=False,
+                    redirect=False,
+                    timeout=urllib3.Timeout(connect=self.connect_timeout, read=self.timeout),
+                    pool_timeout=self.pool_timeout,
+                )
+            except (OSError, urllib3.exceptions.HTTPError):
+                # Warming is best effort; the first request will connect instead
+                pass
+
+        targets = [url for url in urls for _ in range(connections)]
+        if targets:
+            with ThreadPoolExecutor(len(targets), thread_name_prefix="http-warmup") as executor:
+                list(executor.map(head, targets))
+
+    def close(self):
+        # The pool is shared with other services; closing one service must not drop its connections
+        pass
+
+
+def worker_http(http: Any) -> Any:
+    """Returns a transport a worker thread can use alongside `http` (e.g. to run batches in parallel).
+
+    `httplib2.Http` isn't thread-safe, so it is replaced by a fresh instance
+    (re-wrapped with the same credentials or recorder). PooledHttp and other
+    thread-safe transports are shared as is.
+    """
+    if isinstance(http, PooledHttp):
+        return http
+    if isinstance(http, httplib2.Http):
+        return httplib2.Http(timeout=http.timeout)
+    if isinstance(http, AuthorizedHttp):
+        return AuthorizedHttp(http.credentials, http=worker_http(http.http))
+    inner = getattr(http, 'http', None)
+    if inner is not None:
+        # Wrappers such as RecordingHttp: same wrapper state around a worker copy of the inner transport
+        wrapper = copy.copy(http)
+        wrapper.http = worker_http(inner)
+        return wrapper
+    return http
@@ -0,0 +1,388 @@
+# tools/transport/recording.py
+
+import base64
+import functools
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, quote, unquote, urlencode, urlparse, urlunparse
+
+import httplib2
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+CASSETTE_VERSION = 1
+
+# Query parameters that carry credentials and are never written to disk
+SENSITIVE_PARAMS = {'access_token', 'key', 'oauth_token', 'token'}
+
+EMAIL_PATTERN = re.compile(r'[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}')
+
+# Credential fields in response bodies (e.g. the token endpoint's reply to a refresh), JSON or form-encoded
+SENSITIVE_FIELDS = ('access_token', 'id_token', 'refresh_token', 'client_secret')
+_SENSITIVE_JSON = re.compile(r'("(?:%s)"\s*:\s*)"(?:[^"\\]|\\.)*"' % '|'.join(SENSITIVE_FIELDS))
+_SENSITIVE_FORM = re.compile(r'(\b(?:%s)=)[^&\s]*' % '|'.join(SENSITIVE_FIELDS))
+
+# Base64url fields of Gmail resources: the whole message (format=raw) and MIME part bodies
+ENCODED_FIELDS = ('raw', 'data')
+
+_PATH_SAFE = "/:@!$&'()*+,;="
+
+
+def normalize_uri(uri: str, redact: Optional[Callable[[str], str]] = None) -> str:
+    """Drops credential parameters and sorts the query so equivalent requests compare equal.
+
+    The path is re-quoted canonically. `redact`, if given, is applied to the
+    decoded path and query values, so percent-escaped addresses
+    (e.g. `calendars/bob%40example.com/events`) are caught too.
+    """
+    redact = redact or (lambda text: text)
+    parsed = urlparse(uri)
+    path = quote(redact(unquote(parsed.path)), safe=_PATH_SAFE)
+    query = sorted((k, redact(v)) for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+                   if k not in SENSITIVE_PARAMS)
+    return urlunparse((parsed.scheme, parsed.netloc, path, '', urlencode(query), ''))
+
+
+def pseudonymize_emails(text: str) -> str:
+    """Replaces email addresses with stable pseudonyms (same input, same pseudonym)."""
+    def replace(match: re.Match) -> str:
+        digest = hashlib.sha1(match.group(0).lower().encode()).hexdigest()[:10]
+        return f"user-{digest}@example.invalid"
+    return EMAIL_PATTERN.sub(replace, text)
+
+
+def scrub_credentials(text: str) -> str:
+    """Blanks out token and secret values in a JSON or form-encoded body."""
+    text = _SENSITIVE_JSON.sub(r'\1"REDACTED"', text)
+    return _SENSITIVE_FORM.sub(r'\1REDACTED', text)
+
+
+def redact_encoded(text: str, redact: Callable[[str], str]) -> str:
+    """Applies `redact` inside the base64url `raw`/`data` fields of a JSON body.
+
+    Bodies that aren't JSON, and payloads that don't decode to text
+    (attachments), are returned unchanged.
+    """
+    try:
+        document = json.loads(text)
+    except ValueError:
+        return text
+    changed = False
+
+    def visit(node: Any):
+        nonlocal changed
+        if isinstance(node, list):
+            for item in node:
+                visit(item)
+        elif isinstance(node, dict):
+            for key, value in node.items():
+                if key in ENCODED_FIELDS and isinstance(value, str):
+                    try:
+                        decoded = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)).decode('utf-8')
+                    except ValueError:
+                        continue
+                    redacted = redact(decoded)
+                    if redacted != decoded:
+                        encoded = base64.urlsafe_b64encode(redacted.encode()).decode()
+                        node[key] = encoded if value.endswith('=') else encoded.rstrip('=')
+                        changed = True
+                else:
+                    visit(value)
+
+    visit(document)
+    return json.dumps(document) if changed else text
+
+
+def _body_digest(body: Any) -> Optional[str]:
+    if body is None:
+        return None
+    if isinstance(body, str):
+        body = body.encode()
+    return hashlib.sha1(body).hexdigest()
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    raise TypeError(f"Cannot record argument of type {type(value).__name__}")
+
+
+class CassetteWriter:
+    """Appends tool calls and HTTP exchanges to a gzip-compressed JSON-lines file.
+
+    Response bodies are stored once per distinct content and referenced by
+    digest, so repeated reads of the same resource cost a few bytes each.
+    """
+
+    def __init__(self, path: str, redact: Optional[Callable[[str], str]] = None):
+        self.path = path
+        self.redact = redact or (lambda text: text)
+        self._decode_payloads = redact is not None
+        self._lock = threading.Lock()
+        self._blobs = set()
+        self._seq = 0
+        self._started = time.monotonic()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._file = gzip.open(path, 'wt', encoding='utf-8')
+        self._write({'type': 'meta', 'version': CASSETTE_VERSION, 'created': time.time()})
+
+    def _write(self, record: Dict[str, Any]):
+        self._file.write(json.dumps(record, separators=(',', ':')) + "\n")
+
+    def next_tool_seq(self) -> int:
+        with self._lock:
+            self._seq += 1
+            return self._seq
+
+    def write_tool(self, seq: int, toolkit: str, tool: str, args: Dict[str, Any], elapsed: float, offset: float,
+                   user: Optional[str] = None):
+        args = json.loads(self.redact(json.dumps(args, default=_jsonable)))
+        record = {'type': 'tool', 'seq': seq, 't': round(offset, 4), 'toolkit': toolkit,
+                  'tool': tool, 'args': args, 'elapsed': round(elapsed, 4)}
+        if user is not None:
+            record['user'] = self.redact(user)
+        with self._lock:
+            self._write(record)
+            self._file.flush()
+
+    def write_http(self, tool_seq: Optional[int], method: str, uri: str, body: Any,
+                   response: httplib2.Response, content: bytes, elapsed: float):
+        text = content.decode('utf-8', errors='replace') if isinstance(content, bytes) else content
+        # Always applied, whatever `redact` does: token refreshes go through the same transport
+        text = self.redact(scrub_credentials(text))
+        if self._decode_payloads:
+            text = redact_encoded(text, self.redact)
+        blob = hashlib.sha1(text.encode()).hexdigest()
+        with self._lock:
+            if blob not in self._blobs:
+                self._blobs.add(blob)
+                self._write({'type': 'blob', 'id': blob, 'data': text})
+            self._write({
+                'type': 'http',
+                'tool_seq': tool_seq,
+                'method': method,
+                'uri': normalize_uri(uri, self.redact),
+                'body': _body_digest(body),
+                'status': response.status,
+                'content_type': response.get('content-type', 'application/json'),
+                'blob': blob,
+                'elapsed': round(elapsed, 4),
+            })
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self._started
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+class RecordingHttp:
+    """httplib2.Http wrapper that records every exchange into a cassette.
+
+    Request headers are never stored, so Authorization and cookies can't leak
+    into a recording; credential query parameters and token values in
+    response bodies are stripped as well.
+    """
+
+    def __init__(self, writer: CassetteWriter, http: Optional[Any] = None, context: Optional[threading.local] = None):
+        self.writer = writer
+        self.http = http or httplib2.Http()
+        self.context = context or threading.local()
+
+    def request(self, uri, method="GET", body=None, headers=None, *args, **kwargs):
+        started = time.perf_counter()
+        response, content = self.http.request(uri, method, body, headers, *args, **kwargs)
+        self.writer.write_http(getattr(self.context, 'tool_seq', None), method, uri, body,
+                               response, content, time.perf_counter() - started)
+        return response, content
+
+    def __getattr__(self, name):
+        return getattr(self.http, name)
+
+
+class SessionRecorder:
+    """Captures a session's tool calls and the Google API traffic they cause.
+
+    Example:
+        recorder = SessionRecorder("recordings/session.jsonl.gz", redact=pseudonymize_emails)
+        calendar = recorder.instrument(GoogleCalendarTools(http=recorder.http()))
+
+    Args:
+        path: Cassette file to write
+        redact: Optional function applied to recorded arguments, URIs and response bodies,
+            including the decoded base64 payloads of Gmail messages
+    """
+
+    def __init__(self, path: str, redact: Optional[Callable[[str], str]] = None):
+        self.writer = CassetteWriter(path, redact)
+        self.context = threading.local()
+
+    def http(self, inner: Optional[Any] = None) -> RecordingHttp:
+        """Returns a recording transport to pass as `http=` when building a toolkit."""
+        return RecordingHttp(self.writer, inner, self.context)
+
+    def instrument(self, toolkit):
+        """Wraps every registered tool of `toolkit` so its calls are recorded."""
+        for name, function in toolkit.functions.items():
+            function.entrypoint = self._wrap(toolkit.name, name, function.entrypoint)
+        return toolkit
+
+    def _wrap(self, toolkit_name: str, tool_name: str, entrypoint: Callable) -> Callable:
+        @functools.wraps(entrypoint)
+        def wrapper(*args, **kwargs):
+            seq = self.writer.next_tool_seq()
+            offset = self.writer.elapsed()
+            previous = getattr(self.context, 'tool_seq', None)
+            self.context.tool_seq = seq
+            started = time.perf_counter()
+            try:
+                return entrypoint(*args, **kwargs)
+            finally:
+                self.context.tool_seq = previous
+                # phi passes the calling Agent to tools that accept it (see ServicePool.bind);
+                # only its user id is worth keeping
+                recorded = {k: v for k, v in kwargs.items() if k != 'agent'}
+                user = getattr(kwargs.get('agent'), 'user_id', None)
+                try:
+                    self.writer.write_tool(seq, toolkit_name, tool_name, recorded,
+                                           time.perf_counter() - started, offset, user)
+                except Exception as e:
+                    # A recording problem must never replace the tool's own result
+                    logger.warning(f"Failed to record {toolkit_name}.{tool_name} call: {e}")
+        return wrapper
+
+    def close(self):
+        self.writer.close()
+
+
+@dataclass
+class RecordedToolCall:
+    seq: int
+    offset: float
+    toolkit: str
+    tool: str
+    args: Dict[str, Any]
+    elapsed: float
+    user: Optional[str] = None
+
+
+@dataclass
+class RecordedExchange:
+    method: str
+    uri: str
+    body: Optional[str]
+    status: int
+    content_type: str
+    content: bytes
+    elapsed: float
+
+
+@dataclass
+class Cassette:
+    """A loaded recording: tool calls in call order plus their HTTP exchanges."""
+    tool_calls: List[RecordedToolCall] = field(default_factory=list)
+    exchanges: List[RecordedExchange] = field(default_factory=list)
+
+    @classmethod
+    def load(cls, path: str) -> "Cassette":
+        cassette = cls()
+        blobs: Dict[str, bytes] = {}
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for record in cls._records(f):
+                kind = record['type']
+                if kind == 'meta' and record['version'] != CASSETTE_VERSION:
+                    raise ValueError(f"Unsupported cassette version: {record['version']}")
+                elif kind == 'blob':
+                    blobs[record['id']] = record['data'].encode()
+                elif kind == 'tool':
+                    cassette.tool_calls.append(RecordedToolCall(
+                        record['seq'], record['t'], record['toolkit'], record['tool'],
+                        record['args'], record['elapsed'], record.get('user')))
+                elif kind == 'http':
+                    cassette.exchanges.append(RecordedExchange(
+                        record['method'], record['uri'], record['body'], record['status'],
+                        record['content_type'], blobs[record['blob']], record['elapsed']))
+        cassette.tool_calls.sort(key=lambda call: call.offset)
+        return cassette
+
+    @staticmethod
+    def _records(f):
+        # A recorder that crashed leaves a truncated gzip stream and/or a partial last line
+        try:
+            for line in f:
+                yield json.loads(line)
+        except (EOFError, json.JSONDecodeError):
+            return
+
+
+class ReplayHttp:
+    """httplib2.Http stand-in that answers requests from a cassette without touching the network.
+
+    Requests are matched on method, path, normalized query and body digest,
+    falling back to method and path when bodies differ (MIME boundaries, batch
+    envelopes). Matching responses are served round-robin, so a cassette can
+    be replayed any number of times and from any number of threads.
+
+    Args:
+        cassette: Loaded recording to serve
+        latency_scale: Multiplier applied to each exchange's recorded latency (0 disables)
+    """
+
+    def __init__(self, cassette: Cassette, latency_scale: float = 0.0):
+        self.latency_scale = latency_scale
+        self.timeout = None
+        self.follow_redirects = True
+        self.redirect_codes = set()
+        self.connections = {}
+        self._exact: Dict[Tuple, List[RecordedExchange]] = defaultdict(list)
+        self._loose: Dict[Tuple, List[RecordedExchange]] = defaultdict(list)
+        self._counters: Dict[Tuple, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        self.misses = 0
+        for exchange in cassette.exchanges:
+            # Hosts are ignored so recordings made against a fake server replay as real traffic and vice versa
+            parsed = urlparse(exchange.uri)
+            self._exact[(exchange.method, parsed.path, parsed.query, exchange.body)].append(exchange)
+            self._loose[(exchange.method, parsed.path)].append(exchange)
+
+    def _lookup(self, method: str, uri: str, body: Any) -> Optional[RecordedExchange]:
+        parsed = urlparse(normalize_uri(uri))
+        for key, table in (((method, parsed.path, parsed.query, _body_digest(body)), self._exact),
+                           ((method, parsed.path), self._loose)):
+            candidates = table.get(key)
+            if candidates:
+                with self._lock:
+                    index = self._counters[key]
+                    self._counters[key] = index + 1
+                return candidates[index % len(candidates)]
+        return None
+
+    def request(self, uri, method="GET", body=None, headers=None, *args, **kwargs):
+        exchange = self._lookup(method, uri, body)
+        if exchange is None:
+            with self._lock:
+                self.misses += 1
+            content = json.dumps({'error': {'code': 404, 'message': f"No recorded response for {method} {uri}"}})
+            return httplib2.Response({'status': '404', 'content-type': 'application/json'}), content.encode()
+        if self.latency_scale and exchange.elapsed:
+            time.sleep(exchange.elapsed * self.latency_scale)
+        response = httplib2.Response({'status': str(exchange.status), 'content-type': exchange.content_type})
+        return response, exchange.content
+
+    def add_credentials(self, *args, **kwargs):
+        pass
+
+    def close(self):
+        pass